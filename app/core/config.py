@@ -1,5 +1,6 @@
 # app/core/config.py
 import os
+import tempfile
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -9,3 +10,76 @@ DB_NAME     = os.getenv("DB_NAME")
 DB_USER     = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 AIVEN_CA_PEM = os.getenv("AIVEN_CA_PEM")
+
+# ───── Cachés de statements (engine async) ───────────────────────
+# SQL compilado por SQLAlchemy (por engine) y prepared statements de
+# asyncpg (por conexión). Ver GET /sessions/cache-stats.
+DB_QUERY_CACHE_SIZE     = int(os.getenv("DB_QUERY_CACHE_SIZE", 500))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 256))
+
+# ───── Resiliencia de la BD (pool, reintentos, circuit breaker) ──
+# Aiven corta conexiones ociosas: reciclar antes y hacer ping al sacarlas.
+DB_POOL_RECYCLE_SECONDS  = int(os.getenv("DB_POOL_RECYCLE_SECONDS", 1800))
+DB_CONNECT_TIMEOUT       = float(os.getenv("DB_CONNECT_TIMEOUT", 10))
+DB_RETRY_ATTEMPTS        = int(os.getenv("DB_RETRY_ATTEMPTS", 4))
+DB_RETRY_BASE_SECONDS    = float(os.getenv("DB_RETRY_BASE_SECONDS", 0.2))
+DB_RETRY_MAX_SECONDS     = float(os.getenv("DB_RETRY_MAX_SECONDS", 5))
+DB_BREAKER_FAILURES      = int(os.getenv("DB_BREAKER_FAILURES", 5))
+DB_BREAKER_RESET_SECONDS = float(os.getenv("DB_BREAKER_RESET_SECONDS", 30))
+DB_PARK_DIR = os.getenv("DB_PARK_DIR", os.path.join(tempfile.gettempdir(), "raices_parked"))
+
+# ───── Particiones mensuales de sessions/session_tasks/baselines ──
+# python -m app.services.partitions ensure|archive (cron diario)
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", 3))
+ARCHIVE_AFTER_MONTHS   = int(os.getenv("ARCHIVE_AFTER_MONTHS", 12))
+ARCHIVE_DIR            = os.getenv("ARCHIVE_DIR", "archive")
+# Ventana por defecto de /sessions sin `since` (poda las particiones viejas)
+SESSIONS_DEFAULT_DAYS  = int(os.getenv("SESSIONS_DEFAULT_DAYS", 180))
+
+# ───── Perfilado bajo demanda (header X-Profile-Token) ───────────
+# Sin token configurado el perfilado queda desactivado.
+PROFILE_TOKEN       = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR         = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "raices_profiles"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 1))
+
+# ───── Capacidad DSP (/biometrics/process) ───────────────────────
+DSP_MAX_INFLIGHT        = int(os.getenv("DSP_MAX_INFLIGHT", os.cpu_count() or 2))
+DSP_MAX_BUFFERED_MB     = int(os.getenv("DSP_MAX_BUFFERED_MB", 256))
+DSP_USER_RATE_PER_MIN   = float(os.getenv("DSP_USER_RATE_PER_MIN", 10))
+DSP_USER_BURST          = int(os.getenv("DSP_USER_BURST", 5))
+DSP_GLOBAL_RATE_PER_MIN = float(os.getenv("DSP_GLOBAL_RATE_PER_MIN", 300))
+DSP_GLOBAL_BURST        = int(os.getenv("DSP_GLOBAL_BURST", 50))
+
+# ───── Límites del body de /biometrics/process ───────────────────
+MAX_BODY_MB             = int(os.getenv("MAX_BODY_MB", 64))
+MAX_SAMPLES_PER_CHANNEL = int(os.getenv("MAX_SAMPLES_PER_CHANNEL", 2_000_000))
+
+# ───── Compresión (bodies gzip/zstd y respuestas) ────────────────
+# MAX_BODY_MB aplica a los bytes descomprimidos del request.
+COMPRESS_MIN_BYTES     = int(os.getenv("COMPRESS_MIN_BYTES", 1024))
+COMPRESS_OFFLOAD_BYTES = int(os.getenv("COMPRESS_OFFLOAD_BYTES", 256 * 1024))
+GZIP_LEVEL             = int(os.getenv("GZIP_LEVEL", 6))
+ZSTD_LEVEL             = int(os.getenv("ZSTD_LEVEL", 3))
+
+# ───── Backend HRV: "neurokit" (referencia) o "numpy" (ligero) ───
+# numpy es ~30x más rápido y da los mismos picos/HR, pero su LF/HF no es
+# intercambiable: ~10% de diferencia con 60 s o más (3.615 vs 3.254 en
+# PPG sintético de 60 s) y valores donde NeuroKit da NaN (< 60 s). Cambiar
+# de backend cambia baseline_hrv_lf_hf, los deltas LF/HF y con ellos el
+# estrés y la emoción guardados: no mezclar backends en un mismo estudio.
+HRV_BACKEND = os.getenv("HRV_BACKEND", "neurokit")
+
+# ───── Pool DSP: 0 = hilos del propio worker API ─────────────────
+DSP_WORKERS   = int(os.getenv("DSP_WORKERS", 0))     # procesos DSP por worker API
+DSP_THREADS   = int(os.getenv("DSP_THREADS", 1))     # hilos BLAS/OpenMP por proceso DSP
+DSP_PIN_CORES = os.getenv("DSP_PIN_CORES", "0") == "1"
+DSP_SLOT_DIR  = os.getenv("DSP_SLOT_DIR")            # lo fija serve.py para repartir núcleos
+
+# ───── Bus de invalidación entre workers (LISTEN/NOTIFY) ──────────
+INVALIDATION_BUS = os.getenv("INVALIDATION_BUS", "1") == "1"
+
+# ───── Caché de usuarios (firebase_id → fila) por proceso ────────
+# Con el bus las escrituras invalidan en todos los workers; el TTL sólo
+# cubre avisos perdidos, así que puede ser largo.
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", 3600 if INVALIDATION_BUS else 300))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", 10_000))
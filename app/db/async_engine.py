@@ -1,9 +1,12 @@
 # app/db/async_engine.py
 import ssl, pathlib, urllib.parse as up
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
 from app.core.config import (
-    DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD, AIVEN_CA_PEM
+    DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD, AIVEN_CA_PEM,
+    DB_QUERY_CACHE_SIZE, DB_STATEMENT_CACHE_SIZE,
+    DB_POOL_RECYCLE_SECONDS, DB_CONNECT_TIMEOUT
 )
 
 # URL sin sslmode
@@ -23,11 +26,86 @@ engine_async = create_async_engine(
     echo=False,
     pool_size=10,
     max_overflow=5,
-    connect_args={"ssl": ssl_ctx},   # ← aquí va el contexto
+    pool_pre_ping=True,                      # descarta conexiones muertas al sacarlas del pool
+    pool_recycle=DB_POOL_RECYCLE_SECONDS,
+    query_cache_size=DB_QUERY_CACHE_SIZE,
+    connect_args={
+        "ssl": ssl_ctx,              # ← aquí va el contexto
+        "timeout": DB_CONNECT_TIMEOUT,
+        "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+    },
 )
 
+# Conexiones vivas del pool, para ver cuánto llenan su caché de prepared statements
+_connections = {}
+
+
+@event.listens_for(engine_async.sync_engine, "connect")
+def _track_connection(dbapi_conn, record):
+    _connections[id(dbapi_conn)] = dbapi_conn
+
+
+@event.listens_for(engine_async.sync_engine, "close")
+def _untrack_connection(dbapi_conn, record):
+    _connections.pop(id(dbapi_conn), None)
+
+
+def _cache_len(obj, attr: str):
+    """
+    Entradas de un caché interno (SQLAlchemy / adaptador asyncpg). No son
+    API pública: si el atributo no existe en esta versión → None.
+    """
+    cache = getattr(obj, attr, None)
+    try:
+        return len(cache) if cache is not None else None
+    except TypeError:
+        return None
+
+
+def cache_stats() -> dict:
+    """
+    Ocupación del caché de SQL compilado y del de prepared statements de
+    cada conexión. Conexiones con el caché lleno (`full`) están
+    re-preparando statements: subir DB_STATEMENT_CACHE_SIZE. Los valores
+    que la versión instalada no expone salen como null.
+    """
+    compiled = _cache_len(engine_async.sync_engine, "_compiled_cache")
+    conns = list(_connections.values())
+    prepared = [_cache_len(conn, "_prepared_statement_cache") for conn in conns]
+    available = [n for n in prepared if n is not None]
+    if conns and not available:
+        prepared = None                 # el adaptador no expone el caché
+    return {
+        "compiled_cache": {
+            "entries": compiled,
+            "size":    DB_QUERY_CACHE_SIZE,
+        },
+        "prepared_statements": {
+            "connections": len(conns),
+            "entries":     prepared,
+            "size":        DB_STATEMENT_CACHE_SIZE,
+            "full":        None if prepared is None else sum(n >= DB_STATEMENT_CACHE_SIZE for n in available),
+        },
+    }
+
 AsyncSessionLocal = async_sessionmaker(engine_async, expire_on_commit=False)
 
+
+async def connect_listener():
+    """
+    Conexión asyncpg propia, fuera del pool, para el LISTEN del bus de
+    invalidación: vive lo que el worker y no le quita sitio a los requests.
+    """
+    import asyncpg
+    return await asyncpg.connect(
+        DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1),
+        ssl=ssl_ctx,
+        timeout=DB_CONNECT_TIMEOUT,
+    )
+
 async def get_async_db():
+    # Con la BD caída (circuito abierto) falla rápido con 503
+    from app.services.db_resilience import db_breaker
+    db_breaker.fail_fast()
     async with AsyncSessionLocal() as session:
         yield session
@@ -1,8 +1,7 @@
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy import (
-    Column, String, Integer, Numeric, DateTime, Text, ForeignKey, func
+    Column, String, Integer, Numeric, Float, DateTime, Text, ForeignKey, Index, func
 )
-from datetime import datetime
 
 Base = declarative_base()
 
@@ -19,6 +18,26 @@ class User(Base):
     # ✅ Relación hacia Sessions
     sessions = relationship("Session", back_populates="user")
 
+    # Directorio paginado (GET /users/); DDL en app/db/sql/001_users_directory.sql
+    __table_args__ = (
+        Index("ix_users_created_at_id", created_at.desc(), id.desc()),
+        Index("ix_users_name_prefix", func.lower(name).label("name_lower"),
+              postgresql_ops={"name_lower": "text_pattern_ops"}),
+        Index("ix_users_name_trgm", name, postgresql_using="gin",
+              postgresql_ops={"name": "gin_trgm_ops"}),
+    )
+
+# sessions, session_tasks y baselines están particionadas por mes en
+# created_at (DDL en app/db/sql/002_partition_sessions.sql). En la BD la
+# PK es (session_id, created_at) y no hay FK entre ellas (Postgres no
+# admite FK hacia una tabla particionada sin la clave de partición);
+# el ORM sigue identificando la sesión por session_id, cuya unicidad
+# garantiza SessionId (session_ids, sin particionar).
+#
+# Las filas hijas se crean en la misma transacción que la sesión o
+# después, así que child.created_at >= session.created_at: las
+# relaciones lo incluyen en el JOIN para que Postgres pode las
+# particiones anteriores a la sesión.
 class Session(Base):
     __tablename__ = "sessions"
 
@@ -27,48 +46,113 @@ class Session(Base):
                                 ForeignKey("users.firebase_id",
                                            ondelete="CASCADE"))
     context_type       = Column(String(30),  nullable=False)
-    created_at         = Column(DateTime,    server_default=func.now())
+    created_at         = Column(DateTime,    server_default=func.now(), nullable=False)
     session_avg_stress = Column(Numeric(4, 3))
     session_emotion    = Column(String(30))
     session_arousal    = Column(Numeric(5, 3))
     session_valence    = Column(Numeric(5, 3))
     session_relation   = Column(String(50))
+    # Declaradas al abrir una sesión incremental; las heredan sus tareas (004_session_sampling_rates.sql)
+    eeg_sampling_rate  = Column(Float)
+    ppg_sampling_rate  = Column(Float)
 
     user = relationship("User", back_populates="sessions")
 
-    tasks     = relationship("SessionTask", back_populates="session",
-                             cascade="all, delete")
-    baselines = relationship("Baseline",    back_populates="session",
-                             cascade="all, delete")
+    tasks     = relationship(
+        "SessionTask", back_populates="session", cascade="all, delete",
+        primaryjoin="and_(Session.session_id == foreign(SessionTask.session_id), "
+                    "SessionTask.created_at >= Session.created_at)",
+    )
+    baselines = relationship(
+        "Baseline", back_populates="session", cascade="all, delete",
+        primaryjoin="and_(Session.session_id == foreign(Baseline.session_id), "
+                    "Baseline.created_at >= Session.created_at)",
+    )
+
+    __table_args__ = (
+        Index("ix_sessions_relation_created_at", session_relation, created_at),
+        Index("ix_sessions_user_created_at", user_firebase_id, created_at.desc()),
+    )
     
 
+class SessionId(Base):
+    """
+    Registro de session_id: la PK de sessions incluye created_at, así que
+    la unicidad entre particiones se impone aquí, insertando en la misma
+    transacción que la sesión (ver claim_session_id).
+    """
+    __tablename__ = "session_ids"
+
+    session_id = Column(String(500), primary_key=True)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+
 class Baseline(Base):
     __tablename__ = 'baselines'
     
     id = Column(Integer, primary_key=True)
-    session_id = Column(String, ForeignKey('sessions.session_id'), nullable=False)  # ← CLAVE FORÁNEA
+    session_id = Column(String, nullable=False)  # ← sesión (sin FK: tabla particionada)
     baseline_eeg_theta_beta = Column(Numeric(5, 3))
     baseline_hrv_lf_hf = Column(Numeric(5, 3))
     baseline_hr = Column(Numeric(5, 2))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Hora del servidor, como sessions.created_at (misma transacción → mismo valor)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
     
     # Relación hacia Session (opcional)
-    session = relationship("Session", back_populates="baselines")
+    session = relationship(
+        "Session", back_populates="baselines",
+        primaryjoin="and_(Session.session_id == foreign(Baseline.session_id), "
+                    "Baseline.created_at >= Session.created_at)",
+    )
+
+    __table_args__ = (
+        Index("ix_baselines_session_created_at", session_id, created_at),
+    )
 
 
 class SessionTask(Base):
     __tablename__ = "session_tasks"
 
     id                = Column(Integer, primary_key=True)
-    session_id        = Column(String(500),
-                               ForeignKey("sessions.session_id",
-                                          ondelete="CASCADE"))
+    session_id        = Column(String(500), nullable=False)   # sin FK: tabla particionada
     task_id           = Column(String(50), nullable=False)
     task_name         = Column(String(200), nullable=False)
     normalized_stress = Column(Numeric(4, 3), nullable=False)
     emotion_label     = Column(String(30),   nullable=False)
     heart_rate        = Column(Numeric(5, 2))  # ✅ Nueva columna para HR
+    # Sin redondear: la media de la sesión incremental sale de aquí (003_session_task_axes.sql)
+    arousal           = Column(Float)
+    valence           = Column(Float)
     readings_file     = Column(Text)
-    created_at        = Column(DateTime, server_default=func.now())
+    created_at        = Column(DateTime, server_default=func.now(), nullable=False)
+
+    session = relationship(
+        "Session", back_populates="tasks",
+        primaryjoin="and_(Session.session_id == foreign(SessionTask.session_id), "
+                    "SessionTask.created_at >= Session.created_at)",
+    )
+
+    __table_args__ = (
+        Index("ix_session_tasks_session_created_at", session_id, created_at),
+    )
+
+
+# ───── Agregados que sobreviven al archivado de particiones ──────
+class SessionMonthlyAggregate(Base):
+    """
+    Un registro por (mes, usuario, context_type), calculado antes de
+    archivar una partición (app/services/partitions.py).
+    """
+    __tablename__ = "session_monthly_aggregates"
 
-    session = relationship("Session", back_populates="tasks")
+    month              = Column(DateTime, primary_key=True)
+    user_firebase_id   = Column(String(255), primary_key=True)
+    context_type       = Column(String(30), primary_key=True)
+    sessions           = Column(Integer, nullable=False)
+    tasks              = Column(Integer, nullable=False)
+    avg_session_stress = Column(Numeric(6, 4))
+    avg_arousal        = Column(Numeric(6, 4))
+    avg_valence        = Column(Numeric(6, 4))
+    avg_task_stress    = Column(Numeric(6, 4))
+    avg_heart_rate     = Column(Numeric(6, 2))
+    archived_at        = Column(DateTime, server_default=func.now(), nullable=False)
@@ -0,0 +1,20 @@
+-- app/db/sql/001_users_directory.sql
+-- Índices del directorio de usuarios (GET /users/).
+-- CONCURRENTLY no bloquea escrituras; correr fuera de una transacción:
+--   psql "$DATABASE_URL" -f app/db/sql/001_users_directory.sql
+
+-- Keyset: ORDER BY created_at DESC, id DESC con (created_at, id) < (...)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_created_at_id
+    ON users (created_at DESC, id DESC);
+
+-- Búsqueda por prefijo: lower(name) LIKE 'abc%'
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_name_prefix
+    ON users (lower(name) text_pattern_ops);
+
+-- Búsqueda aproximada: name % 'abc' (pg_trgm)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_name_trgm
+    ON users USING gin (name gin_trgm_ops);
+
+-- X-Total-Estimate usa pg_class.reltuples: que esté poblado
+ANALYZE users;
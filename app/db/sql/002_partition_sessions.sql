@@ -0,0 +1,189 @@
+-- app/db/sql/002_partition_sessions.sql
+-- Particiona sessions, session_tasks y baselines por mes en created_at.
+--
+-- Copia los datos a las tablas nuevas y deja las viejas como *_legacy
+-- (borrarlas a mano tras verificar). Bloquea las tres tablas mientras
+-- dura: correr en una ventana sin subidas.
+--   psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f app/db/sql/002_partition_sessions.sql
+--
+-- Después, las particiones futuras y el archivado:
+--   python -m app.services.partitions ensure
+--   python -m app.services.partitions archive --older-than 12
+--
+-- Cambios de esquema que impone el particionado:
+-- * La PK de sessions pasa a (session_id, created_at), que no impide
+--   repetir un session_id en meses distintos. La unicidad la garantiza
+--   la tabla session_ids (sin particionar, PK session_id): las
+--   escrituras insertan ahí en la misma transacción que la sesión y un
+--   duplicado choca con la PK. El archivado no la toca, así que un id
+--   archivado no se puede reutilizar; borrar una sesión sí lo libera.
+-- * No hay FK de session_tasks/baselines a sessions (Postgres no la
+--   admite sin la clave de partición); el ON DELETE CASCADE lo hace el
+--   trigger sessions_delete_children.
+-- * Las filas hijas guardan created_at >= el de su sesión (las
+--   consultas lo usan para podar particiones); los datos viejos se
+--   ajustan con GREATEST al copiarlos.
+
+BEGIN;
+
+-- ───── Tablas viejas → *_legacy ─────────────────────────────────
+ALTER TABLE session_tasks RENAME TO session_tasks_legacy;
+ALTER TABLE baselines     RENAME TO baselines_legacy;
+ALTER TABLE sessions      RENAME TO sessions_legacy;
+
+ALTER INDEX IF EXISTS session_tasks_pkey RENAME TO session_tasks_legacy_pkey;
+ALTER INDEX IF EXISTS baselines_pkey     RENAME TO baselines_legacy_pkey;
+ALTER INDEX IF EXISTS sessions_pkey      RENAME TO sessions_legacy_pkey;
+
+-- Las secuencias de id pasan a las tablas nuevas
+ALTER SEQUENCE session_tasks_id_seq OWNED BY NONE;
+ALTER SEQUENCE baselines_id_seq     OWNED BY NONE;
+
+-- ───── Tablas particionadas ─────────────────────────────────────
+CREATE TABLE sessions (
+    session_id         varchar(500) NOT NULL,
+    user_firebase_id   varchar(255) REFERENCES users (firebase_id) ON DELETE CASCADE,
+    context_type       varchar(30)  NOT NULL,
+    created_at         timestamp    NOT NULL DEFAULT now(),
+    session_avg_stress numeric(4, 3),
+    session_emotion    varchar(30),
+    session_arousal    numeric(5, 3),
+    session_valence    numeric(5, 3),
+    session_relation   varchar(50),
+    PRIMARY KEY (session_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE session_tasks (
+    id                integer      NOT NULL DEFAULT nextval('session_tasks_id_seq'),
+    session_id        varchar(500) NOT NULL,
+    task_id           varchar(50)  NOT NULL,
+    task_name         varchar(200) NOT NULL,
+    normalized_stress numeric(4, 3) NOT NULL,
+    emotion_label     varchar(30)  NOT NULL,
+    heart_rate        numeric(5, 2),
+    readings_file     text,
+    created_at        timestamp    NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE baselines (
+    id                      integer   NOT NULL DEFAULT nextval('baselines_id_seq'),
+    session_id              varchar   NOT NULL,
+    baseline_eeg_theta_beta numeric(5, 3),
+    baseline_hrv_lf_hf      numeric(5, 3),
+    baseline_hr             numeric(5, 2),
+    created_at              timestamp NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Registro de session_id únicos (ver cabecera)
+CREATE TABLE session_ids (
+    session_id varchar(500) PRIMARY KEY,
+    created_at timestamp    NOT NULL DEFAULT now()
+);
+
+ALTER SEQUENCE session_tasks_id_seq OWNED BY session_tasks.id;
+ALTER SEQUENCE baselines_id_seq     OWNED BY baselines.id;
+
+-- Red de seguridad si `ensure` no corrió: debe quedar vacía
+CREATE TABLE sessions_default      PARTITION OF sessions      DEFAULT;
+CREATE TABLE session_tasks_default PARTITION OF session_tasks DEFAULT;
+CREATE TABLE baselines_default     PARTITION OF baselines     DEFAULT;
+
+-- ───── Particiones mensuales: <tabla>_yYYYYmMM ─────────────────
+CREATE OR REPLACE FUNCTION ensure_month_partitions(parent text, first_month date, last_month date)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    m       date := date_trunc('month', first_month);
+    name    text;
+    created integer := 0;
+BEGIN
+    WHILE m <= last_month LOOP
+        name := format('%s_y%sm%s', parent, to_char(m, 'YYYY'), to_char(m, 'MM'));
+        IF to_regclass(name) IS NULL THEN
+            EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           name, parent, m, (m + interval '1 month')::date);
+            created := created + 1;
+        END IF;
+        m := (m + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END $$;
+
+SELECT ensure_month_partitions(t,
+           (SELECT coalesce(min(created_at), now())::date FROM sessions_legacy),
+           (now() + interval '3 months')::date)
+FROM unnest(ARRAY['sessions', 'session_tasks', 'baselines']) AS t;
+
+-- ───── Datos ────────────────────────────────────────────────────
+INSERT INTO sessions (session_id, user_firebase_id, context_type, created_at,
+                      session_avg_stress, session_emotion, session_arousal,
+                      session_valence, session_relation)
+SELECT session_id, user_firebase_id, context_type, coalesce(created_at, now()),
+       session_avg_stress, session_emotion, session_arousal,
+       session_valence, session_relation
+FROM sessions_legacy;
+
+INSERT INTO session_ids (session_id, created_at)
+SELECT session_id, created_at FROM sessions;
+
+-- Filas hijas sin session_id quedan sólo en *_legacy
+INSERT INTO session_tasks (id, session_id, task_id, task_name, normalized_stress,
+                           emotion_label, heart_rate, readings_file, created_at)
+SELECT t.id, t.session_id, t.task_id, t.task_name, t.normalized_stress,
+       t.emotion_label, t.heart_rate, t.readings_file,
+       GREATEST(t.created_at, s.created_at, (SELECT min(created_at) FROM sessions))
+FROM session_tasks_legacy t
+LEFT JOIN sessions s USING (session_id)
+WHERE t.session_id IS NOT NULL;
+
+INSERT INTO baselines (id, session_id, baseline_eeg_theta_beta, baseline_hrv_lf_hf,
+                       baseline_hr, created_at)
+SELECT b.id, b.session_id, b.baseline_eeg_theta_beta, b.baseline_hrv_lf_hf,
+       b.baseline_hr,
+       GREATEST(b.created_at, s.created_at, (SELECT min(created_at) FROM sessions))
+FROM baselines_legacy b
+LEFT JOIN sessions s USING (session_id)
+WHERE b.session_id IS NOT NULL;
+
+-- ───── Índices (se propagan a cada partición) ───────────────────
+CREATE INDEX ix_sessions_relation_created_at     ON sessions (session_relation, created_at);
+CREATE INDEX ix_sessions_user_created_at         ON sessions (user_firebase_id, created_at DESC);
+CREATE INDEX ix_session_tasks_session_created_at ON session_tasks (session_id, created_at);
+CREATE INDEX ix_baselines_session_created_at     ON baselines (session_id, created_at);
+
+-- ───── ON DELETE CASCADE de sesión → tareas, baselines y registro ─
+CREATE OR REPLACE FUNCTION delete_session_children() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM session_tasks WHERE session_id = OLD.session_id AND created_at >= OLD.created_at;
+    DELETE FROM baselines     WHERE session_id = OLD.session_id AND created_at >= OLD.created_at;
+    DELETE FROM session_ids   WHERE session_id = OLD.session_id;
+    RETURN OLD;
+END $$;
+
+CREATE TRIGGER sessions_delete_children
+    AFTER DELETE ON sessions
+    FOR EACH ROW EXECUTE FUNCTION delete_session_children();
+
+-- ───── Agregados que sobreviven al archivado ────────────────────
+CREATE TABLE IF NOT EXISTS session_monthly_aggregates (
+    month              timestamp    NOT NULL,
+    user_firebase_id   varchar(255) NOT NULL,
+    context_type       varchar(30)  NOT NULL,
+    sessions           integer      NOT NULL,
+    tasks              integer      NOT NULL,
+    avg_session_stress numeric(6, 4),
+    avg_arousal        numeric(6, 4),
+    avg_valence        numeric(6, 4),
+    avg_task_stress    numeric(6, 4),
+    avg_heart_rate     numeric(6, 2),
+    archived_at        timestamp    NOT NULL DEFAULT now(),
+    PRIMARY KEY (month, user_firebase_id, context_type)
+);
+
+COMMIT;
+
+ANALYZE sessions;
+ANALYZE session_tasks;
+ANALYZE baselines;
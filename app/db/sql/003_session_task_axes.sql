@@ -0,0 +1,14 @@
+-- app/db/sql/003_session_task_axes.sql
+-- Arousal/valence de cada tarea a precisión completa.
+--
+-- Las sesiones incrementales derivan la media de la sesión de estas
+-- columnas (avg sobre sus tareas) en vez de re-promediar el valor
+-- redondeado a numeric(5,3) de sessions en cada tarea.
+--   psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f app/db/sql/003_session_task_axes.sql
+--
+-- Las columnas se propagan a todas las particiones; las tareas viejas
+-- quedan con NULL (avg las ignora).
+
+ALTER TABLE session_tasks
+    ADD COLUMN IF NOT EXISTS arousal double precision,
+    ADD COLUMN IF NOT EXISTS valence double precision;
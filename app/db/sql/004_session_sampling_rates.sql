@@ -0,0 +1,12 @@
+-- app/db/sql/004_session_sampling_rates.sql
+-- Frecuencias de muestreo declaradas al abrir una sesión incremental.
+--
+-- Las tareas que llegan después sin eegSamplingRate/ppgSamplingRate
+-- heredan éstas, igual que en un SessionPayload completo.
+--   psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f app/db/sql/004_session_sampling_rates.sql
+--
+-- NULL = frecuencias canónicas (256 Hz EEG, 64 Hz PPG).
+
+ALTER TABLE sessions
+    ADD COLUMN IF NOT EXISTS eeg_sampling_rate double precision,
+    ADD COLUMN IF NOT EXISTS ppg_sampling_rate double precision;
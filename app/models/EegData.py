@@ -1,6 +1,7 @@
-from pydantic import BaseModel
-from typing import List, Dict, Any
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional
 
 class EegDataRequest(BaseModel):
     usuario_id: int
     eeg_data: List[Dict[str, Any]]
+    sampling_rate: Optional[float] = Field(None, ge=16, le=4096)   # Hz; None = 256 (Muse)
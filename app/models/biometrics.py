@@ -1,42 +1,92 @@
-from typing import List, Literal, Optional
-from pydantic import BaseModel, validator
+from typing import Annotated, List, Literal, Optional
+
+import numpy as np
+from pydantic import (
+    BaseModel, BeforeValidator, ConfigDict, Field, PlainSerializer, WithJsonSchema,
+    model_validator,
+)
 
 EEGChannel = Literal["TP9", "AF7", "AF8", "TP10"]
 
+
+# ───── Muestras: lista JSON → array float64 ──────────────────────
+def to_samples(v, drop_null: bool = False) -> np.ndarray:
+    """
+    Muestras → array float64. Del body llegan ya como array (ver
+    payload_stream.PayloadBuilder); una lista se revisa elemento a
+    elemento: sólo números o null, nada de strings ni booleanos que
+    NumPy convertiría en silencio. Los null quedan como NaN (huecos, ver
+    finite_samples) o se descartan con drop_null.
+    """
+    if v is None:
+        return np.empty(0)
+    if isinstance(v, np.ndarray):
+        if v.dtype.kind not in "iuf":
+            raise ValueError("samples must be numbers")
+        arr = v.astype(np.float64, copy=False)
+    elif isinstance(v, (list, tuple)):
+        if not all(x is None or (isinstance(x, (int, float)) and not isinstance(x, bool)) for x in v):
+            raise ValueError("samples must be numbers")
+        arr = np.asarray(v, dtype=np.float64)
+    else:
+        raise ValueError("samples must be a list of numbers")
+    if arr.ndim != 1:
+        raise ValueError("samples must be a flat list of numbers")
+    if drop_null:
+        arr = arr[~np.isnan(arr)]
+    return arr
+
+
+_SAMPLES_SCHEMA = {"type": "array", "items": {"type": "number", "nullable": True}}
+_as_list = PlainSerializer(lambda a: np.asarray(a).tolist(), return_type=list)
+
+# EEG: null internos → NaN (huecos); PPG/HR: null internos se descartan
+Samples = Annotated[np.ndarray, BeforeValidator(to_samples), _as_list,
+                    WithJsonSchema(_SAMPLES_SCHEMA)]
+CleanSamples = Annotated[np.ndarray, BeforeValidator(lambda v: to_samples(v, drop_null=True)),
+                         _as_list, WithJsonSchema(_SAMPLES_SCHEMA)]
+
+# Frecuencia de muestreo del dispositivo (Hz). None = las canónicas del
+# Muse-2 (EEG 256, PPG 64); si no, el DSP remuestrea (ver resampling.py)
+SamplingRate = Optional[float]
+RATE_LIMITS = {"ge": 16, "le": 4096}
+
+
+def inherit_rates(parent, children) -> None:
+    """Las frecuencias de la sesión valen para restData/tareas que no declaran las suyas."""
+    for child in children:
+        if child.eegSamplingRate is None:
+            child.eegSamplingRate = parent.eegSamplingRate
+        if child.ppgSamplingRate is None:
+            child.ppgSamplingRate = parent.ppgSamplingRate
+
 class ChannelPacket(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     channel: EEGChannel
-    values: List[float]
+    values: Samples
 
 class RestData(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     eeg: List[ChannelPacket]
-    ppg: Optional[List[Optional[float]]] = None   # permite None internos
-    hr:  Optional[List[Optional[float]]] = None
-
-    # → Filtramos antes de la validación de tipo
-    @validator("ppg", "hr", pre=True)
-    def clean_numeric_list(cls, v):
-        if v is None:
-            return []            # campo omitido o null → lista vacía
-        if isinstance(v, list):
-            return [x for x in v if x is not None]
-        raise TypeError("ppg/hr must be list or null")
+    ppg: CleanSamples = Field(default_factory=lambda: np.empty(0))   # null → vacío
+    hr:  CleanSamples = Field(default_factory=lambda: np.empty(0))
+    eegSamplingRate: SamplingRate = Field(None, **RATE_LIMITS)
+    ppgSamplingRate: SamplingRate = Field(None, **RATE_LIMITS)
 
 class TaskPacket(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     taskId:      str
     taskName:    str
     userRating:  int
     explanation: Optional[str] = None
     eeg: List[ChannelPacket]
-    ppg: Optional[List[Optional[float]]] = None
-    hr:  Optional[List[Optional[float]]] = None
-
-    @validator("ppg", "hr", pre=True)
-    def clean_numeric_list(cls, v):
-        if v is None:
-            return []
-        if isinstance(v, list):
-            return [x for x in v if x is not None]
-        raise TypeError("ppg/hr must be list or null")
+    ppg: CleanSamples = Field(default_factory=lambda: np.empty(0))
+    hr:  CleanSamples = Field(default_factory=lambda: np.empty(0))
+    eegSamplingRate: SamplingRate = Field(None, **RATE_LIMITS)
+    ppgSamplingRate: SamplingRate = Field(None, **RATE_LIMITS)
 
 class SessionPayload(BaseModel):
     sessionId:      str
@@ -46,3 +96,26 @@ class SessionPayload(BaseModel):
     sessionRelation: Optional[str] = None
     restData:       RestData
     tasks:          List[TaskPacket]
+    eegSamplingRate: SamplingRate = Field(None, **RATE_LIMITS)
+    ppgSamplingRate: SamplingRate = Field(None, **RATE_LIMITS)
+
+    @model_validator(mode="after")
+    def propagate_rates(self):
+        inherit_rates(self, [self.restData, *self.tasks])
+        return self
+
+class SessionOpenRequest(BaseModel):
+    """Apertura de una sesión incremental: reposo ahora, tareas después."""
+    sessionId:      str
+    userFirebaseId: str
+    participantId:  str
+    contextType:    Literal["task_evaluation", "meeting", "calibration"]
+    sessionRelation: Optional[str] = None
+    restData:       RestData
+    eegSamplingRate: SamplingRate = Field(None, **RATE_LIMITS)
+    ppgSamplingRate: SamplingRate = Field(None, **RATE_LIMITS)
+
+    @model_validator(mode="after")
+    def propagate_rates(self):
+        inherit_rates(self, [self.restData])
+        return self
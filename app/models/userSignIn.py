@@ -1,8 +1,11 @@
 from pydantic import BaseModel
-from typing      import Optional
+from typing      import List, Optional
 
 class SignInRequest(BaseModel):
     firebase_id: str
     name: str
     avatar_url: Optional[str] = None
     gender: Optional[str] = None
+
+class BulkSignInRequest(BaseModel):
+    users: List[SignInRequest]
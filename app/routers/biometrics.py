@@ -1,19 +1,170 @@
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.async_engine import get_async_db
-from app.models.biometrics import SessionPayload
+import os
+import re
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Query, Request
+from fastapi.responses import FileResponse
+from app.models.biometrics import SessionOpenRequest, SessionPayload, TaskPacket
+from app.models.EegData import EegDataRequest
+from app.services.eeg_analysis import quick_emotion
 from app.services.process_session import process_session
+from app.services.incremental_session import open_session, append_task, finalize_session
+from app.services.admission import dsp_admission, run_admitted
+from app.services.db_resilience import db_breaker
+from app.services import profiling
+from app.services.payload_stream import BodyReader, parse_payload, MAX_BODY_BYTES
 
 router = APIRouter(prefix="/biometrics", tags=["Biometrics"])
 
-@router.post("/process", status_code=202)
+
+def json_body(model) -> dict:
+    """
+    requestBody de OpenAPI para endpoints que leen el body a mano
+    (Request): el esquema del modelo con sus $defs resueltos en línea.
+    """
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    def inline(node):
+        if isinstance(node, dict):
+            ref = node.get("$ref", "")
+            if ref.startswith("#/$defs/"):
+                return inline(defs[ref[len("#/$defs/"):]])
+            return {k: inline(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [inline(v) for v in node]
+        return node
+
+    return {"requestBody": {"required": True,
+                            "content": {"application/json": {"schema": inline(schema)}}}}
+
+
+async def read_body(request: Request, model):
+    """
+    Body JSON → modelo, con los topes de /process: 413 por Content-Length
+    o bytes descomprimidos (MAX_BODY_MB) y 503 si el DSP ya no admite esos
+    bytes. Devuelve (modelo, bytes leídos) para la admisión.
+    """
+    # ✅ Rechazar antes de leer el body si ya se sabe que no cabe
+    nbytes = int(request.headers.get("content-length") or 0)
+    if nbytes > MAX_BODY_BYTES:
+        raise HTTPException(413, f"Request body exceeds {MAX_BODY_BYTES} bytes")
+    dsp_admission.check_capacity(nbytes)
+
+    reader = BodyReader(request.stream(), content_encoding=request.headers.get("content-encoding"))
+    return await parse_payload(reader, model), reader.total
+
+
+@router.post("/process", status_code=202, openapi_extra=json_body(SessionPayload))
 async def process_biometric_session(
-    payload: SessionPayload,
+    request: Request,
     background_tasks: BackgroundTasks,
-    db: AsyncSession = Depends(get_async_db)
 ):
+    """
+    Recibe un SessionPayload (JSON, opcionalmente con Content-Encoding
+    gzip/deflate/zstd). El body se parsea en streaming, trozo a trozo en
+    un hilo: las muestras EEG/PPG/HR van directo a arrays NumPy, con tope de tamaño
+    descomprimido (MAX_BODY_MB) y de muestras por canal (MAX_SAMPLES_PER_CHANNEL).
+    El 202 no consulta la BD: un sessionId ya registrado se detecta al
+    escribir (session_ids) y la sesión se descarta con aviso en el log.
+    """
+    payload, nbytes = await read_body(request, SessionPayload)
+
     if not payload.tasks:
         raise HTTPException(400, "tasks list empty")
-    background_tasks.add_task(process_session, payload, db)
+    profiling.tag(session_id=payload.sessionId, user=payload.userFirebaseId)
+
+    # ✅ Control de admisión: 429/503 con Retry-After si el DSP está saturado
+    ticket = dsp_admission.admit(payload.userFirebaseId, nbytes)
+
+    # ✅ Sin sesión de BD del request: el pipeline abre la suya sólo para escribir
+    background_tasks.add_task(run_admitted, ticket, process_session, payload)
     return {"detail": "accepted"}
 
+
+# ───── Sesiones incrementales ────────────────────────────────────
+@router.post("/sessions/open", status_code=201, openapi_extra=json_body(SessionOpenRequest))
+async def open_incremental_session(request: Request):
+    """
+    Abre una sesión con los datos de reposo; el baseline se calcula y
+    guarda en el acto. Las tareas se agregan después, una a una.
+    """
+    req, nbytes = await read_body(request, SessionOpenRequest)
+    ticket = dsp_admission.admit(req.userFirebaseId, nbytes)
+    try:
+        return await open_session(req)
+    finally:
+        ticket.release()
+
+
+@router.post("/sessions/{session_id}/tasks", openapi_extra=json_body(TaskPacket))
+async def append_session_task(
+    session_id: str,
+    request: Request,
+    participant_id: Optional[str] = Query(None, alias="participantId"),
+):
+    """
+    Procesa y guarda una tarea apenas termina; devuelve su estrés/emoción/HR.
+    409 si la sesión ya se cerró.
+    """
+    task, nbytes = await read_body(request, TaskPacket)
+    # Sin usuario en la ruta: el rate limit va por participante (o sesión)
+    ticket = dsp_admission.admit(participant_id or session_id, nbytes)
+    try:
+        return await append_task(session_id, task, participant_id)
+    finally:
+        ticket.release()
+
+
+@router.post("/sessions/{session_id}/finalize")
+async def finalize_incremental_session(session_id: str):
+    """Cierra la sesión: emoción y estrés medio a partir de la media de sus tareas."""
+    return await finalize_session(session_id)
+
+
+@router.post("/quick-emotion")
+async def quick_emotion_from_eeg(req: EegDataRequest):
+    """
+    Emoción aproximada de unos segundos de EEG crudo (paquetes Muse), para
+    feedback inmediato durante una tarea. Sin BD ni pool DSP: una FFT
+    corta sobre AF7/AF8 (θ/α y asimetría α), < 1 ms de cómputo. Otros
+    dispositivos declaran su frecuencia en sampling_rate.
+    """
+    try:
+        return quick_emotion(req.eeg_data, req.sampling_rate)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(400, f"Invalid EEG packets: {e}")
+
+
+@router.get("/load")
+async def get_dsp_load():
+    """
+    Carga actual del DSP en este worker (trabajos en curso, bytes, rechazos)
+    y estado del circuito de la BD (con trabajos aparcados)
+    """
+    return {**dsp_admission.snapshot(), "database": db_breaker.snapshot()}
+
+
+# ───── Perfiles de requests (admin) ──────────────────────────────
+PROFILE_FILES = {"profile.json": "application/json", "flame.svg": "image/svg+xml",
+                 "stacks.folded": "text/plain"}
+
+
+@router.get("/profiles/{profile_id}/{filename}")
+async def get_request_profile(
+    profile_id: str,
+    filename: str,
+    x_profile_token: Optional[str] = Header(None),
+):
+    """
+    Resultado de un request perfilado con X-Profile-Token (el id llega en
+    X-Profile-Id): profile.json, flame.svg o stacks.folded
+    """
+    if not profiling.token_ok(x_profile_token):
+        raise HTTPException(403, "Invalid profile token")
+    if not re.fullmatch(r"[0-9a-f]{32}", profile_id) or filename not in PROFILE_FILES:
+        raise HTTPException(404, "Profile not found")
+    path = os.path.join(profiling.profile_dir(profile_id), filename)
+    if not os.path.exists(path):
+        # /process: el perfil se guarda al terminar el trabajo en background
+        raise HTTPException(404, "Profile not found (or job still running)")
+    return FileResponse(path, media_type=PROFILE_FILES[filename])
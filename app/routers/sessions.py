@@ -1,102 +1,129 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
-from sqlalchemy import select
-from typing import List
+from sqlalchemy import select, func, literal_column, and_
+from typing import List, Literal, Optional
+from datetime import datetime, timedelta, timezone
+import importlib.util
+import numpy as np
+import orjson
 
-from app.db.async_engine import get_async_db
-from app.db.models_bio import Session, User, SessionTask, Baseline
-from app.models.session_response import SessionGroupResponse, SessionResponse, TaskResponse, BaselineResponse
+from app.db.async_engine import get_async_db, AsyncSessionLocal, cache_stats
+from app.db.models_bio import Session, SessionTask
+from app.models.session_response import SessionGroupResponse, SessionResponse
+from app.services.session_serializer import sessions_to_dicts, matches_project, ndjson_line
+from app.services.user_cache import get_users, user_cache
+from app.services.session_queries import (
+    STREAM_BATCH_SIZE, since_or_default, SESSIONS_BY_RELATION, SESSIONS_BY_RELATION_STREAM,
+    USER_SESSIONS, USER_SESSIONS_STREAM
+)
+from app.services import invalidation
+from app.services.relation_live import subscribe
+from app.services.export import export_stmt, stream_csv, stream_parquet
+from app.services.downsampling import lttb
 
 router = APIRouter(prefix="/sessions", tags=["Sessions"])
 
+# Series temporales: tamaño de bucket → unidad de date_trunc
+TIMESERIES_BUCKETS = {"1h": "hour", "1d": "day", "1w": "week"}
+BUCKET_STEPS = {"1h": timedelta(hours=1), "1d": timedelta(days=1), "1w": timedelta(weeks=1)}
+# Tope de buckets tras rellenar huecos (≈ 1 año por hora)
+MAX_TIMESERIES_BUCKETS = 10_000
+# Métrica → (columna, tabla de la que sale el created_at)
+TIMESERIES_METRICS = {
+    "stress":  (SessionTask.normalized_stress, SessionTask),
+    "hr":      (SessionTask.heart_rate,        SessionTask),
+    "arousal": (Session.session_arousal,       Session),
+    "valence": (Session.session_valence,       Session),
+}
+
+
+async def stream_sessions_ndjson(stmt, params: dict, project_id: str = None):
+    """Emite una línea NDJSON por sesión conforme salen del cursor."""
+    # ✅ Sesión propia: la del request puede cerrarse antes de terminar el stream
+    async with AsyncSessionLocal() as db:
+        result = await db.stream_scalars(stmt, params)
+        async for batch in result.partitions(STREAM_BATCH_SIZE):
+            batch = [s for s in batch if matches_project(s.session_id, project_id)]
+            users = await get_users(db, (s.user_firebase_id for s in batch))
+            for data in sessions_to_dicts(batch, users):
+                yield ndjson_line(data)
+
+
+@router.get("/export")
+async def export_sessions(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    context_type: Optional[str] = None,
+    session_relation: Optional[str] = None,
+    format: Literal["csv", "parquet"] = "csv",
+):
+    """
+    Exporta tareas + datos de sesión en CSV o Parquet, leyendo por lotes
+    de un cursor del servidor (memoria constante, una sola conexión)
+    """
+    stmt = export_stmt(date_from, date_to, context_type, session_relation)
+
+    if format == "parquet":
+        if importlib.util.find_spec("pyarrow") is None:
+            raise HTTPException(status_code=400, detail="Parquet export requires pyarrow")
+        return StreamingResponse(
+            stream_parquet(stmt),
+            media_type="application/vnd.apache.parquet",
+            headers={"Content-Disposition": 'attachment; filename="sessions.parquet"'}
+        )
+
+    return StreamingResponse(
+        stream_csv(stmt),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="sessions.csv"'}
+    )
+
+
+@router.get("/cache-stats")
+async def get_cache_stats():
+    """Estado de las cachés de este worker (SQL compilado, prepared statements, usuarios)"""
+    return {
+        **cache_stats(),
+        "users":        user_cache.snapshot(),
+        "invalidation": invalidation.stats,
+    }
+
+
 @router.get("/by-relation/{session_relation}", response_model=SessionGroupResponse)
 async def get_sessions_by_relation(
     session_relation: str,
+    since: Optional[datetime] = None,
     db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtiene todas las sesiones agrupadas por session_relation
     con información completa de usuarios y tareas
+    creadas desde `since` (por defecto, los últimos SESSIONS_DEFAULT_DAYS días:
+    lee sólo las particiones recientes)
     """
     try:
-        # Query con joins para obtener toda la información necesaria
-        stmt = (
-            select(Session)
-            .options(
-                joinedload(Session.user),
-                joinedload(Session.tasks),
-                joinedload(Session.baselines)
-            )
-            .join(User)
-            .where(Session.session_relation == session_relation)
-            .order_by(Session.created_at)
-        )
-        
-        result = await db.execute(stmt)
+        result = await db.execute(SESSIONS_BY_RELATION,
+                                  {"session_relation": session_relation, "since": since_or_default(since)})
         sessions = result.scalars().unique().all()
-        
+        users = await get_users(db, (s.user_firebase_id for s in sessions))
+        sessions = [s for s in sessions if s.user_firebase_id in users]
+
         if not sessions:
             raise HTTPException(
-                status_code=404, 
+                status_code=404,
                 detail=f"No sessions found for relation: {session_relation}"
             )
-        
-        # Construir respuesta
-        session_responses = []
-        
-        for session in sessions:
-            # Baseline (tomar el primero si existe)
-            baseline_data = None
-            if session.baselines:
-                baseline = session.baselines[0]
-                baseline_data = BaselineResponse(
-                    baseline_eeg_theta_beta=float(baseline.baseline_eeg_theta_beta) if baseline.baseline_eeg_theta_beta else None,
-                    baseline_hrv_lf_hf=float(baseline.baseline_hrv_lf_hf) if baseline.baseline_hrv_lf_hf else None,
-                    baseline_hr=float(baseline.baseline_hr) if baseline.baseline_hr else None
-                )
-            
-            # Tasks
-            task_responses = [
-                TaskResponse(
-                    task_id=task.task_id,
-                    task_name=task.task_name,
-                    normalized_stress=float(task.normalized_stress),
-                    emotion_label=task.emotion_label,
-                    heart_rate=float(task.heart_rate) if task.heart_rate else None,
-                    created_at=task.created_at
-                )
-                for task in session.tasks
-            ]
-            
-            # Session completa
-            session_response = SessionResponse(
-                session_id=session.session_id,
-                context_type=session.context_type,
-                created_at=session.created_at,
-                session_avg_stress=float(session.session_avg_stress) if session.session_avg_stress else None,
-                session_emotion=session.session_emotion,
-                session_arousal=float(session.session_arousal) if session.session_arousal else None,
-                session_valence=float(session.session_valence) if session.session_valence else None,
-                
-                # Usuario info
-                user_name=session.user.name,
-                user_avatar_url=session.user.avatar_url,
-                user_firebase_id=session.user.firebase_id,
-                
-                # Datos relacionados
-                baseline=baseline_data,
-                tasks=task_responses
-            )
-            
-            session_responses.append(session_response)
-        
-        return SessionGroupResponse(
-            session_relation=session_relation,
-            total_participants=len(session_responses),
-            sessions=session_responses
-        )
-        
+
+        # ✅ Construir respuesta como dicts y serializar con orjson
+        session_responses = sessions_to_dicts(sessions, users)
+
+        return ORJSONResponse({
+            "session_relation": session_relation,
+            "total_participants": len(session_responses),
+            "sessions": session_responses
+        })
+
     except HTTPException:
         raise
     except Exception as e:
@@ -104,113 +131,211 @@ async def get_sessions_by_relation(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.get("/by-relation/{session_relation}/stream")
+async def stream_sessions_by_relation(session_relation: str, since: Optional[datetime] = None):
+    """
+    Igual que /by-relation pero en NDJSON (una sesión por línea),
+    sin mantener la lista completa en memoria
+    """
+    return StreamingResponse(
+        stream_sessions_ndjson(SESSIONS_BY_RELATION_STREAM,
+                               {"session_relation": session_relation, "since": since_or_default(since)}),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.get("/by-relation/{session_relation}/live")
+async def live_sessions_by_relation(session_relation: str):
+    """
+    Server-Sent Events con la estadística de grupo (stress/arousal/valence)
+    de una reunión, actualizada conforme se procesa cada participante
+    """
+    async def events():
+        async for snapshot in subscribe(session_relation):
+            if snapshot is None:
+                yield b": keepalive\n\n"
+            else:
+                yield b"data: " + orjson.dumps(snapshot) + b"\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def timeseries_stmt(firebase_id: str, bucket: str, metric: str,
+                    date_from: Optional[datetime] = None, date_to: Optional[datetime] = None):
+    """Agregado por bucket (date_trunc) de una métrica, calculado en SQL."""
+    column, source = TIMESERIES_METRICS[metric]
+    # Unidad literal (viene de un dict fijo) para que SELECT y GROUP BY coincidan
+    unit = literal_column(f"'{TIMESERIES_BUCKETS[bucket]}'")
+    ts = func.date_trunc(unit, source.created_at).label("ts")
+
+    stmt = select(ts, func.avg(column).label("value"), func.count(column).label("n"))
+    if source is SessionTask:
+        # Las tareas nunca son anteriores a su sesión: acota (y poda) ambas tablas
+        stmt = stmt.join(Session, and_(Session.session_id == SessionTask.session_id,
+                                       SessionTask.created_at >= Session.created_at))
+    stmt = stmt.where(Session.user_firebase_id == firebase_id, column.is_not(None))
+    if date_from is not None:
+        stmt = stmt.where(source.created_at >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(source.created_at < date_to)
+        if source is SessionTask:
+            stmt = stmt.where(Session.created_at < date_to)
+    return stmt.group_by(ts).order_by(ts)
+
+
+def truncate_bucket(ts: datetime, bucket: str) -> datetime:
+    """Equivalente en Python de date_trunc (semanas ISO: desde el lunes)."""
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    if bucket == "1h":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day if bucket == "1d" else day - timedelta(days=day.weekday())
+
+
+def fill_buckets(rows, bucket: str, date_from: Optional[datetime] = None,
+                 date_to: Optional[datetime] = None):
+    """
+    Serie con todos los buckets del rango (de date_from/date_to o, si faltan,
+    de la primera a la última fila): los vacíos quedan con valor NaN y 0
+    lecturas, así timestamps/values/counts van siempre alineados.
+    """
+    step = BUCKET_STEPS[bucket]
+    found = {r.ts: (float(r.value), r.n) for r in rows}
+    if date_from is not None:
+        start = truncate_bucket(date_from, bucket)
+    elif rows:
+        start = rows[0].ts
+    else:
+        return [], np.empty(0), []
+    if date_to is not None:
+        end = truncate_bucket(date_to - timedelta(microseconds=1), bucket)
+    elif rows:
+        end = rows[-1].ts
+    else:
+        end = start
+
+    total = (end - start) // step + 1 if end >= start else 0
+    if total > MAX_TIMESERIES_BUCKETS:
+        raise HTTPException(status_code=400,
+                            detail=f"Rango demasiado largo: {total} buckets (máx {MAX_TIMESERIES_BUCKETS})")
+    timestamps = [start + i * step for i in range(total)]
+    values = np.full(total, np.nan)
+    counts = [0] * total
+    for i, ts in enumerate(timestamps):
+        if ts in found:
+            values[i], counts[i] = found[ts]
+    return timestamps, values, counts
+
+
+@router.get("/user/{firebase_id}/timeseries")
+async def get_user_timeseries(
+    firebase_id: str,
+    metric: Literal["stress", "hr", "arousal", "valence"] = "stress",
+    bucket: Literal["1h", "1d", "1w"] = "1d",
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    max_points: Optional[int] = Query(None, ge=3, le=5000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Serie temporal agregada por hora/día/semana (promedio y conteo por bucket),
+    con un punto por bucket del rango: los buckets sin lecturas van con
+    value null y count 0. Con max_points se reduce con LTTB conservando la
+    forma de la curva (y los huecos)
+    """
+    try:
+        result = await db.execute(timeseries_stmt(firebase_id, bucket, metric, date_from, date_to))
+        timestamps, values, counts = fill_buckets(result.all(), bucket, date_from, date_to)
+        total = len(timestamps)
+
+        if max_points and total > max_points:
+            x = np.array([t.timestamp() for t in timestamps])
+            keep = lttb(x, values, max_points)
+            timestamps = [timestamps[i] for i in keep]
+            values = values[keep]
+            counts = [counts[i] for i in keep]
+
+        return ORJSONResponse({
+            "firebase_id": firebase_id,
+            "metric": metric,
+            "bucket": bucket,
+            "total_buckets": total,
+            "timestamps": timestamps,
+            "values": [None if np.isnan(v) else float(v) for v in values],
+            "counts": counts,
+        })
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error fetching user timeseries: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
 @router.get("/user/{firebase_id}", response_model=List[SessionResponse])
 async def get_user_sessions(
     firebase_id: str,
     project_id: str = None,  # ✅ Parámetro opcional para filtrar por proyecto
+    since: Optional[datetime] = None,
     db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Obtiene todas las sesiones de un usuario específico, opcionalmente filtradas por proyecto
+    Obtiene todas las sesiones de un usuario específico, opcionalmente filtradas
+    por proyecto y por fecha de creación (`since`; por defecto, los últimos
+    SESSIONS_DEFAULT_DAYS días)
     """
     try:
-        # ✅ Query básico para todas las sesiones del usuario
-        stmt = (
-            select(Session)
-            .options(
-                joinedload(Session.user),
-                joinedload(Session.tasks),
-                joinedload(Session.baselines)
-            )
-            .join(User)
-            .where(Session.user_firebase_id == firebase_id)
-            .order_by(Session.created_at.desc())
-        )
-        
-        result = await db.execute(stmt)
+        result = await db.execute(USER_SESSIONS, {"firebase_id": firebase_id, "since": since_or_default(since)})
         all_sessions = result.scalars().unique().all()
-        
+        users = await get_users(db, [firebase_id]) if all_sessions else {}
+        if firebase_id not in users:
+            all_sessions = []
+
         if not all_sessions:
             raise HTTPException(
-                status_code=404, 
+                status_code=404,
                 detail=f"No sessions found for user: {firebase_id}"
             )
-        
+
         # ✅ Filtrar por proyecto si se proporciona project_id
-        filtered_sessions = []
-        
-        for session in all_sessions:
-            # Extraer project_id del session_id
-            # Formato: session_timestamp_projectId_userId
-            session_parts = session.session_id.split('_')
-            
-            if len(session_parts) >= 4:  # session_timestamp_projectId_userId
-                session_project_id = session_parts[2]
-                
-                # Si no se especifica project_id, incluir todas las sesiones
-                # Si se especifica, solo incluir las que coincidan
-                if project_id is None or session_project_id == project_id:
-                    filtered_sessions.append(session)
-            else:
-                # Si el formato no coincide, incluir solo si no se filtra por proyecto
-                if project_id is None:
-                    filtered_sessions.append(session)
-        
+        filtered_sessions = [
+            session for session in all_sessions
+            if matches_project(session.session_id, project_id)
+        ]
+
         if not filtered_sessions:
             project_msg = f" for project: {project_id}" if project_id else ""
             raise HTTPException(
-                status_code=404, 
+                status_code=404,
                 detail=f"No sessions found for user: {firebase_id}{project_msg}"
             )
-        
-        # ✅ Construir respuesta
-        session_responses = []
-        
-        for session in filtered_sessions:
-            baseline_data = None
-            if session.baselines:
-                baseline = session.baselines[0]
-                baseline_data = BaselineResponse(
-                    baseline_eeg_theta_beta=float(baseline.baseline_eeg_theta_beta) if baseline.baseline_eeg_theta_beta else None,
-                    baseline_hrv_lf_hf=float(baseline.baseline_hrv_lf_hf) if baseline.baseline_hrv_lf_hf else None,
-                    baseline_hr=float(baseline.baseline_hr) if baseline.baseline_hr else None
-                )
-            
-            task_responses = [
-                TaskResponse(
-                    task_id=task.task_id,
-                    task_name=task.task_name,
-                    normalized_stress=float(task.normalized_stress),
-                    emotion_label=task.emotion_label,
-                    heart_rate=float(task.heart_rate) if task.heart_rate else None,
-                    created_at=task.created_at
-                )
-                for task in session.tasks
-            ]
-            
-            session_response = SessionResponse(
-                session_id=session.session_id,
-                context_type=session.context_type,
-                created_at=session.created_at,
-                session_avg_stress=float(session.session_avg_stress) if session.session_avg_stress else None,
-                session_emotion=session.session_emotion,
-                session_arousal=float(session.session_arousal) if session.session_arousal else None,
-                session_valence=float(session.session_valence) if session.session_valence else None,
-                
-                user_name=session.user.name,
-                user_avatar_url=session.user.avatar_url,
-                user_firebase_id=session.user.firebase_id,
-                
-                baseline=baseline_data,
-                tasks=task_responses
-            )
-            
-            session_responses.append(session_response)
-        
-        return session_responses
-        
+
+        # ✅ Construir respuesta como dicts y serializar con orjson
+        return ORJSONResponse(sessions_to_dicts(filtered_sessions, users))
+
     except HTTPException:
         raise
     except Exception as e:
         print(f"Error fetching user sessions: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.get("/user/{firebase_id}/stream")
+async def stream_user_sessions(
+    firebase_id: str,
+    project_id: str = None,
+    since: Optional[datetime] = None,
+):
+    """
+    Igual que /user/{firebase_id} pero en NDJSON (una sesión por línea)
+    """
+    return StreamingResponse(
+        stream_sessions_ndjson(USER_SESSIONS_STREAM,
+                               {"firebase_id": firebase_id, "since": since_or_default(since)}, project_id),
+        media_type="application/x-ndjson"
+    )
@@ -1,12 +1,57 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
 from pydantic import BaseModel
-from app.models.userSignIn import SignInRequest
+from typing import Literal, Optional
+from datetime import datetime
+import base64
+import time
+import orjson
+from psycopg2.extras import execute_values
+from app.models.userSignIn import SignInRequest, BulkSignInRequest
 from app.models.avatar import AvatarUpdate
 
 from app.db.connection import get_connection
+from app.services.user_cache import user_cache, user_row, USER_COLUMNS
+from app.services.invalidation import publish_sync
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
+DEFAULT_PAGE_SIZE = 50           # con cursor y sin limit
+MAX_PAGE_SIZE = 500
+MAX_BULK_SIGNIN = 1000
+COUNT_ESTIMATE_TTL = 60          # s; reltuples sólo cambia con ANALYZE/autovacuum
+_count_estimate = {"value": None, "expires": 0.0}
+
+
+# ───── Helpers del directorio ────────────────────────────────────
+def encode_cursor(created_at: datetime, user_id: int) -> str:
+    raw = orjson.dumps([created_at.isoformat(), user_id])
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, user_id = orjson.loads(raw)
+        return datetime.fromisoformat(created_at), int(user_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def users_count_estimate(cur):
+    """Filas estimadas de users según pg_class (None si nunca se analizó)."""
+    now = time.monotonic()
+    if _count_estimate["expires"] < now:
+        cur.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = 'users'::regclass")
+        row = cur.fetchone()
+        value = row[0] if row and row[0] >= 0 else None
+        _count_estimate.update(value=value, expires=now + COUNT_ESTIMATE_TTL)
+    return _count_estimate["value"]
+
+
 @router.post("/signin")
 def signin(user: SignInRequest):
     conn = get_connection()
@@ -35,7 +80,9 @@ def signin(user: SignInRequest):
                 raise HTTPException(status_code=404, detail="User with this firebase_id not found")
 
         new_id, created_at = row
+        publish_sync(cur, user=[user.firebase_id])
         conn.commit()
+        user_cache.invalidate(user.firebase_id)
 
     except Exception as e:
         conn.rollback()
@@ -47,33 +94,162 @@ def signin(user: SignInRequest):
 
     return {"id": new_id, "created_at": created_at}
 
-@router.get("/")
-def get_users():
+@router.post("/bulk-signin")
+def bulk_signin(payload: BulkSignInRequest):
+    """
+    Alta de un equipo completo en un solo statement y un solo round trip.
+    Mismo criterio que /signin: los usuarios que ya existen no se
+    modifican. Devuelve id y created_at de todos, en el orden recibido.
+    """
+    if not payload.users:
+        raise HTTPException(status_code=400, detail="users list empty")
+    if len(payload.users) > MAX_BULK_SIGNIN:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_SIGNIN} users per request")
+
+    # Un firebase_id repetido en el lote cuenta una vez (el primero)
+    unique = {}
+    for user in payload.users:
+        unique.setdefault(user.firebase_id, user)
+    values = [(u.firebase_id, u.name, u.avatar_url, u.gender) for u in unique.values()]
+
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute("""
-        SELECT id, firebase_id, name, avatar_url, gender, created_at
+    try:
+        # INSERT de los nuevos + SELECT de los existentes en un único statement
+        rows = execute_values(
+            cur,
+            """
+            WITH input (firebase_id, name, avatar_url, gender) AS (VALUES %s),
+            inserted AS (
+                INSERT INTO users (firebase_id, name, avatar_url, gender)
+                SELECT firebase_id, name, avatar_url, gender FROM input
+                ON CONFLICT (firebase_id) DO NOTHING
+                RETURNING id, firebase_id, created_at
+            )
+            SELECT id, firebase_id, created_at, TRUE FROM inserted
+            UNION ALL
+            SELECT u.id, u.firebase_id, u.created_at, FALSE
+              FROM users u
+              JOIN input i ON i.firebase_id = u.firebase_id
+             WHERE NOT EXISTS (SELECT 1 FROM inserted WHERE inserted.firebase_id = u.firebase_id)
+            """,
+            values,
+            template="(%s, %s, %s, %s)",
+            page_size=len(values),      # todo el lote en un solo statement
+            fetch=True,
+        )
+        # Una alta concurrente entre el INSERT y el SELECT del CTE (mismo
+        # snapshot) no sale en ninguna rama: se relee con un statement nuevo
+        found = {r[1] for r in rows}
+        missing = [f for f in unique if f not in found]
+        if missing:
+            cur.execute(
+                "SELECT id, firebase_id, created_at, FALSE FROM users WHERE firebase_id = ANY(%s)",
+                (missing,),
+            )
+            rows += cur.fetchall()
+            if len(rows) < len(unique):
+                raise RuntimeError(f"{len(unique) - len(rows)} users vanished during sign-in")
+        publish_sync(cur, user=list(unique))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail=f"Could not sign in users: {str(e)}")
+    finally:
+        cur.close()
+        conn.close()
+
+    for firebase_id in unique:
+        user_cache.invalidate(firebase_id)
+
+    by_id = {r[1]: {"firebase_id": r[1], "id": r[0], "created_at": r[2], "created": r[3]} for r in rows}
+    users = [by_id[f] for f in unique]
+    created = sum(u["created"] for u in users)
+    return {"users": users, "created": created, "existing": len(users) - created}
+
+
+@router.get("/")
+def get_users(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    q: Optional[str] = Query(None, min_length=1, max_length=100),
+    match: Literal["prefix", "trigram"] = "prefix",
+    fields: Optional[str] = None,
+):
+    """
+    Directorio de usuarios paginado por keyset (created_at DESC, id DESC).
+    Sin limit ni cursor devuelve todos los usuarios, como antes de paginar.
+    Con limit (o cursor: DEFAULT_PAGE_SIZE) el body sigue siendo una lista y
+    la página siguiente se pide con el cursor de la cabecera
+    X-Next-Cursor. X-Total-Estimate sale de las
+    estadísticas de Postgres (pg_class.reltuples), no de COUNT(*).
+
+    - q + match=prefix: nombre que empieza por q (índice lower(name) text_pattern_ops)
+    - q + match=trigram: nombre parecido a q (pg_trgm, índice GIN)
+    - fields: columnas separadas por coma (id,firebase_id,name,avatar_url,gender,created_at)
+    """
+    columns = USER_COLUMNS
+    if fields:
+        columns = tuple(f.strip() for f in fields.split(",") if f.strip())
+        unknown = set(columns) - set(USER_COLUMNS)
+        if unknown or not columns:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    where, params = [], []
+    if cursor:
+        after_created_at, after_id = decode_cursor(cursor)
+        where.append("(created_at, id) < (%s, %s)")
+        params += [after_created_at, after_id]
+    if q:
+        if match == "prefix":
+            where.append("lower(name) LIKE %s")
+            params.append(escape_like(q.lower()) + "%")
+        else:
+            where.append("name %% %s")
+            params.append(q)
+
+    if limit is None and cursor:
+        limit = DEFAULT_PAGE_SIZE
+
+    # created_at e id siempre se leen (cursor), aunque no se devuelvan
+    select_cols = list(dict.fromkeys((*columns, "created_at", "id")))
+    sql = """
+        SELECT {}
           FROM users
-        ORDER BY created_at DESC
-    """)
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+         {}
+        ORDER BY created_at DESC, id DESC
+        {}
+    """.format(", ".join(select_cols), ("WHERE " + " AND ".join(where)) if where else "",
+               "LIMIT %s" if limit is not None else "")
+    if limit is not None:
+        params.append(limit + 1)
 
-    return [
-        {
-            "id":     r[0],
-            "firebase_id": r[1],
-            "name":   r[2],
-            "avatar_url":  r[3],
-            "gender": r[4],
-            "created_at":  r[5],
-        }
-        for r in rows
-    ]
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        total = users_count_estimate(cur)
+    finally:
+        cur.close()
+        conn.close()
+
+    page = [dict(zip(select_cols, r)) for r in rows[:limit]]
+    if limit is not None and len(rows) > limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(page[-1]["created_at"], page[-1]["id"])
+    if total is not None:
+        response.headers["X-Total-Estimate"] = str(total)
+
+    return [{c: row[c] for c in columns} for row in page]
 
 @router.get("/{user_id}")
 def get_user(user_id: str):
+    # ✅ Caché por proceso; se invalida en signin/avatar/profile
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(
@@ -91,14 +267,9 @@ def get_user(user_id: str):
     if not row:
         raise HTTPException(status_code=404, detail="User not found")
 
-    return {
-        "id":          row[0],
-        "firebase_id": row[1],
-        "name":        row[2],
-        "avatar_url":  row[3],
-        "gender":      row[4],
-        "created_at":  row[5],
-    }
+    user = user_row(row)
+    user_cache.put(user)
+    return user
 
 @router.patch("/{user_id}/avatar", response_model=dict)
 def update_avatar(user_id: str, payload: AvatarUpdate):
@@ -115,7 +286,9 @@ def update_avatar(user_id: str, payload: AvatarUpdate):
             (payload.avatar_url, user_id)
         )
         row = cur.fetchone()
+        publish_sync(cur, user=[user_id])
         conn.commit()
+        user_cache.invalidate(user_id)
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
@@ -162,7 +335,9 @@ def update_profile(user_id: str, payload: AvatarUpdate):
         
         cur.execute(sql, params)
         row = cur.fetchone()
+        publish_sync(cur, user=[user_id])
         conn.commit()
+        user_cache.invalidate(user_id)
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,150 @@
+# app/services/admission.py
+import math
+import time
+from typing import Dict
+
+from fastapi import HTTPException
+
+from app.core.config import (
+    DSP_MAX_INFLIGHT, DSP_MAX_BUFFERED_MB,
+    DSP_USER_RATE_PER_MIN, DSP_USER_BURST,
+    DSP_GLOBAL_RATE_PER_MIN, DSP_GLOBAL_BURST,
+)
+
+MAX_USER_BUCKETS = 10_000   # tope de buckets por usuario en memoria
+
+
+# ───── Token bucket ──────────────────────────────────────────────
+class TokenBucket:
+    def __init__(self, rate_per_min: float, burst: int):
+        self.rate = rate_per_min / 60.0     # tokens por segundo
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def try_take(self) -> float:
+        """Consume un token; devuelve 0 si hubo, o los segundos a esperar."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate else 60.0
+
+    def give_back(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    @property
+    def full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+# ───── Control de admisión de trabajos DSP ───────────────────────
+class AdmissionController:
+    """
+    Lleva la cuenta de trabajos DSP en curso y bytes retenidos; rechaza
+    con 429 (rate limit) o 503 (capacidad saturada) y Retry-After.
+    Vive en el event loop, así que no necesita locks.
+    """
+
+    def __init__(self):
+        self.max_inflight = DSP_MAX_INFLIGHT
+        self.max_bytes = DSP_MAX_BUFFERED_MB * 1024 * 1024
+        self.inflight = 0
+        self.buffered_bytes = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.avg_job_seconds = 5.0          # EWMA, para estimar Retry-After
+        self._global = TokenBucket(DSP_GLOBAL_RATE_PER_MIN, DSP_GLOBAL_BURST)
+        self._users: Dict[str, TokenBucket] = {}
+
+    def _user_bucket(self, user_id: str) -> TokenBucket:
+        bucket = self._users.get(user_id)
+        if bucket is None:
+            if len(self._users) >= MAX_USER_BUCKETS:
+                # Los buckets llenos equivalen a uno nuevo: se pueden soltar
+                self._users = {k: b for k, b in self._users.items() if not b.full}
+            bucket = self._users[user_id] = TokenBucket(DSP_USER_RATE_PER_MIN, DSP_USER_BURST)
+        return bucket
+
+    def _reject(self, status_code: int, detail: str, retry_after: float):
+        self.rejected += 1
+        raise HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    def check_capacity(self, nbytes: int) -> None:
+        """Capacidad DSP del worker → 503; se puede llamar antes de leer el body."""
+        if self.inflight >= self.max_inflight:
+            self._reject(503, "DSP capacity saturated", self.avg_job_seconds)
+        if self.inflight and self.buffered_bytes + nbytes > self.max_bytes:
+            self._reject(503, "DSP buffer saturated", self.avg_job_seconds)
+
+    def admit(self, user_id: str, nbytes: int) -> "Ticket":
+        # 1) capacidad DSP del worker → 503
+        self.check_capacity(nbytes)
+
+        # 2) rate limits → 429
+        user_bucket = self._user_bucket(user_id)
+        wait = user_bucket.try_take()
+        if wait:
+            self._reject(429, "Too many uploads for this user", wait)
+        wait = self._global.try_take()
+        if wait:
+            user_bucket.give_back()
+            self._reject(429, "Too many uploads", wait)
+
+        self.inflight += 1
+        self.buffered_bytes += nbytes
+        self.accepted += 1
+        return Ticket(self, nbytes)
+
+    def _release(self, ticket: "Ticket") -> None:
+        self.inflight -= 1
+        self.buffered_bytes -= ticket.nbytes
+        elapsed = time.monotonic() - ticket.started
+        self.avg_job_seconds = 0.8 * self.avg_job_seconds + 0.2 * elapsed
+
+    def snapshot(self) -> dict:
+        return {
+            "inflight":         self.inflight,
+            "max_inflight":     self.max_inflight,
+            "buffered_bytes":   self.buffered_bytes,
+            "max_buffered_bytes": self.max_bytes,
+            "avg_job_seconds":  round(self.avg_job_seconds, 3),
+            "accepted":         self.accepted,
+            "rejected":         self.rejected,
+        }
+
+
+class Ticket:
+    """Plaza admitida; se libera una sola vez al terminar el trabajo."""
+
+    def __init__(self, controller: AdmissionController, nbytes: int):
+        self.controller = controller
+        self.nbytes = nbytes
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+
+dsp_admission = AdmissionController()
+
+
+async def run_admitted(ticket: Ticket, job, *args) -> None:
+    """Ejecuta el trabajo en background y libera la plaza al terminar."""
+    try:
+        await job(*args)
+    finally:
+        ticket.release()
@@ -0,0 +1,271 @@
+# app/services/chunked_dsp.py
+"""
+DSP en memoria acotada sobre almacenes de muestras memory-mapped.
+
+Las sesiones de calibración largas pueden guardarse como np.memmap
+(ver write_sample_store/open_sample_store). Estas funciones recorren el
+almacén por trozos de tamaño fijo, así que la memoria pico depende del
+trozo y de la ventana, no de la duración de la grabación:
+
+- θ/β: Welch con solapamiento entre trozos (las últimas nfft-step
+  muestras pasan al siguiente). El detrend lineal de toda la señal se
+  aplica sin una segunda pasada: se acumulan los espectros cruzados de
+  cada segmento con la ventana y con la rampa, y al final se resta la
+  recta ajustada en el dominio de la frecuencia.
+- HR y LF/HF: Elgendi por bloques con márgenes de MARGIN_SECONDS para
+  que filtfilt y las medias móviles vean el mismo contexto que con la
+  señal completa. El umbral usa la media global de la señal al
+  cuadrado, así que son dos pasadas secuenciales sobre el memmap. Sólo
+  se guardan los picos (un entero por latido). El detector por bloques
+  es el del backend numpy: con HRV_BACKEND=neurokit (nk.ppg_process
+  necesita la señal entera) HR y LF/HF cargan el PPG completo y siguen
+  el camino en memoria de ese backend.
+
+theta_beta_ratio, hr_from_ppg y lf_hf_ratio derivan aquí cuando reciben
+un np.memmap. Con el backend HRV "numpy" HR y LF/HF coinciden con el
+camino en memoria; θ/β coincide con un detrend lineal exacto (el de
+brainflow difiere ~1e-6 relativo por redondeo); ver
+tests/test_chunked_dsp.py.
+"""
+from typing import Iterator, Tuple
+
+import numpy as np
+
+from app.services.hrv_backends import (
+    bandpass_ppg, elgendi_waves, wave_peaks, get_hrv_backend
+)
+from app.services.psd_plan import get_psd_plan
+from app.services.signal_processing import (
+    SAMPLING_EEG, SAMPLING_PPG, finite_samples,
+    theta_beta_ratio, hr_from_ppg, lf_hf_ratio,
+    hr_from_peaks, lf_hf_from_peaks, simple_hr_estimation,
+)
+
+# ───── Constantes ────────────────────────────────────────────────
+CHUNK_SECONDS = 30      # muestras leídas del memmap por trozo
+MARGIN_SECONDS = 20     # contexto a cada lado de un bloque PPG (filtfilt)
+EEG_NFFT, EEG_OVERLAP = 512, 256   # mismos parámetros que theta_beta_ratio
+
+
+# ───── Almacenes de muestras ─────────────────────────────────────
+def write_sample_store(path: str, samples, dtype: str = "float32") -> np.memmap:
+    """Vuelca muestras a un fichero binario plano y lo devuelve como memmap."""
+    samples = np.asarray(samples, dtype=dtype)
+    store = np.memmap(path, dtype=dtype, mode="w+", shape=samples.shape)
+    store[:] = samples
+    store.flush()
+    return open_sample_store(path, dtype)
+
+
+def open_sample_store(path: str, dtype: str = "float32") -> np.memmap:
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+def iter_finite_chunks(store, chunk: int) -> Iterator[np.ndarray]:
+    """Trozos float64 consecutivos del almacén, sin None/NaN/inf."""
+    for start in range(0, len(store), chunk):
+        yield finite_samples(np.asarray(store[start:start + chunk]))
+
+
+def iter_blocks(store, block: int, margin: int, chunk: int) -> Iterator[Tuple[np.ndarray, int, int, int]]:
+    """
+    Recorre las muestras válidas en bloques de `block` con `margin` de
+    contexto a cada lado. Devuelve (ext, ini, fin, offset): ext[ini:fin]
+    es el bloque, y ext[0] es la muestra válida número `offset`.
+    """
+    buf = np.empty(0)
+    buf_start = 0       # índice global de buf[0]
+    core = 0            # índice global del próximo bloque
+    for piece in iter_finite_chunks(store, chunk):
+        buf = np.concatenate((buf, piece))
+        while buf_start + len(buf) - core >= block + margin:
+            e0 = max(buf_start, core - margin)
+            ext = buf[e0 - buf_start:core + block + margin - buf_start]
+            yield ext, core - e0, core - e0 + block, e0
+            core += block
+            drop = core - margin - buf_start
+            if drop > 0:
+                buf, buf_start = buf[drop:], buf_start + drop
+
+    end = buf_start + len(buf)
+    while core < end:
+        e0 = max(buf_start, core - margin)
+        ext = buf[e0 - buf_start:]
+        yield ext, core - e0, min(core + block, end) - e0, e0
+        core += block
+
+
+# ───── θ/β por Welch en streaming ────────────────────────────────
+class StreamingWelch:
+    """
+    PSD-Welch con detrend lineal global en una sola pasada.
+
+    Para el segmento s (inicio p, espectro Y = rfft(y·w)) y la recta
+    a·i + b, el segmento sin tendencia tiene espectro Y - a·K - (a·p + b)·W
+    con W = rfft(w) y K = rfft(k·w). Su potencia se expande en sumas de
+    |Y|², Re(Y·K̄), Re(Y·W̄) y p·Re(Y·W̄), que se acumulan por segmento;
+    a y b (mínimos cuadrados) se conocen al final.
+    """
+
+    def __init__(self, nfft: int, overlap: int, fs: int, window: str = "hanning"):
+        self.plan = get_psd_plan(nfft, overlap, fs, window)
+        k = np.arange(nfft)
+        self.W = np.fft.rfft(self.plan.window)
+        self.K = np.fft.rfft(k * self.plan.window)
+
+        size = self.W.size
+        self.s_yy = np.zeros(size)
+        self.s_yk = np.zeros(size)
+        self.s_yw = np.zeros(size)
+        self.s_pyw = np.zeros(size)
+        self.s_p = 0.0
+        self.s_pp = 0.0
+        self.segments = 0
+
+        # Ajuste lineal: y se centra en la primera muestra para no perder precisión
+        self.y0 = None
+        self.n = 0
+        self.s_y = 0.0
+        self.s_iy = 0.0
+        self._carry = np.empty(0)
+
+    def push(self, data: np.ndarray) -> None:
+        if not len(data):
+            return
+        if self.y0 is None:
+            self.y0 = float(data[0])
+        idx = np.arange(self.n, self.n + len(data), dtype=np.float64)
+        centered = data - self.y0
+        self.s_y += centered.sum()
+        self.s_iy += idx @ centered
+        self.n += len(data)
+
+        buf = np.concatenate((self._carry, centered))
+        first = self.n - len(buf)                       # índice global de buf[0]
+        nfft, step = self.plan.nfft, self.plan.step
+        n_seg = (len(buf) - nfft) // step + 1 if len(buf) >= nfft else 0
+        if n_seg:
+            segments = np.lib.stride_tricks.sliding_window_view(buf, nfft)[::step][:n_seg]
+            Y = np.fft.rfft(segments * self.plan.window, axis=1)
+            p = first + step * np.arange(n_seg, dtype=np.float64)
+            re_yw = (Y * self.W.conj()).real
+            self.s_yy += (Y.real ** 2 + Y.imag ** 2).sum(axis=0)
+            self.s_yk += (Y * self.K.conj()).real.sum(axis=0)
+            self.s_yw += re_yw.sum(axis=0)
+            self.s_pyw += p @ re_yw
+            self.s_p += p.sum()
+            self.s_pp += p @ p
+            self.segments += n_seg
+        self._carry = buf[n_seg * step:]
+
+    def psd(self) -> np.ndarray:
+        n, m = float(self.n), float(self.segments)
+        s_i = n * (n - 1) / 2
+        s_ii = (n - 1) * n * (2 * n - 1) / 6
+        a = (n * self.s_iy - s_i * self.s_y) / (n * s_ii - s_i ** 2)
+        b = (self.s_y - a * s_i) / n
+
+        ww = self.W.real ** 2 + self.W.imag ** 2
+        kk = self.K.real ** 2 + self.K.imag ** 2
+        kw = (self.K * self.W.conj()).real
+        s_c = a * self.s_p + m * b                              # Σ c_s, c_s = a·p + b
+        s_cc = a * a * self.s_pp + 2 * a * b * self.s_p + m * b * b
+        s_cyw = a * self.s_pyw + b * self.s_yw
+
+        power = (self.s_yy + m * a * a * kk + s_cc * ww
+                 - 2 * a * self.s_yk - 2 * s_cyw + 2 * a * kw * s_c)
+        return power / m * self.plan.scale
+
+
+def theta_beta_ratio_chunked(store, is_task: bool = False,
+                             chunk: int = CHUNK_SECONDS * SAMPLING_EEG) -> float:
+    """θ/β de theta_beta_ratio sobre un memmap, en memoria acotada."""
+    if len(store) <= chunk:
+        return theta_beta_ratio(np.asarray(store), is_task=is_task)
+
+    welch = StreamingWelch(EEG_NFFT, EEG_OVERLAP, SAMPLING_EEG, "hanning")
+    head = np.empty(0)
+    for data in iter_finite_chunks(store, chunk):
+        if len(head) < EEG_NFFT:
+            head = np.concatenate((head, data[:EEG_NFFT - len(head)]))
+        welch.push(data)
+
+    # Casi todo NaN: lo que quedó cabe en memoria, mismo camino que siempre
+    if welch.n < EEG_NFFT:
+        return theta_beta_ratio(head, is_task=is_task)
+
+    psd = welch.psd()
+    theta_power = welch.plan.band_power(psd, "theta")
+    beta_power = welch.plan.band_power(psd, "beta")
+    print(f"Debug: θ/β por trozos - {welch.n} muestras, {welch.segments} segmentos")
+    return float(theta_power / beta_power) if beta_power > 0 else 0.0
+
+
+# ───── Picos PPG por bloques ─────────────────────────────────────
+def ppg_peaks_chunked(store, fs: int = SAMPLING_PPG,
+                      chunk: int = CHUNK_SECONDS * SAMPLING_PPG,
+                      margin: int = MARGIN_SECONDS * SAMPLING_PPG) -> Tuple[np.ndarray, int]:
+    """
+    Picos de Elgendi (índices sobre las muestras válidas) y número de
+    muestras válidas, en dos pasadas: media global del cuadrado y picos.
+    """
+    total, n = 0.0, 0
+    for ext, ini, fin, _ in iter_blocks(store, chunk, margin, chunk):
+        core = bandpass_ppg(ext, fs)[ini:fin]
+        total += np.sum(np.clip(core, 0, None) ** 2)
+        n += fin - ini
+    if n == 0:
+        return np.array([], dtype=int), 0
+    mean_sqrd = total / n
+
+    peaks, last = [], 0
+    for ext, ini, fin, offset in iter_blocks(store, chunk, margin, chunk):
+        signal = bandpass_ppg(ext, fs)
+        beg, end, peak_win = elgendi_waves(signal, fs, mean_sqrd)
+        # Bloques que empiezan en este trozo, cada uno con su primer fin
+        beg = beg[(beg >= ini) & (beg < fin)]
+        pos = np.searchsorted(end, beg, side="right")
+        beg, end = beg[pos < end.size], end[pos[pos < end.size]]
+        found, last_local = wave_peaks(signal, zip(beg, end), fs, peak_win, last - offset)
+        peaks.extend(p + offset for p in found)
+        last = last_local + offset
+    return np.asarray(peaks, dtype=int), n
+
+
+def _needs_full_ppg() -> bool:
+    """Sólo el backend numpy detecta picos por bloques; los demás, señal completa."""
+    backend = get_hrv_backend()
+    if backend.name == "numpy":
+        return False
+    print(f"Debug: backend HRV {backend.name} sin detección por bloques, se carga el PPG completo")
+    return True
+
+
+def hr_from_ppg_chunked(store, is_task: bool = False,
+                        chunk: int = CHUNK_SECONDS * SAMPLING_PPG) -> float:
+    """HR de hr_from_ppg sobre un memmap (backend numpy), en memoria acotada."""
+    if len(store) <= chunk or _needs_full_ppg():
+        return hr_from_ppg(np.asarray(store), is_task=is_task)
+    try:
+        peaks, _ = ppg_peaks_chunked(store, chunk=chunk)
+        hr = hr_from_peaks(peaks)
+        if hr is None:
+            # Sin latidos detectables: único caso que carga la señal completa
+            return simple_hr_estimation(finite_samples(np.asarray(store)))
+        return hr
+    except Exception as e:
+        print(f"Error en hr_from_ppg_chunked: {e}")
+        return 0.0
+
+
+def lf_hf_ratio_chunked(store, is_task: bool = False,
+                        chunk: int = CHUNK_SECONDS * SAMPLING_PPG) -> float:
+    """LF/HF de lf_hf_ratio sobre un memmap (picos por trozos), en memoria acotada."""
+    if len(store) <= chunk or _needs_full_ppg():
+        return lf_hf_ratio(np.asarray(store), is_task=is_task)
+    try:
+        peaks, _ = ppg_peaks_chunked(store, chunk=chunk)
+        return lf_hf_from_peaks(peaks, get_hrv_backend())
+    except Exception as e:
+        print(f"Error en lf_hf_ratio_chunked: {e}")
+        return 0.0
@@ -0,0 +1,224 @@
+# app/services/compression.py
+"""
+Transporte comprimido: bodies de request gzip/deflate/zstd y respuestas
+comprimidas según Accept-Encoding.
+
+- Request: BodyReader (payload_stream) usa make_decoder(Content-Encoding)
+  y descomprime por trozos con un tope de bytes descomprimidos
+  (MAX_BODY_MB): un "zip bomb" se corta con 413 sin llegar a ocupar más
+  que el tope.
+- Respuesta: CompressionMiddleware (ASGI) comprime con zstd (si está el
+  paquete zstandard y el cliente lo acepta) o gzip, a partir de
+  COMPRESS_MIN_BYTES. Los streams (NDJSON, CSV) se comprimen por mensaje
+  con flush, para no retener filas; SSE y Parquet no se tocan.
+
+Los trozos grandes (> COMPRESS_OFFLOAD_BYTES) se (des)comprimen en un
+hilo para no bloquear el event loop (zlib y zstd sueltan el GIL).
+"""
+import asyncio
+import gzip
+import importlib.util
+import zlib
+from typing import Optional
+
+from fastapi import HTTPException
+
+from app.core.config import (
+    COMPRESS_MIN_BYTES, COMPRESS_OFFLOAD_BYTES, GZIP_LEVEL, ZSTD_LEVEL
+)
+
+ZSTD_AVAILABLE = importlib.util.find_spec("zstandard") is not None
+if ZSTD_AVAILABLE:
+    import zstandard
+
+# zstd puede expandir ~40000x un bloque RLE: se le da la entrada en
+# trozos pequeños y se revisa el tope tras cada uno
+ZSTD_FEED_BYTES = 1024
+
+# Tipos que no se comprimen: ya comprimidos, o streams que no deben esperar
+SKIP_CONTENT_TYPES = ("text/event-stream", "application/vnd.apache.parquet",
+                      "image/", "application/zip", "application/gzip")
+
+
+async def maybe_offload(func, data: bytes, *args):
+    """func(data, *args) en un hilo si el trozo es grande; si no, en el loop."""
+    if len(data) > COMPRESS_OFFLOAD_BYTES:
+        return await asyncio.to_thread(func, data, *args)
+    return func(data, *args)
+
+
+# ───── Descompresión de requests ─────────────────────────────────
+class _ZlibDecoder:
+    def __init__(self, wbits: int):
+        self._d = zlib.decompressobj(wbits)
+
+    def feed(self, data: bytes, budget: int) -> bytes:
+        """Descomprime `data` sin producir más de budget+1 bytes."""
+        try:
+            out = self._d.decompress(data, budget + 1)
+        except zlib.error as e:
+            raise HTTPException(400, f"Invalid compressed body: {e}")
+        if self._d.unconsumed_tail:
+            return out + b"\0"              # seguro que se pasa del tope
+        return out
+
+    def finish(self) -> None:
+        if not self._d.eof:
+            raise HTTPException(400, "Truncated compressed body")
+
+
+class _ZstdDecoder:
+    def __init__(self):
+        self._d = zstandard.ZstdDecompressor().decompressobj()
+
+    def feed(self, data: bytes, budget: int) -> bytes:
+        out = []
+        size = 0
+        try:
+            for i in range(0, len(data), ZSTD_FEED_BYTES):
+                piece = self._d.decompress(data[i:i + ZSTD_FEED_BYTES])
+                out.append(piece)
+                size += len(piece)
+                if size > budget:
+                    break
+        except zstandard.ZstdError as e:
+            raise HTTPException(400, f"Invalid compressed body: {e}")
+        return b"".join(out)
+
+    def finish(self) -> None:
+        if not self._d.eof:
+            raise HTTPException(400, "Truncated compressed body")
+
+
+def make_decoder(content_encoding: Optional[str]):
+    """Decoder para el Content-Encoding del request (None = sin comprimir)."""
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "identity":
+        return None
+    if encoding in ("gzip", "x-gzip"):
+        return _ZlibDecoder(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return _ZlibDecoder(zlib.MAX_WBITS)
+    if encoding == "zstd" and ZSTD_AVAILABLE:
+        return _ZstdDecoder()
+    raise HTTPException(415, f"Unsupported Content-Encoding: {content_encoding}")
+
+
+# ───── Compresión de respuestas ──────────────────────────────────
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """zstd > gzip según Accept-Encoding (respetando q=0)."""
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    if ZSTD_AVAILABLE and accepted.get("zstd", 0) > 0:
+        return "zstd"
+    if accepted.get("gzip", accepted.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+
+def compress_body(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class _StreamEncoder:
+    """Comprime un stream mensaje a mensaje; cada mensaje sale completo (flush)."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "zstd":
+            self._c = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        else:
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "zstd":
+            return self._c.compress(data) + self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+class CompressionMiddleware:
+    """Compresión negociada de respuestas (ASGI puro, como GZipMiddleware)."""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept = next((v for k, v in scope["headers"] if k == b"accept-encoding"), b"")
+        encoding = negotiate(accept.decode("latin-1"))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.minimum_size))
+
+
+class _CompressingSend:
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start = None               # http.response.start retenido
+        self.passthrough = False
+        self.stream: Optional[_StreamEncoder] = None
+
+    def _headers(self, body_length: Optional[int]) -> list:
+        vary = [v for k, v in self.start.get("headers", []) if k.lower() == b"vary"]
+        headers = [(k, v) for k, v in self.start.get("headers", [])
+                   if k.lower() not in (b"content-length", b"content-encoding", b"vary")]
+        headers.append((b"content-encoding", self.encoding.encode()))
+        headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+        if body_length is not None:
+            headers.append((b"content-length", str(body_length).encode()))
+        return headers
+
+    async def __call__(self, message):
+        kind = message["type"]
+        if kind == "http.response.start":
+            headers = {k.lower(): v for k, v in message.get("headers", [])}
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            if b"content-encoding" in headers or content_type.startswith(SKIP_CONTENT_TYPES):
+                self.passthrough = True
+                return await self.send(message)
+            self.start = message
+            return
+
+        if self.passthrough or kind != "http.response.body":
+            return await self.send(message)
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+
+        if self.stream is not None:
+            out = await maybe_offload(self.stream.chunk, body) if body else b""
+            if not more:
+                out += self.stream.finish()
+            return await self.send({"type": kind, "body": out, "more_body": more})
+
+        if not more:
+            # Body completo en un solo mensaje
+            if len(body) < self.minimum_size:
+                await self.send(self.start)
+                return await self.send(message)
+            compressed = await maybe_offload(compress_body, body, self.encoding)
+            await self.send({**self.start, "headers": self._headers(len(compressed))})
+            return await self.send({"type": kind, "body": compressed, "more_body": False})
+
+        # Streaming: se comprime por mensaje, sin Content-Length
+        self.stream = _StreamEncoder(self.encoding)
+        await self.send({**self.start, "headers": self._headers(None)})
+        out = await maybe_offload(self.stream.chunk, body) if body else b""
+        await self.send({"type": kind, "body": out, "more_body": True})
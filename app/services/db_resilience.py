@@ -0,0 +1,260 @@
+# app/services/db_resilience.py
+"""
+Escrituras a la BD que aguantan cortes (reemplaza a safe_db_operation).
+
+- run_db(unit): ejecuta `await unit(db)` en una AsyncSession nueva por
+  intento. Si falla la conexión, espera con backoff exponencial con
+  jitter ("full jitter": uniforme entre 0 y base·2^intento) y repite la
+  unidad entera. Reintentar sólo el commit sobre una sesión cuya
+  conexión murió no sirve: la transacción ya está perdida.
+- db_breaker: tras DB_BREAKER_FAILURES fallos de conexión seguidos se
+  abre y todo falla al instante con DatabaseUnavailable (503 +
+  Retry-After) durante DB_BREAKER_RESET_SECONDS; después deja pasar una
+  prueba (half-open) y se cierra si sale bien.
+- park()/start_drainer(): los trabajos en background que no pudieron
+  escribirse (ya con el DSP hecho) se guardan en DB_PARK_DIR y se
+  reintentan cuando la BD vuelve. Un trabajo reclamado por un worker
+  que murió a mitad vuelve a la cola pasados CLAIM_STALE_SECONDS.
+
+Un corte durante el COMMIT no dice si la transacción llegó a aplicarse,
+y run_db la repite: las unidades tienen que ser idempotentes (mirar al
+empezar si lo que van a escribir ya está, ver write_session y
+append_task). Lo mismo vale para un trabajo aparcado que se escribe dos
+veces. Pruebas offline en tests/test_db_resilience.py.
+"""
+import asyncio
+import math
+import os
+import random
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+import orjson
+from fastapi import HTTPException
+from sqlalchemy.exc import DBAPIError, DisconnectionError, InterfaceError
+
+from app.core.config import (
+    DB_RETRY_ATTEMPTS, DB_RETRY_BASE_SECONDS, DB_RETRY_MAX_SECONDS,
+    DB_BREAKER_FAILURES, DB_BREAKER_RESET_SECONDS, DB_PARK_DIR,
+)
+from app.db.async_engine import AsyncSessionLocal
+
+DRAIN_INTERVAL_SECONDS = 15
+CLAIM_STALE_SECONDS = 10 * 60      # reclamo sin terminar → el worker murió
+
+
+class DatabaseUnavailable(HTTPException):
+    """BD caída o circuito abierto: 503 con Retry-After en los endpoints."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail="Database unavailable",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+
+def is_disconnect(exc: BaseException) -> bool:
+    """Errores de conexión (reintentables), no de datos ni de SQL."""
+    if isinstance(exc, DBAPIError):
+        return exc.connection_invalidated or isinstance(exc, InterfaceError)
+    # asyncpg deja pasar ConnectionRefusedError/TimeoutError al conectar
+    return isinstance(exc, (DisconnectionError, OSError))
+
+
+# ───── Circuit breaker ───────────────────────────────────────────
+class CircuitBreaker:
+    """
+    closed → open tras `failures` fallos seguidos; open → half-open al
+    pasar `reset_seconds`; half-open deja pasar una sola prueba. Vive en
+    el event loop, así que no necesita locks.
+    """
+
+    def __init__(self, failures: int, reset_seconds: float):
+        self.max_failures = failures
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.probe_started = 0.0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def check(self) -> None:
+        """Falla rápido si el circuito está abierto (o ya hay una prueba en curso)."""
+        state = self.state
+        if state == "closed":
+            return
+        # Una prueba colgada (p. ej. cancelada) no bloquea el circuito para siempre
+        stale = time.monotonic() - self.probe_started >= self.reset_seconds
+        if state == "half_open" and (not self.probing or stale):
+            self.probing = True
+            self.probe_started = time.monotonic()
+            return
+        self.rejected += 1
+        raise DatabaseUnavailable(self.retry_after() or DB_RETRY_MAX_SECONDS)
+
+    def fail_fast(self) -> None:
+        """Sólo rechaza con el circuito abierto; no consume la prueba half-open (lecturas)."""
+        if self.state == "open":
+            self.rejected += 1
+            raise DatabaseUnavailable(self.retry_after())
+
+    def success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def failure(self) -> None:
+        self.failures += 1
+        if self.probing or self.failures >= self.max_failures:
+            if self.opened_at is None or self.probing:
+                print(f"⚠️ BD: circuito abierto por {self.reset_seconds}s")
+            self.opened_at = time.monotonic()
+            self.probing = False
+
+    def snapshot(self) -> dict:
+        return {
+            "state":               self.state,
+            "consecutive_failures": self.failures,
+            "retry_after_seconds": round(self.retry_after(), 1),
+            "rejected":            self.rejected,
+            "parked_jobs":         len(_parked_files()),
+        }
+
+
+db_breaker = CircuitBreaker(DB_BREAKER_FAILURES, DB_BREAKER_RESET_SECONDS)
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Full jitter: así los workers no reintentan todos a la vez."""
+    return random.uniform(0, min(DB_RETRY_MAX_SECONDS, DB_RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+async def run_db(unit: Callable[..., Awaitable], attempts: int = DB_RETRY_ATTEMPTS):
+    """
+    Ejecuta `await unit(db)` (que debe hacer su propio commit) con
+    reintentos ante cortes de conexión; la unidad debe ser idempotente
+    (el commit cortado pudo aplicarse). Otros errores (HTTPException,
+    integridad, SQL) se propagan tal cual, sin reintentar.
+    """
+    for attempt in range(attempts):
+        db_breaker.check()
+        try:
+            # Al salir, la sesión hace rollback (o invalida la conexión muerta)
+            async with AsyncSessionLocal() as db:
+                result = await unit(db)
+            db_breaker.success()
+            return result
+        except Exception as e:
+            if not is_disconnect(e):
+                if db_breaker.probing:
+                    db_breaker.success()        # la BD respondió, aunque fuera con error
+                raise
+            db_breaker.failure()
+            print(f"Conexión perdida (intento {attempt + 1}/{attempts}): {e}")
+            if attempt == attempts - 1:
+                raise DatabaseUnavailable(db_breaker.retry_after() or DB_RETRY_MAX_SECONDS) from e
+            await asyncio.sleep(backoff_seconds(attempt))
+
+
+# ───── Trabajos aparcados ────────────────────────────────────────
+def _parked_files() -> list:
+    try:
+        return sorted(f for f in os.listdir(DB_PARK_DIR) if f.endswith(".json"))
+    except FileNotFoundError:
+        return []
+
+
+def reclaim_stale(max_age: float = CLAIM_STALE_SECONDS) -> int:
+    """Devuelve a la cola los trabajos reclamados hace más de max_age segundos."""
+    try:
+        names = [f for f in os.listdir(DB_PARK_DIR) if f.endswith(".claim")]
+    except FileNotFoundError:
+        return 0
+    reclaimed = 0
+    for name in names:
+        claimed = os.path.join(DB_PARK_DIR, name)
+        try:
+            if time.time() - os.path.getmtime(claimed) < max_age:
+                continue
+            # <nombre>.json.<pid>.claim → <nombre>.json
+            os.rename(claimed, claimed.rsplit(".", 2)[0])
+        except FileNotFoundError:
+            continue                            # terminó o lo devolvió otro worker
+        print(f"Trabajo aparcado recuperado de un reclamo abandonado: {name}")
+        reclaimed += 1
+    return reclaimed
+
+
+def park(record: dict) -> str:
+    """Guarda un trabajo para reintentarlo cuando vuelva la BD."""
+    os.makedirs(DB_PARK_DIR, exist_ok=True)
+    name = f"{time.time():.6f}-{uuid.uuid4().hex}.json"
+    tmp = os.path.join(DB_PARK_DIR, name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(orjson.dumps(record, option=orjson.OPT_SERIALIZE_NUMPY))
+    os.replace(tmp, os.path.join(DB_PARK_DIR, name))
+    return name
+
+
+async def drain_parked(handler: Callable[[dict], Awaitable]) -> int:
+    """
+    Reintenta los trabajos aparcados en orden de llegada. Cada fichero se
+    reclama con un rename atómico para que dos workers no lo procesen a
+    la vez. Devuelve cuántos se escribieron.
+    """
+    done = 0
+    for name in _parked_files():
+        path = os.path.join(DB_PARK_DIR, name)
+        claimed = f"{path}.{os.getpid()}.claim"
+        try:
+            os.rename(path, claimed)
+            os.utime(claimed)                   # la edad del reclamo (reclaim_stale)
+        except FileNotFoundError:
+            continue                            # lo tomó otro worker
+        try:
+            with open(claimed, "rb") as f:
+                await handler(orjson.loads(f.read()))
+        except DatabaseUnavailable:
+            os.rename(claimed, path)            # la BD sigue caída: esperar
+            break
+        except Exception as e:
+            print(f"Trabajo aparcado descartado ({name}): {e}")
+            os.replace(claimed, path + ".failed")
+            continue
+        os.remove(claimed)
+        done += 1
+    return done
+
+
+async def _drain_forever(handler) -> None:
+    while True:
+        await asyncio.sleep(DRAIN_INTERVAL_SECONDS)
+        reclaim_stale()
+        if db_breaker.state == "open" or not _parked_files():
+            continue
+        try:
+            done = await drain_parked(handler)
+            if done:
+                print(f"✅ {done} trabajos aparcados escritos")
+        except Exception as e:
+            print(f"Error drenando trabajos aparcados: {e}")
+
+
+def start_drainer(handler: Callable[[dict], Awaitable]):
+    """Arranca (lifespan) el reintento periódico de trabajos aparcados."""
+    return asyncio.create_task(_drain_forever(handler))
@@ -0,0 +1,49 @@
+# app/services/downsampling.py
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: índices de los n_out puntos que mejor
+    conservan la forma de la serie (x creciente). Siempre incluye extremos.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])[:max(n_out, 0)]
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bordes de los n_out-2 buckets interiores sobre los puntos 1..n-2
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    # Huecos (NaN): no compiten por el área; un bucket sólo de huecos
+    # conserva uno, para que la serie reducida siga mostrando el hueco
+    finite = np.isfinite(y)
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        cand = lo + np.flatnonzero(finite[lo:hi])
+        if cand.size == 0:
+            selected[i + 1] = lo
+            continue
+        # Promedio del bucket siguiente (o el último punto)
+        if i + 2 < len(edges):
+            nxt = edges[i + 1] + np.flatnonzero(finite[edges[i + 1]:edges[i + 2]])
+        else:
+            nxt = np.array([n - 1]) if finite[-1] else np.empty(0, dtype=int)
+        if nxt.size:
+            avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+        else:
+            avg_x, avg_y = x[-1], y[cand].mean()
+        y_a = y[a] if finite[a] else avg_y
+        # Área del triángulo (a, candidato, promedio siguiente)
+        area = np.abs(
+            (x[a] - avg_x) * (y[cand] - y_a) - (x[a] - x[cand]) * (avg_y - y_a)
+        )
+        a = int(cand[np.argmax(area)])
+        selected[i + 1] = a
+    return selected
@@ -0,0 +1,101 @@
+# app/services/dsp_pool.py
+"""
+Ejecución del DSP fuera del event loop.
+
+Con DSP_WORKERS=0 (por defecto) el DSP corre en hilos del propio worker
+API. Con DSP_WORKERS>0 cada worker API tiene su pool de procesos DSP, con
+los hilos BLAS/OpenMP limitados a DSP_THREADS y, si DSP_PIN_CORES=1, cada
+proceso fijado a un núcleo distinto.
+"""
+import asyncio
+import fcntl
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from app.core.config import DSP_WORKERS, DSP_THREADS, DSP_PIN_CORES, DSP_SLOT_DIR
+from app.services.profiling import current_profile
+
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS", "VECLIB_MAXIMUM_THREADS",
+)
+MAX_SLOTS = 256
+
+_executor: Optional[ProcessPoolExecutor] = None
+_slot_fd: Optional[int] = None
+
+
+def cap_threads(n: int) -> None:
+    """Limita los hilos de BLAS/OpenMP; efectivo antes de importar numpy."""
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(n)
+
+
+def _claim_slot() -> int:
+    """
+    Índice de este worker API entre sus hermanos, con un flock por slot
+    en DSP_SLOT_DIR (se libera solo si el proceso muere).
+    """
+    global _slot_fd
+    if not DSP_SLOT_DIR:
+        return 0
+    for slot in range(MAX_SLOTS):
+        fd = os.open(os.path.join(DSP_SLOT_DIR, f"slot-{slot}.lock"), os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            continue
+        _slot_fd = fd
+        return slot
+    return 0
+
+
+def _init_dsp_worker(counter, first_index: int, pin: bool) -> None:
+    with counter.get_lock():
+        index = first_index + counter.value
+        counter.value += 1
+    if pin and hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, {cores[index % len(cores)]})
+
+
+def get_dsp_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    if DSP_WORKERS <= 0:
+        return None
+    if _executor is None:
+        # Los procesos "spawn" heredan este entorno al importar numpy
+        cap_threads(DSP_THREADS)
+        ctx = multiprocessing.get_context("spawn")
+        _executor = ProcessPoolExecutor(
+            max_workers=DSP_WORKERS,
+            mp_context=ctx,
+            initializer=_init_dsp_worker,
+            initargs=(ctx.Value("i", 0), _claim_slot() * DSP_WORKERS, DSP_PIN_CORES),
+        )
+    return _executor
+
+
+async def run_dsp(func, *args):
+    """Corre func(*args) en el pool DSP (o en un hilo si no hay pool)."""
+    profile = current_profile()
+    if profile is not None:
+        # Request perfilado: en un hilo de este proceso para poder muestrearlo
+        return await asyncio.to_thread(profile.run_tracked, func, *args)
+    executor = get_dsp_executor()
+    if executor is None:
+        return await asyncio.to_thread(func, *args)
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+def shutdown_dsp_pool() -> None:
+    global _executor, _slot_fd
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+    if _slot_fd is not None:
+        os.close(_slot_fd)
+        _slot_fd = None
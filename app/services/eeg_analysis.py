@@ -1,6 +1,123 @@
 # app/services/eeg_analysis.py
+"""
+Emoción rápida a partir de unos segundos de EEG crudo de Muse, sin BD
+(POST /biometrics/quick-emotion). Pensado para feedback < 100 ms
+durante una tarea; el pipeline completo sigue en process_session.
+"""
+from typing import Optional, Tuple
+
 import numpy as np
 
+from app.services.psd_plan import get_psd_plan
+from app.services.resampling import resample
+
+SAMPLING_EEG = 256
+N_ELECTRODES = 4                 # Muse: 0=TP9, 1=AF7, 2=AF8, 3=TP10
+AF7, AF8 = 1, 2
+QUICK_NFFT = (512, 256, 128)     # FFT más larga que quepa en las muestras recientes
+
+# (valencia, arousal) → emoción
+QUICK_EMOTION_MAP = {
+    ('strong_pos', 'low'):      ('Relaxed',   '😌'),
+    ('strong_pos', 'moderate'): ('Happy',      '😁'),
+    ('strong_pos', 'high'):     ('Euphoric',   '🤯'),
+
+    ('pos', 'low'):             ('Calm',       '😌'),
+    ('pos', 'moderate'):        ('Content',    '🙂'),
+    ('pos', 'high'):            ('Excited',    '🤩'),
+
+    ('neg', 'low'):             ('Sad',        '😢'),
+    ('neg', 'moderate'):        ('Worried',    '😟'),
+    ('neg', 'high'):            ('Stressed',   '😰'),
+
+    ('strong_neg', 'low'):      ('Depressed',  '😞'),
+    ('strong_neg', 'moderate'): ('Angry',      '😡'),
+    ('strong_neg', 'high'):     ('Furious',    '🤬'),
+}
+
+
+def group_electrodes(raw_data: list) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Agrupa los paquetes en un array (4, N) preasignado, en orden de
+    llegada. Las filas más cortas quedan con NaN al final; devuelve
+    también cuántas muestras tiene cada electrodo.
+    """
+    elec = np.fromiter((entry["electrode"] for entry in raw_data), dtype=np.intp, count=len(raw_data))
+    if elec.size and (elec.min() < 0 or elec.max() >= N_ELECTRODES):
+        raise ValueError(f"electrode must be 0..{N_ELECTRODES - 1}")
+    sizes = np.fromiter((len(entry["samples"]) for entry in raw_data), dtype=np.intp, count=len(raw_data))
+    lengths = np.bincount(elec, weights=sizes, minlength=N_ELECTRODES).astype(np.intp)
+
+    grid = np.full((N_ELECTRODES, int(lengths.max(initial=0))), np.nan)
+    cursor = [0] * N_ELECTRODES
+    for e, n, entry in zip(elec.tolist(), sizes.tolist(), raw_data):
+        grid[e, cursor[e]:cursor[e] + n] = entry["samples"]
+        cursor[e] += n
+    return grid, lengths
+
+
+def regrid(grid: np.ndarray, lengths: np.ndarray, fs: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Remuestrea cada fila (sin el relleno NaN) de fs a SAMPLING_EEG."""
+    rows = [resample(grid[e, :n], fs, SAMPLING_EEG) for e, n in enumerate(lengths.tolist())]
+    new_lengths = np.fromiter((r.size for r in rows), dtype=np.intp, count=len(rows))
+    out = np.full((N_ELECTRODES, int(new_lengths.max(initial=0))), np.nan)
+    for e, r in enumerate(rows):
+        out[e, :r.size] = r
+    return out, new_lengths
+
+
+def band_powers(grid: np.ndarray, lengths: np.ndarray, rows=(AF7, AF8)):
+    """
+    Potencia α y θ (µV²) de las últimas nfft muestras de cada fila, con
+    una sola FFT ventaneada (Hann) sobre todas las filas a la vez.
+    Devuelve (alpha, theta) por fila, o None si no hay muestras suficientes.
+    """
+    rows = np.asarray(rows)
+    available = int(lengths[rows].min()) if rows.size else 0
+    nfft = next((n for n in QUICK_NFFT if n <= available), None)
+    if nfft is None:
+        return None
+
+    plan = get_psd_plan(nfft, 0, SAMPLING_EEG, "hanning")
+    cols = lengths[rows, None] - nfft + np.arange(nfft)
+    block = grid[rows[:, None], cols]
+    block = block - block.mean(axis=1, keepdims=True)
+
+    spectra = np.fft.rfft(block * plan.window, axis=1)
+    psd = (spectra.real ** 2 + spectra.imag ** 2) * plan.scale
+    return psd @ plan.band_weights["alpha"], psd @ plan.band_weights["theta"]
+
+
+def quick_emotion(raw_data: list, sampling_rate: Optional[float] = None) -> dict:
+    """
+    Etiqueta, emoji y las métricas usadas (θ/α y asimetría α AF8-AF7).
+    Con sampling_rate distinto de 256 Hz las muestras se remuestrean antes.
+    """
+    grid, lengths = group_electrodes(raw_data)
+    if sampling_rate and sampling_rate != SAMPLING_EEG:
+        grid, lengths = regrid(grid, lengths, sampling_rate)
+    powers = band_powers(grid, lengths)
+
+    if powers is None:
+        theta_alpha_ratio, asym_index = np.nan, 0.0
+    else:
+        (alpha_af7, alpha_af8), (theta_af7, theta_af8) = powers
+        alpha_avg = (alpha_af7 + alpha_af8) / 2
+        theta_avg = (theta_af7 + theta_af8) / 2
+        theta_alpha_ratio = theta_avg / alpha_avg if alpha_avg > 0 else np.nan
+        # Asimetría frontal en log-potencia (AF8 - AF7)
+        asym_index = float(np.log(alpha_af8) - np.log(alpha_af7)) if alpha_af7 > 0 and alpha_af8 > 0 else 0.0
+
+    emotion, emoji_ = classify(asym_index, theta_alpha_ratio)
+    return {
+        "emotion":           emotion,
+        "emoji":             emoji_,
+        "theta_alpha_ratio": None if np.isnan(theta_alpha_ratio) else float(theta_alpha_ratio),
+        "asymmetry":         asym_index,
+        "samples":           lengths.tolist(),
+    }
+
+
 def detect_emotion_from_eeg(raw_data: list):
     """
     Recibe la data EEG proveniente de Muse en formato:
@@ -11,28 +128,13 @@ def detect_emotion_from_eeg(raw_data: list):
     ]
     Retorna la emoción detectada (ej.: "Feliz", "Estresado", etc.) y el emoji.
     """
+    result = quick_emotion(raw_data)
+    return result["emotion"], result["emoji"]
 
-    # 1) Acumular muestras por electrodo
-    electrode_data = {0: [], 1: [], 2: [], 3: []}
-    for entry in raw_data:
-        elec = entry['electrode']
-        samples = entry['samples']
-        electrode_data[elec].extend(samples)
 
-    # 2) Calcular potencias "naif" en bandas Alpha y Theta
-    alpha_af7 = np.mean(electrode_data[1]) if electrode_data[1] else 0
-    alpha_af8 = np.mean(electrode_data[2]) if electrode_data[2] else 0
-
-    theta_af7 = alpha_af7 * 0.8
-    theta_af8 = alpha_af8 * 0.8
-
-    alpha_avg = np.mean([alpha_af7, alpha_af8]) if (alpha_af7 or alpha_af8) else 0
-    theta_avg = np.mean([theta_af7, theta_af8]) if (theta_af7 or theta_af8) else 0
-    theta_alpha_ratio = theta_avg / alpha_avg if alpha_avg != 0 else np.nan
-
-    asym_index = alpha_af8 - alpha_af7  # (AF8 - AF7)
-
-    # 3) Clasificación de valencia y activación
+def classify(asym_index: float, theta_alpha_ratio: float) -> Tuple[str, str]:
+    """(asimetría α, θ/α) → (emoción, emoji)."""
+    # 1) Clasificación de valencia y activación
     # Valencia (según asimetría)
     if asym_index < -1:
         valence_cat = 'strong_pos'
@@ -53,25 +155,7 @@ def detect_emotion_from_eeg(raw_data: list):
     else:
         arousal_cat = 'high'
 
-    # 4) Mapeo de (valencia, arousal) a emoción
-    emotion_map = {
-        ('strong_pos', 'low'):      ('Relaxed',   '😌'),
-        ('strong_pos', 'moderate'): ('Happy',      '😁'),
-        ('strong_pos', 'high'):     ('Euphoric',   '🤯'),
-
-        ('pos', 'low'):             ('Calm',       '😌'),
-        ('pos', 'moderate'):        ('Content',    '🙂'),
-        ('pos', 'high'):            ('Excited',    '🤩'),
-
-        ('neg', 'low'):             ('Sad',        '😢'),
-        ('neg', 'moderate'):        ('Worried',    '😟'),
-        ('neg', 'high'):            ('Stressed',   '😰'),
-
-        ('strong_neg', 'low'):      ('Depressed',  '😞'),
-        ('strong_neg', 'moderate'): ('Angry',      '😡'),
-        ('strong_neg', 'high'):     ('Furious',    '🤬'),
-    }
-
-    emotion, emoji_ = emotion_map.get((valence_cat, arousal_cat), ('Neutral', '😐'))
+    # 2) Mapeo de (valencia, arousal) a emoción
+    emotion, emoji_ = QUICK_EMOTION_MAP.get((valence_cat, arousal_cat), ('Neutral', '😐'))
 
     return emotion, emoji_
@@ -1,5 +1,6 @@
 # app/services/emotion.py
 from typing import Tuple
+import numpy as np
 
 # ───── 1) Mapa limpio  ─────────────────────────────────────────────
 EMOTION_MAP: dict[tuple[str, str], tuple[str, str]] = {
@@ -40,3 +41,27 @@ def cat_arousal(a: float) -> str:
 def emotion_from_axes(valence: float, arousal: float) -> tuple[str, str]:
     pair = (cat_valence(valence), cat_arousal(arousal))
     return EMOTION_MAP.get(pair, DEFAULT_EMOTION)
+
+
+# ───── 4) Versión vectorizada (np.digitize + tabla) ────────────────
+# Cortes equivalentes a cat_valence / cat_arousal (NaN cae en el último bin)
+VALENCE_BINS = np.array([-0.5, 0.0, 0.5])
+AROUSAL_BINS = np.array([-0.25, 0.25])
+VALENCE_CATS = ('strong_neg', 'neg', 'pos', 'strong_pos')
+AROUSAL_CATS = ('low', 'moderate', 'high')
+
+LABEL_TABLE = np.array([
+    [EMOTION_MAP.get((v, a), DEFAULT_EMOTION)[0] for a in AROUSAL_CATS]
+    for v in VALENCE_CATS
+], dtype=object)
+EMOJI_TABLE = np.array([
+    [EMOTION_MAP.get((v, a), DEFAULT_EMOTION)[1] for a in AROUSAL_CATS]
+    for v in VALENCE_CATS
+], dtype=object)
+
+
+def emotions_from_axes(valence, arousal) -> tuple[np.ndarray, np.ndarray]:
+    """Etiquetas y emojis para arrays de valence/arousal en una sola llamada."""
+    v_idx = np.digitize(np.asarray(valence, dtype=np.float64), VALENCE_BINS)
+    a_idx = np.digitize(np.asarray(arousal, dtype=np.float64), AROUSAL_BINS)
+    return LABEL_TABLE[v_idx, a_idx], EMOJI_TABLE[v_idx, a_idx]
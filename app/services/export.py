@@ -0,0 +1,151 @@
+# app/services/export.py
+import csv
+import io
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import select, and_
+
+from app.db.async_engine import engine_async
+from app.db.models_bio import Session, SessionTask
+
+# ───── Constantes ────────────────────────────────────────────────
+EXPORT_CHUNK_ROWS = 5000   # filas por lote leído del cursor / escrito
+
+EXPORT_COLUMNS = [
+    Session.session_id,
+    Session.user_firebase_id,
+    Session.context_type,
+    Session.session_relation,
+    Session.created_at.label("session_created_at"),
+    Session.session_avg_stress,
+    Session.session_emotion,
+    Session.session_arousal,
+    Session.session_valence,
+    SessionTask.task_id,
+    SessionTask.task_name,
+    SessionTask.normalized_stress,
+    SessionTask.emotion_label,
+    SessionTask.heart_rate,
+    SessionTask.created_at.label("task_created_at"),
+]
+EXPORT_HEADER = [col.key for col in EXPORT_COLUMNS]
+
+
+def export_stmt(date_from: Optional[datetime] = None,
+                date_to: Optional[datetime] = None,
+                context_type: Optional[str] = None,
+                session_relation: Optional[str] = None):
+    """Select Core (sin ORM) de tareas + datos de sesión con los filtros dados."""
+    stmt = (
+        select(*EXPORT_COLUMNS)
+        .join(SessionTask, and_(SessionTask.session_id == Session.session_id,
+                                SessionTask.created_at >= Session.created_at))
+        .order_by(Session.created_at, SessionTask.id)
+    )
+    if date_from is not None:
+        # Ambas tablas particionadas por mes: el límite en las dos poda particiones
+        stmt = stmt.where(Session.created_at >= date_from,
+                          SessionTask.created_at >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(Session.created_at < date_to)
+    if context_type is not None:
+        stmt = stmt.where(Session.context_type == context_type)
+    if session_relation is not None:
+        stmt = stmt.where(Session.session_relation == session_relation)
+    return stmt.execution_options(yield_per=EXPORT_CHUNK_ROWS)
+
+
+async def iter_row_chunks(stmt):
+    """
+    Lotes de filas leídos de un cursor del lado del servidor sobre una
+    única conexión; la memoria queda acotada por EXPORT_CHUNK_ROWS.
+    """
+    async with engine_async.connect() as conn:
+        result = await conn.stream(stmt)
+        async for chunk in result.partitions(EXPORT_CHUNK_ROWS):
+            yield chunk
+
+
+# ───── Writers ───────────────────────────────────────────────────
+async def stream_csv(stmt):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_HEADER)
+    async for chunk in iter_row_chunks(stmt):
+        writer.writerows(chunk)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate(0)
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """File-like mínimo para ParquetWriter que se vacía tras cada row group."""
+
+    def __init__(self):
+        self._parts = []
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _parquet_value(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+
+async def stream_parquet(stmt):
+    # Dependencia opcional: sólo se necesita para este formato
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("session_id", pa.string()),
+        ("user_firebase_id", pa.string()),
+        ("context_type", pa.string()),
+        ("session_relation", pa.string()),
+        ("session_created_at", pa.timestamp("us")),
+        ("session_avg_stress", pa.float64()),
+        ("session_emotion", pa.string()),
+        ("session_arousal", pa.float64()),
+        ("session_valence", pa.float64()),
+        ("task_id", pa.string()),
+        ("task_name", pa.string()),
+        ("normalized_stress", pa.float64()),
+        ("emotion_label", pa.string()),
+        ("heart_rate", pa.float64()),
+        ("task_created_at", pa.timestamp("us")),
+    ])
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for chunk in iter_row_chunks(stmt):
+            columns = [
+                [_parquet_value(v) for v in col] for col in zip(*chunk)
+            ]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,280 @@
+# app/services/golden.py
+"""
+Corpus de regresión del pipeline de emociones (valores y tiempos).
+
+Cada caso es un payload determinista (sintético, o la muestra real de
+json.txt con los identificadores anonimizados). golden_expected.json
+guarda, por versión de corpus y por backend HRV (HRV_BACKEND: LF/HF,
+y con él arousal y estrés, cambia entre backends), las features
+esperadas de cada caso y el tiempo de referencia de cada etapa. Todo
+corre offline, sin BD ni variables de conexión.
+
+    python -m app.services.golden check            # valores + tiempos
+    python -m app.services.golden check --no-timing
+    python -m app.services.golden record           # regenerar esperados
+    HRV_BACKEND=numpy python -m app.services.golden check
+
+Un backend sin valores grabados se omite. tests/test_golden.py corre la
+misma comparación de valores (sin tiempos) con pytest.
+
+`check` termina con código 1 si un valor se sale de la tolerancia, si
+cambia una etiqueta o si una etapa es más lenta que su referencia por
+más de --time-threshold (25% por defecto) más --time-slack-ms. Los
+tiempos dependen de la máquina: grabarlos (`record --timing-only`) en
+la máquina donde se vaya a comparar.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from app.models.biometrics import SessionPayload
+from app.services.session_features import (
+    compute_session_features, compute_baseline, task_deltas, score_tasks, pick_first
+)
+from app.services.hrv_backends import get_hrv_backend
+from app.services.signal_processing import theta_beta_ratio, hr_from_ppg, lf_hf_ratio
+from app.services.synthetic import synthetic_session_payload
+
+CORPUS_VERSION = 2
+HERE = os.path.dirname(os.path.abspath(__file__))
+EXPECTED_PATH = os.path.join(HERE, "golden_expected.json")
+SAMPLE_PATH = os.path.join(HERE, "json.txt")
+
+RTOL = 1e-6
+ATOL = 1e-9
+TIME_THRESHOLD = 0.25
+TIME_SLACK_MS = 0.5      # margen absoluto: las etapas de ~1 ms tienen ruido de scheduler
+REPEATS = 15
+
+
+# ───── Casos del corpus ──────────────────────────────────────────
+def _sample_payload() -> SessionPayload:
+    """Sesión real de json.txt (el fichero trae texto extra tras el JSON)."""
+    with open(SAMPLE_PATH, encoding="utf-8") as f:
+        data, _ = json.JSONDecoder().raw_decode(f.read())
+    data.update(sessionId="session_golden_sample", userFirebaseId="anon", participantId="anon")
+    return SessionPayload.model_validate(data)
+
+
+def _without_ppg() -> SessionPayload:
+    payload = synthetic_session_payload(n_tasks=2, seed=3)
+    for task in payload.tasks:
+        task.ppg = np.empty(0)
+    return payload
+
+
+def _without_af8() -> SessionPayload:
+    payload = synthetic_session_payload(n_tasks=2, seed=4)
+    for task in payload.tasks:
+        task.eeg = [pkt for pkt in task.eeg if pkt.channel != "AF8"]
+    return payload
+
+
+def _with_gaps() -> SessionPayload:
+    """Huecos NaN en EEG y PPG (se limpian antes del DSP)."""
+    payload = synthetic_session_payload(n_tasks=2, seed=5)
+    for part in (payload.restData, *payload.tasks):
+        for pkt in part.eeg:
+            values = np.asarray(pkt.values)
+            values[500:800] = np.nan
+            pkt.values = values
+        ppg = np.asarray(part.ppg)
+        ppg[200:260] = np.nan
+        part.ppg = ppg
+    return payload
+
+
+def _memmap_rest(tmp: str) -> SessionPayload:
+    """Reposo largo (10 min) en memmap: pasa por chunked_dsp."""
+    from app.services.chunked_dsp import write_sample_store
+    payload = synthetic_session_payload(n_tasks=2, rest_seconds=600, seed=6)
+    rest = payload.restData
+    for pkt in rest.eeg:
+        pkt.values = write_sample_store(os.path.join(tmp, f"rest_{pkt.channel}.f32"), pkt.values)
+    rest.ppg = write_sample_store(os.path.join(tmp, "rest_ppg.f32"), rest.ppg)
+    return payload
+
+
+CASES: Dict[str, Callable] = {
+    "synthetic_default":  lambda tmp: synthetic_session_payload(),
+    "synthetic_5_tasks":  lambda tmp: synthetic_session_payload(n_tasks=5, seed=7),
+    "short_tasks":        lambda tmp: synthetic_session_payload(n_tasks=3, task_seconds=1.5, seed=1),
+    "meeting":            lambda tmp: synthetic_session_payload(seed=2, context_type="meeting",
+                                                                session_relation="golden-meeting"),
+    "tasks_without_ppg":  lambda tmp: _without_ppg(),
+    "tasks_without_af8":  lambda tmp: _without_af8(),
+    "nan_gaps":           lambda tmp: _with_gaps(),
+    "memmap_rest":        _memmap_rest,
+    "sample_json":        lambda tmp: _sample_payload(),
+}
+
+
+def _quiet(func, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+
+def compute_corpus(names=None) -> Dict[str, dict]:
+    with tempfile.TemporaryDirectory() as tmp:
+        return {
+            name: _quiet(compute_session_features, build(tmp))
+            for name, build in CASES.items()
+            if names is None or name in names
+        }
+
+
+# ───── Tiempos por etapa ─────────────────────────────────────────
+def _best_ms(func, *args, repeats: int = REPEATS) -> float:
+    _quiet(func, *args)                                 # calentar cachés (planes, filtros)
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        _quiet(func, *args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def measure_stages(repeats: int = REPEATS) -> Dict[str, float]:
+    payload = synthetic_session_payload(n_tasks=5, seed=7)
+    rest = payload.restData
+    baseline = _quiet(compute_baseline, rest)
+    deltas = _quiet(lambda: [task_deltas(t, baseline) for t in payload.tasks])
+    stages = {
+        "theta_beta_ratio": (theta_beta_ratio, pick_first(rest.eeg, "AF7")),
+        "hr_from_ppg":      (hr_from_ppg, rest.ppg),
+        "lf_hf_ratio":      (lf_hf_ratio, rest.ppg),
+        "baseline":         (compute_baseline, rest),
+        "task_dsp":         (lambda: [task_deltas(t, baseline) for t in payload.tasks],),
+        "scoring":          (score_tasks, payload.tasks, deltas),
+        "session":          (compute_session_features, payload),
+    }
+    return {
+        name: round(_best_ms(func, *args, repeats=repeats), 3)
+        for name, (func, *args) in stages.items()
+    }
+
+
+# ───── Comparación ───────────────────────────────────────────────
+def compare(expected, actual, path: str, rtol: float, atol: float) -> List[str]:
+    """Diferencias entre dos árboles de features (floats con tolerancia)."""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        errors = [f"{path}.{k}: missing" for k in expected.keys() - actual.keys()]
+        errors += [f"{path}.{k}: unexpected" for k in actual.keys() - expected.keys()]
+        for key in expected.keys() & actual.keys():
+            errors += compare(expected[key], actual[key], f"{path}.{key}", rtol, atol)
+        return errors
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return [f"{path}: {len(actual)} items, expected {len(expected)}"]
+        errors = []
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            errors += compare(e, a, f"{path}[{i}]", rtol, atol)
+        return errors
+    if isinstance(expected, float) and isinstance(actual, (int, float)):
+        if not np.isclose(actual, expected, rtol=rtol, atol=atol):
+            return [f"{path}: {actual!r} != {expected!r}"]
+        return []
+    if expected != actual:
+        return [f"{path}: {actual!r} != {expected!r}"]
+    return []
+
+
+def load_expected() -> dict:
+    with open(EXPECTED_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check(args) -> int:
+    expected = load_expected()
+    if expected["version"] != CORPUS_VERSION:
+        print(f"Corpus version {expected['version']} != {CORPUS_VERSION}: run `record`")
+        return 1
+
+    failures = []
+    backend = get_hrv_backend().name
+    pinned = expected["backends"].get(backend)
+    if pinned is None:
+        print(f"⏭️  HRV backend {backend!r} sin valores grabados: se omiten casos y tiempos "
+              f"(HRV_BACKEND={backend} python -m app.services.golden record)")
+    else:
+        actual = compute_corpus()
+        for name in CASES:
+            if name not in pinned["cases"]:
+                failures.append(f"{name}: not recorded")
+                continue
+            errors = compare(pinned["cases"][name], actual[name], name, args.rtol, args.atol)
+            print(f"{'✅' if not errors else '❌'} {name} [{backend}]")
+            failures += errors
+
+    if pinned is not None and not args.no_timing:
+        timings = measure_stages(args.repeats)
+        for stage, ms in timings.items():
+            budget = pinned["timings_ms"].get(stage)
+            if budget is None:
+                continue
+            limit = budget * (1 + args.time_threshold) + args.time_slack_ms
+            ok = ms <= limit
+            print(f"{'✅' if ok else '❌'} {stage:<17} {ms:9.2f} ms  (ref {budget:.2f}, limit {limit:.2f})")
+            if not ok:
+                failures.append(f"{stage}: {ms:.2f} ms > {limit:.2f} ms")
+
+    for failure in failures:
+        print(f"  {failure}")
+    return 1 if failures else 0
+
+
+def record(args) -> int:
+    """Graba los valores del backend HRV activo; los de otros backends se conservan."""
+    expected = load_expected() if os.path.exists(EXPECTED_PATH) else {}
+    if expected.get("version") != CORPUS_VERSION:
+        expected = {"version": CORPUS_VERSION, "backends": {}}
+    backend = get_hrv_backend().name
+    pinned = expected["backends"].setdefault(backend, {})
+    if not args.timing_only or "cases" not in pinned:
+        pinned["cases"] = compute_corpus()
+    pinned["timings_ms"] = measure_stages(args.repeats)
+    expected["machine"] = {
+        "python":    platform.python_version(),
+        "numpy":     np.__version__,
+        "processor": platform.machine(),
+        "cpus":      os.cpu_count(),
+    }
+    with open(EXPECTED_PATH, "w", encoding="utf-8") as f:
+        json.dump(expected, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"Recorded {len(pinned['cases'])} cases for HRV backend {backend!r} in {EXPECTED_PATH}")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    check_p = sub.add_parser("check", help="comparar con los valores y tiempos grabados")
+    check_p.add_argument("--rtol", type=float, default=RTOL)
+    check_p.add_argument("--atol", type=float, default=ATOL)
+    check_p.add_argument("--time-threshold", type=float, default=TIME_THRESHOLD,
+                         help="fracción de lentitud tolerada por etapa")
+    check_p.add_argument("--time-slack-ms", type=float, default=TIME_SLACK_MS)
+    check_p.add_argument("--no-timing", action="store_true")
+    check_p.add_argument("--repeats", type=int, default=REPEATS)
+
+    record_p = sub.add_parser("record", help="regenerar golden_expected.json")
+    record_p.add_argument("--timing-only", action="store_true")
+    record_p.add_argument("--repeats", type=int, default=REPEATS)
+
+    args = parser.parse_args()
+    sys.exit(check(args) if args.command == "check" else record(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# app/services/hrv_backends.py
+"""
+Backends de HRV intercambiables para signal_processing.
+
+- "neurokit": NeuroKit2 (nk.ppg_process + nk.hrv_frequency). Es el
+  backend por defecto y la referencia de los valores guardados.
+- "numpy": implementación ligera (Butterworth + Elgendi + Welch sobre RR
+  interpolado a 4 Hz), opcional con HRV_BACKEND=numpy. Mismos picos y HR
+  que NeuroKit2, pero LF/HF sólo comparable con señales de 60 s o más y
+  aun así a ~10% (3.615 vs 3.254 a 60 s); por debajo devuelve un valor
+  donde NeuroKit2 da NaN (2.773 vs NaN a 30 s). No es un reemplazo
+  transparente: cambia LF/HF, y con él estrés y emoción.
+
+La comparación de ambos sobre PPG sintético está en tests/test_hrv_backends.py.
+"""
+from functools import lru_cache
+from typing import Dict
+
+import numpy as np
+from scipy.integrate import trapezoid
+from scipy.interpolate import CubicSpline
+from scipy.ndimage import uniform_filter1d
+from scipy.signal import butter, find_peaks, sosfiltfilt, welch
+
+from app.core.config import HRV_BACKEND
+
+# ───── Constantes ────────────────────────────────────────────────
+LF_BAND = (0.04, 0.15)
+HF_BAND = (0.15, 0.4)
+RR_RESAMPLE_HZ = 4.0
+
+
+class HRVBackend:
+    """Interfaz: detección de picos PPG y LF/HF a partir de los picos."""
+
+    name = "base"
+
+    def detect_peaks(self, ppg, fs: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def lf_hf(self, peaks: np.ndarray, fs: int) -> float:
+        raise NotImplementedError
+
+
+# ───── Backend NumPy/SciPy ───────────────────────────────────────
+@lru_cache(maxsize=16)
+def _bandpass_sos(fs: int, low: float = 0.5, high: float = 8.0, order: int = 2):
+    return butter(order, [low, high], btype="bandpass", output="sos", fs=fs)
+
+
+def bandpass_ppg(ppg, fs: int) -> np.ndarray:
+    return sosfiltfilt(_bandpass_sos(fs), np.asarray(ppg, dtype=np.float64))
+
+
+def elgendi_waves(signal: np.ndarray, fs: int, mean_sqrd: float):
+    """
+    Bloques de interés de Elgendi: (inicios, fines, ventana de pico).
+    `mean_sqrd` es la media global de la señal al cuadrado (umbral), que
+    se pasa aparte para poder procesar la señal por trozos.
+    """
+    sqrd = np.clip(signal, 0, None) ** 2
+    peak_win = int(np.rint(0.111 * fs))
+    ma_peak = uniform_filter1d(sqrd, peak_win, mode="nearest")
+    ma_beat = uniform_filter1d(sqrd, int(np.rint(0.667 * fs)), mode="nearest")
+    waves = ma_peak > ma_beat + 0.02 * mean_sqrd
+
+    beg = np.flatnonzero(~waves[:-1] & waves[1:])
+    end = np.flatnonzero(waves[:-1] & ~waves[1:])
+    return beg, end, peak_win
+
+
+def wave_peaks(signal: np.ndarray, pairs, fs: int, peak_win: int, last: int = 0):
+    """Pico más prominente de cada bloque (b, e), con periodo refractario de 0.3 s."""
+    min_delay = int(np.rint(0.3 * fs))
+    peaks = []
+    for b, e in pairs:
+        if e - b < peak_win:
+            continue
+        locmax, props = find_peaks(signal[b:e], prominence=(None, None))
+        if locmax.size:
+            peak = b + locmax[np.argmax(props["prominences"])]
+            if peak - last > min_delay:
+                peaks.append(peak)
+                last = peak
+    return peaks, last
+
+
+class NumpyHRVBackend(HRVBackend):
+    name = "numpy"
+
+    def detect_peaks(self, ppg, fs: int) -> np.ndarray:
+        """Picos sistólicos (Elgendi 2013) sobre el PPG filtrado 0.5–8 Hz."""
+        signal = bandpass_ppg(ppg, fs)
+        beg, end, peak_win = elgendi_waves(signal, fs, np.mean(np.clip(signal, 0, None) ** 2))
+        if beg.size == 0:
+            return np.array([], dtype=int)
+        end = end[end > beg[0]]
+
+        peaks, _ = wave_peaks(signal, zip(beg, end), fs, peak_win)
+        return np.asarray(peaks, dtype=int)
+
+    def lf_hf(self, peaks: np.ndarray, fs: int) -> float:
+        """LF/HF por Welch sobre la serie RR interpolada (spline cúbico) a 4 Hz."""
+        peaks = np.asarray(peaks)
+        if peaks.size < 4:
+            return np.nan
+        rr = np.diff(peaks) / fs * 1000.0               # ms
+        t_rr = peaks[1:] / fs                           # s, instante de cada RR
+        t = np.arange(t_rr[0], t_rr[-1], 1.0 / RR_RESAMPLE_HZ)
+        if t.size < 16:
+            return np.nan
+        rr_uniform = CubicSpline(t_rr, rr)(t)
+
+        nperseg = min(256, t.size)
+        freqs, psd = welch(rr_uniform, fs=RR_RESAMPLE_HZ, nperseg=nperseg,
+                           detrend="constant")
+
+        lf_mask = (freqs >= LF_BAND[0]) & (freqs < LF_BAND[1])
+        hf_mask = (freqs >= HF_BAND[0]) & (freqs < HF_BAND[1])
+        if lf_mask.sum() < 2 or hf_mask.sum() < 2:
+            return np.nan
+        lf = trapezoid(psd[lf_mask], freqs[lf_mask])
+        hf = trapezoid(psd[hf_mask], freqs[hf_mask])
+        return float(lf / hf) if hf > 0 else np.nan
+
+
+# ───── Backend NeuroKit2 (referencia) ────────────────────────────
+class NeuroKitHRVBackend(HRVBackend):
+    name = "neurokit"
+
+    def detect_peaks(self, ppg, fs: int) -> np.ndarray:
+        import neurokit2 as nk
+        _, info = nk.ppg_process(ppg, sampling_rate=fs)
+        return np.asarray(info.get("PPG_Peaks", []), dtype=int)
+
+    def lf_hf(self, peaks: np.ndarray, fs: int) -> float:
+        import neurokit2 as nk
+        hrv = nk.hrv_frequency(peaks, sampling_rate=fs, show=False)
+        if hrv.empty or "HRV_LFHF" not in hrv.columns:
+            return np.nan
+        return float(hrv.loc[0, "HRV_LFHF"])
+
+
+BACKENDS: Dict[str, HRVBackend] = {
+    b.name: b for b in (NumpyHRVBackend(), NeuroKitHRVBackend())
+}
+
+
+def get_hrv_backend(name: str = None) -> HRVBackend:
+    name = name or HRV_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown HRV backend: {name} (options: {', '.join(BACKENDS)})")
+    return BACKENDS[name]
@@ -0,0 +1,218 @@
+# app/services/incremental_session.py
+"""
+Sesiones incrementales: en vez de mandar todas las tareas al final,
+el cliente abre la sesión con el reposo (baseline calculado en el acto),
+agrega cada tarea al terminarla y cierra con finalize.
+
+Cada tarea se procesa y persiste al llegar, con su arousal/valence sin
+redondear. La media de la sesión se recalcula en SQL sobre sus tareas
+(avg de double precision, sin arrastrar el redondeo de numeric(5,3)) y
+se copia a la fila de Session, bloqueada con SELECT ... FOR UPDATE para
+que dos tareas simultáneas no se pisen. finalize deriva de ahí la
+emoción y el estrés medio; después ya no se admiten tareas (409).
+
+Las frecuencias de muestreo de la sesión (eegSamplingRate/ppgSamplingRate
+al abrir) se guardan en Session y las heredan las tareas que no
+declaran las suyas, como en un SessionPayload completo.
+"""
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+from sqlalchemy import select, func, and_
+
+from app.db.models_bio import Session, Baseline, SessionTask
+from app.models.biometrics import SessionOpenRequest, TaskPacket, inherit_rates
+from app.services.session_features import (
+    compute_baseline, compute_task_features, session_summary
+)
+from app.services.process_session import claim_session_id, registered_at
+from app.services.relation_live import publish_tasks, share_tasks
+from app.services.dsp_pool import run_dsp
+from app.services.db_resilience import run_db
+
+
+def _float(value, default: float = 0.0) -> float:
+    return float(value) if value is not None else default
+
+
+def _baseline_dict(row: Baseline) -> dict:
+    # Numeric(5,3) → Decimal; se redondea igual que lo que ya quedó guardado
+    return {
+        "baseline_eeg_theta_beta": _float(row.baseline_eeg_theta_beta),
+        "baseline_hrv_lf_hf":      _float(row.baseline_hrv_lf_hf),
+        "baseline_hr":             _float(row.baseline_hr, 70.0),
+    }
+
+
+# ───── Abrir sesión ──────────────────────────────────────────────
+async def open_session(req: SessionOpenRequest) -> dict:
+    """Calcula el baseline y crea Session + Baseline (sin tareas aún)."""
+    baseline = await run_dsp(compute_baseline, req.restData)
+
+    async def unit(db):
+        if not await claim_session_id(db, req.sessionId):
+            owner = (await db.execute(
+                select(Session.user_firebase_id)
+                .where(Session.session_id == req.sessionId,
+                       Session.created_at == registered_at(req.sessionId)).limit(1)
+            )).first()
+            # Reintento tras un commit cortado (o reenvío del cliente): ya está abierta
+            if owner is not None and owner.user_firebase_id == req.userFirebaseId:
+                return
+            raise HTTPException(409, "Session already exists")
+        db.add(Session(
+            session_id       = req.sessionId,
+            user_firebase_id = req.userFirebaseId,
+            context_type     = req.contextType,
+            session_relation = req.sessionRelation,
+            # ✅ Las tareas que no declaren frecuencias heredan las de la sesión
+            eeg_sampling_rate = req.eegSamplingRate,
+            ppg_sampling_rate = req.ppgSamplingRate,
+        ))
+        await db.flush()
+        db.add(Baseline(session_id=req.sessionId, **baseline))
+        await db.commit()
+
+    await run_db(unit)
+    return {"session_id": req.sessionId, "baseline": baseline}
+
+
+# ───── Agregar tarea ─────────────────────────────────────────────
+async def _lock_session(db, session_id: str) -> Session:
+    sess = (await db.execute(
+        select(Session)
+        .where(Session.session_id == session_id,
+               Session.created_at == registered_at(session_id))     # una sola partición
+        .with_for_update()
+    )).scalar_one_or_none()
+    if sess is None:
+        raise HTTPException(404, "Session not found")
+    return sess
+
+
+async def _task_means(db, sess: Session):
+    """(tareas, arousal medio, valence medio) de la sesión, sin redondear."""
+    n_tasks, arousal, valence = (await db.execute(
+        select(func.count(), func.avg(SessionTask.arousal), func.avg(SessionTask.valence))
+        .where(SessionTask.session_id == sess.session_id,
+               SessionTask.created_at >= sess.created_at)
+    )).one()
+    # Tareas anteriores a 003_session_task_axes.sql: sin ejes guardados
+    return (n_tasks,
+            _float(arousal, _float(sess.session_arousal)),
+            _float(valence, _float(sess.session_valence)))
+
+
+async def _load_baseline(session_id: str):
+    """Baseline guardado y frecuencias declaradas al abrir la sesión."""
+    async def unit(db):
+        return (await db.execute(
+            select(Baseline, Session.eeg_sampling_rate, Session.ppg_sampling_rate)
+            .join(Session, and_(Session.session_id == Baseline.session_id,
+                                Baseline.created_at >= Session.created_at))
+            .where(Baseline.session_id == session_id,
+                   Baseline.created_at >= registered_at(session_id),
+                   Session.created_at == registered_at(session_id)).limit(1)
+        )).first()
+
+    row = await run_db(unit)
+    if row is None:
+        raise HTTPException(404, "Session not found or not opened")
+    rates = SimpleNamespace(eegSamplingRate=row.eeg_sampling_rate,
+                            ppgSamplingRate=row.ppg_sampling_rate)
+    return _baseline_dict(row.Baseline), rates
+
+
+async def append_task(session_id: str, task: TaskPacket, participant_id: str = None) -> dict:
+    """
+    Procesa una tarea contra el baseline guardado, la persiste y actualiza
+    la media de arousal/valence de la sesión (409 si ya se cerró). Reenviar
+    un task_id ya guardado no escribe nada y devuelve la misma respuesta.
+    """
+    baseline, rates = await _load_baseline(session_id)
+    inherit_rates(rates, [task])
+
+    # ✅ DSP sin conexión abierta
+    features = await run_dsp(compute_task_features, task, baseline)
+
+    async def unit(db):
+        sess = await _lock_session(db, session_id)
+
+        # ✅ Idempotente por (session_id, task_id): un reintento tras un
+        # commit cortado no duplica la tarea ni la cuenta dos veces
+        done = (await db.execute(
+            select(SessionTask.id).where(
+                SessionTask.session_id == session_id,
+                SessionTask.task_id == features["task_id"],
+                SessionTask.created_at >= sess.created_at,
+            ).limit(1)
+        )).scalar_one_or_none()
+        if done is not None:
+            index = (await db.execute(
+                select(func.count()).select_from(SessionTask).where(
+                    SessionTask.session_id == session_id,
+                    SessionTask.created_at >= sess.created_at,
+                    SessionTask.id < done,
+                )
+            )).scalar_one()
+            return index, None, None, None
+
+        if sess.session_emotion is not None:
+            raise HTTPException(409, "Session already finalized")
+
+        db.add(SessionTask(
+            session_id        = session_id,
+            task_id           = features["task_id"],
+            task_name         = features["task_name"],
+            normalized_stress = features["normalized_stress"],
+            emotion_label     = features["emotion_label"],
+            heart_rate        = features["heart_rate"],
+            arousal           = features["arousal"],
+            valence           = features["valence"],
+        ))
+        await db.flush()
+
+        # ✅ Media sobre las tareas guardadas (no sobre la media ya redondeada)
+        n_tasks, sess.session_arousal, sess.session_valence = await _task_means(db, sess)
+        if sess.context_type == "meeting" and sess.session_relation:
+            await share_tasks(db, sess.session_relation, participant_id or sess.user_firebase_id,
+                              [(features["arousal"], features["valence"])])
+        await db.commit()
+        return n_tasks - 1, sess.context_type, sess.session_relation, sess.user_firebase_id
+
+    n_tasks, context_type, relation, user_id = await run_db(unit)
+
+    # ✅ Reuniones: la estadística de grupo se actualiza tarea a tarea (no en reenvíos)
+    if context_type == "meeting" and relation:
+        publish_tasks(relation, participant_id or user_id,
+                      [(features["arousal"], features["valence"])])
+
+    return {
+        "session_id":        session_id,
+        "task_index":        n_tasks,
+        "task_id":           features["task_id"],
+        "normalized_stress": round(features["normalized_stress"], 3),
+        "emotion_label":     features["emotion_label"],
+        "heart_rate":        round(features["heart_rate"], 2),
+        "arousal":           round(features["arousal"], 3),
+        "valence":           round(features["valence"], 3),
+    }
+
+
+# ───── Cerrar sesión ─────────────────────────────────────────────
+async def finalize_session(session_id: str) -> dict:
+    """Emoción y estrés medio de la sesión a partir de la media de sus tareas."""
+    async def unit(db):
+        sess = await _lock_session(db, session_id)
+        n_tasks, arousal, valence = await _task_means(db, sess)
+        if n_tasks == 0:
+            raise HTTPException(400, "Session has no tasks")
+
+        summary = session_summary(arousal, valence)
+        for column, value in summary.items():
+            setattr(sess, column, value)
+        await db.commit()
+        return n_tasks, summary
+
+    n_tasks, summary = await run_db(unit)
+    return {"session_id": session_id, "tasks": n_tasks, **summary}
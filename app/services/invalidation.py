@@ -0,0 +1,139 @@
+# app/services/invalidation.py
+"""
+Bus de invalidación entre workers con LISTEN/NOTIFY de Postgres.
+
+Las escrituras publican las claves afectadas dentro de su propia
+transacción (NOTIFY sólo se entrega al hacer commit):
+
+    await publish(db, relation_tasks=[{...}])     # AsyncSession
+    publish_sync(cur, user=[firebase_id])         # cursor psycopg2
+
+Sólo se publican claves con suscriptor: `user` (user_cache) y
+`relation_tasks` (relation_live, tareas de reuniones de otros workers).
+
+Cada worker mantiene una conexión asyncpg propia, fuera del pool del
+engine (connect_listener), con LISTEN en CHANNEL y llama a los handlers
+registrados con subscribe(kind, fn) por cada clave. Si la conexión se
+pierde, al reconectar se vacían las cachés suscritas (pudieron
+perderse avisos).
+"""
+import asyncio
+from typing import Callable, Dict, Iterable, List
+
+import orjson
+from sqlalchemy import text
+
+from app.core.config import INVALIDATION_BUS
+
+CHANNEL = "raices_invalidate"
+MAX_PAYLOAD_BYTES = 7000           # NOTIFY admite < 8000 bytes
+HEALTHCHECK_SECONDS = 30
+RETRY_SECONDS = 5
+
+_handlers: Dict[str, List[Callable[[str], None]]] = {}
+_reset_handlers: List[Callable[[], None]] = []
+stats = {"received": 0, "evicted": 0, "reconnects": 0, "listening": False}
+
+
+# ───── Suscripción ───────────────────────────────────────────────
+def subscribe(kind: str, evict: Callable[[str], None], reset: Callable[[], None] = None) -> None:
+    """evict(key) por cada clave publicada de `kind`; reset() al reconectar."""
+    _handlers.setdefault(kind, []).append(evict)
+    if reset is not None:
+        _reset_handlers.append(reset)
+
+
+def apply(keys: Dict[str, Iterable[str]]) -> None:
+    """Aplica en este proceso las invalidaciones de un payload."""
+    for kind, values in keys.items():
+        for evict in _handlers.get(kind, ()):
+            for key in values:
+                evict(key)
+                stats["evicted"] += 1
+
+
+def _reset_all() -> None:
+    for reset in _reset_handlers:
+        reset()
+
+
+# ───── Publicación ───────────────────────────────────────────────
+def payloads(**keys: Iterable[str]) -> List[str]:
+    """{kind: [claves]} → uno o más payloads JSON por debajo del límite de NOTIFY."""
+    out, current, size = [], {}, 2
+    for kind, values in keys.items():
+        for key in values:
+            if key is None:
+                continue
+            item = len(orjson.dumps(key)) + len(kind) + 8
+            if current and size + item > MAX_PAYLOAD_BYTES:
+                out.append(orjson.dumps(current).decode())
+                current, size = {}, 2
+            current.setdefault(kind, []).append(key)
+            size += item
+    if current:
+        out.append(orjson.dumps(current).decode())
+    return out
+
+
+async def publish(db, **keys: Iterable[str]) -> None:
+    """NOTIFY en la transacción de `db` (AsyncSession); llamar antes del commit."""
+    if not INVALIDATION_BUS:
+        return
+    for payload in payloads(**keys):
+        await db.execute(text("SELECT pg_notify(:channel, :payload)"),
+                         {"channel": CHANNEL, "payload": payload})
+
+
+def publish_sync(cur, **keys: Iterable[str]) -> None:
+    """Igual que publish, con un cursor psycopg2 (routers síncronos)."""
+    if not INVALIDATION_BUS:
+        return
+    for payload in payloads(**keys):
+        cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, payload))
+
+
+# ───── Listener ──────────────────────────────────────────────────
+def _on_notify(connection, pid, channel, payload) -> None:
+    stats["received"] += 1
+    try:
+        apply(orjson.loads(payload))
+    except Exception as e:
+        print(f"Invalidation payload inválido: {e}")
+
+
+async def _listen_forever() -> None:
+    from app.db.async_engine import connect_listener
+
+    while True:
+        try:
+            pg = await connect_listener()
+            try:
+                lost = asyncio.Event()
+                pg.add_termination_listener(lambda c: lost.set())
+                await pg.add_listener(CHANNEL, _on_notify)
+                if stats["reconnects"]:
+                    _reset_all()            # avisos perdidos mientras no escuchábamos
+                stats["listening"] = True
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), HEALTHCHECK_SECONDS)
+                    except asyncio.TimeoutError:
+                        await pg.execute("SELECT 1")    # detecta conexiones muertas
+            finally:
+                stats["listening"] = False
+                if not pg.is_closed():
+                    await pg.close()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Invalidation listener desconectado: {e}")
+        stats["reconnects"] += 1
+        await asyncio.sleep(RETRY_SECONDS)
+
+
+def start_listener():
+    """Arranca el listener del worker (lifespan); None si el bus está apagado."""
+    if not INVALIDATION_BUS:
+        return None
+    return asyncio.create_task(_listen_forever())
@@ -0,0 +1,240 @@
+# app/services/partitions.py
+"""
+Mantenimiento de las particiones mensuales de sessions, session_tasks y
+baselines (creadas por app/db/sql/002_partition_sessions.sql).
+
+    python -m app.services.partitions ensure              # meses futuros
+    python -m app.services.partitions list
+    python -m app.services.partitions archive --older-than 12 [--keep-tables]
+
+`ensure` debe correr a diario (cron): si un mes no tiene partición las
+filas caen en <tabla>_default y ese mes ya no se puede crear hasta
+vaciarla.
+
+`archive`, por cada mes más viejo que el corte (de más antiguo a más
+nuevo):
+  1. Guarda los agregados del mes en session_monthly_aggregates (por
+     usuario y contexto), que sobreviven al archivado.
+  2. Bloquea las tres particiones contra escrituras, las vuelca con COPY
+     a ARCHIVE_DIR/<partición>.csv.gz y relee cada fichero para
+     comprobar que tiene las mismas filas que la tabla.
+  3. DETACH de las particiones y DROP (o sólo DETACH con --keep-tables).
+Si algo falla en el paso 2 o 3 la transacción entera se deshace y las
+particiones siguen en su sitio.
+"""
+import argparse
+import csv
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+from datetime import date, datetime
+
+from psycopg2 import sql
+
+from app.core.config import ARCHIVE_DIR, ARCHIVE_AFTER_MONTHS, PARTITION_MONTHS_AHEAD
+from app.db.connection import get_connection
+
+PARENTS = ("sessions", "session_tasks", "baselines")
+PARTITION_NAME = re.compile(r"_y(\d{4})m(\d{2})$")
+
+AGGREGATE_MONTH = """
+WITH s AS (
+    SELECT * FROM sessions
+    WHERE created_at >= %(month)s AND created_at < %(next_month)s
+), t AS (
+    SELECT t.session_id,
+           count(*)                AS n,
+           sum(t.normalized_stress) AS stress,
+           sum(t.heart_rate)       AS hr,
+           count(t.heart_rate)     AS n_hr
+    FROM session_tasks t
+    JOIN s ON s.session_id = t.session_id AND t.created_at >= s.created_at
+    WHERE t.created_at >= %(month)s
+    GROUP BY t.session_id
+)
+INSERT INTO session_monthly_aggregates (
+    month, user_firebase_id, context_type, sessions, tasks,
+    avg_session_stress, avg_arousal, avg_valence, avg_task_stress, avg_heart_rate, archived_at
+)
+SELECT %(month)s, coalesce(s.user_firebase_id, ''), s.context_type,
+       count(*), coalesce(sum(t.n), 0),
+       avg(s.session_avg_stress), avg(s.session_arousal), avg(s.session_valence),
+       sum(t.stress) / nullif(sum(t.n), 0),
+       sum(t.hr) / nullif(sum(t.n_hr), 0),
+       now()
+FROM s LEFT JOIN t ON t.session_id = s.session_id
+GROUP BY 2, 3
+ON CONFLICT (month, user_firebase_id, context_type) DO UPDATE SET
+    sessions           = EXCLUDED.sessions,
+    tasks              = EXCLUDED.tasks,
+    avg_session_stress = EXCLUDED.avg_session_stress,
+    avg_arousal        = EXCLUDED.avg_arousal,
+    avg_valence        = EXCLUDED.avg_valence,
+    avg_task_stress    = EXCLUDED.avg_task_stress,
+    avg_heart_rate     = EXCLUDED.avg_heart_rate,
+    archived_at        = EXCLUDED.archived_at
+"""
+
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(parent: str, month: date) -> str:
+    return f"{parent}_y{month:%Y}m{month:%m}"
+
+
+def list_partitions(conn, parent: str) -> list:
+    """[(nombre, mes o None para DEFAULT, filas estimadas)] de una tabla."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.relname, c.reltuples::bigint
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+            ORDER BY c.relname
+        """, (parent,))
+        out = []
+        for name, rows in cur.fetchall():
+            m = PARTITION_NAME.search(name)
+            month = date(int(m.group(1)), int(m.group(2)), 1) if m else None
+            out.append((name, month, rows))
+        return out
+
+
+# ───── ensure ────────────────────────────────────────────────────
+def ensure(conn, months_ahead: int = PARTITION_MONTHS_AHEAD) -> int:
+    """Crea las particiones del mes actual y los `months_ahead` siguientes."""
+    first = date.today().replace(day=1)
+    last = add_months(first, months_ahead)
+    created = 0
+    with conn, conn.cursor() as cur:
+        for parent in PARENTS:
+            cur.execute("SELECT ensure_month_partitions(%s, %s, %s)", (parent, first, last))
+            created += cur.fetchone()[0]
+            cur.execute(sql.SQL("SELECT count(*) FROM {}").format(sql.Identifier(f"{parent}_default")))
+            stray = cur.fetchone()[0]
+            if stray:
+                print(f"⚠️ {parent}_default tiene {stray} filas: moverlas a su partición mensual")
+    return created
+
+
+# ───── archive ───────────────────────────────────────────────────
+def _count(cur, table: str) -> int:
+    cur.execute(sql.SQL("SELECT count(*) FROM {}").format(sql.Identifier(table)))
+    return cur.fetchone()[0]
+
+
+def _export(cur, table: str, directory: str) -> dict:
+    """COPY de la partición a <dir>/<tabla>.csv.gz, verificado releyéndolo."""
+    path = os.path.join(directory, f"{table}.csv.gz")
+    tmp = path + ".tmp"
+    with gzip.open(tmp, "wb") as f:
+        cur.copy_expert(
+            sql.SQL("COPY {} TO STDOUT WITH (FORMAT csv, HEADER)").format(sql.Identifier(table)), f
+        )
+    digest = hashlib.sha256()
+    with open(tmp, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    with gzip.open(tmp, "rt", encoding="utf-8", newline="") as f:
+        rows = sum(1 for _ in csv.reader(f)) - 1          # sin la cabecera
+    os.replace(tmp, path)
+    return {"file": os.path.basename(path), "rows": rows,
+            "bytes": os.path.getsize(path), "sha256": digest.hexdigest()}
+
+
+def archive_month(conn, month: date, directory: str, keep_tables: bool = False) -> dict:
+    next_month = add_months(month, 1)
+    names = {parent: partition_name(parent, month) for parent in PARENTS}
+
+    # 1. Agregados (transacción propia: sobreviven aunque falle el volcado)
+    with conn, conn.cursor() as cur:
+        cur.execute(AGGREGATE_MONTH, {"month": month, "next_month": next_month})
+        aggregates = cur.rowcount
+
+    # 2 + 3. Volcado, verificación y detach en una sola transacción
+    manifest = {"month": month.isoformat(), "aggregates": aggregates,
+                "exported_at": datetime.utcnow().isoformat(), "tables": {}}
+    with conn, conn.cursor() as cur:
+        for parent, table in names.items():
+            if not _exists(cur, table):
+                continue
+            cur.execute(sql.SQL("LOCK TABLE {} IN SHARE MODE").format(sql.Identifier(table)))
+            expected = _count(cur, table)
+            info = _export(cur, table, directory)
+            if info["rows"] != expected:
+                raise RuntimeError(f"{table}: {info['rows']} filas en el fichero, {expected} en la tabla")
+            manifest["tables"][table] = info
+
+        for parent, table in names.items():
+            if table not in manifest["tables"]:
+                continue
+            cur.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+                sql.Identifier(parent), sql.Identifier(table)))
+            if not keep_tables:
+                cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(table)))
+
+    with open(os.path.join(directory, f"{month:%Y-%m}.manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _exists(cur, table: str) -> bool:
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+    return cur.fetchone()[0]
+
+
+def archive(conn, older_than_months: int = ARCHIVE_AFTER_MONTHS,
+            directory: str = ARCHIVE_DIR, keep_tables: bool = False) -> list:
+    """Archiva todos los meses anteriores a hoy - older_than_months."""
+    cutoff = add_months(date.today().replace(day=1), -older_than_months)
+    months = sorted({month for _, month, _ in list_partitions(conn, "sessions")
+                     if month is not None and month < cutoff})
+    os.makedirs(directory, exist_ok=True)
+    done = []
+    for month in months:
+        manifest = archive_month(conn, month, directory, keep_tables)
+        rows = sum(t["rows"] for t in manifest["tables"].values())
+        print(f"✅ {month:%Y-%m}: {rows} filas archivadas, {manifest['aggregates']} agregados")
+        done.append(manifest)
+    return done
+
+
+# ───── CLI ───────────────────────────────────────────────────────
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ensure_p = sub.add_parser("ensure", help="crear las particiones de los próximos meses")
+    ensure_p.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+
+    sub.add_parser("list", help="particiones por tabla con filas estimadas")
+
+    archive_p = sub.add_parser("archive", help="agregar, volcar y quitar los meses viejos")
+    archive_p.add_argument("--older-than", type=int, default=ARCHIVE_AFTER_MONTHS,
+                           help="meses completos que se conservan en la BD")
+    archive_p.add_argument("--dir", default=ARCHIVE_DIR)
+    archive_p.add_argument("--keep-tables", action="store_true",
+                           help="sólo DETACH: las tablas quedan sueltas en la BD")
+
+    args = parser.parse_args()
+    conn = get_connection()
+    try:
+        if args.command == "ensure":
+            print(f"✅ {ensure(conn, args.months_ahead)} particiones creadas")
+        elif args.command == "list":
+            for parent in PARENTS:
+                for name, _, rows in list_partitions(conn, parent):
+                    print(f"{name:<32} {rows:>10}")
+        else:
+            archive(conn, args.older_than, args.dir, args.keep_tables)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+# app/services/payload_stream.py
+"""
+Lectura de bodies grandes de muestras (/biometrics/process y las
+sesiones incrementales: /sessions/open y /sessions/{id}/tasks) sin
+bloquear el event loop ni materializar el JSON entero.
+
+- BodyReader lee request.stream() con tope de bytes (MAX_BODY_MB,
+  descomprimidos si hay Content-Encoding): 413 en cuanto se pasa.
+- PayloadBuilder es un parser incremental (ijson, push): cada trozo se
+  parsea en un hilo conforme llega. Las muestras (eeg[].values, ppg, hr)
+  van directo a buffers NumPy float64, con el tope de muestras por canal
+  (MAX_SAMPLES_PER_CHANNEL, 413) comprobado mientras se parsea; lo
+  demás (campos escalares) forma un dict pequeño que valida pydantic.
+  Una muestra que no es número (ni null) es un 422.
+
+El loop sólo mueve bytes; el trabajo por muestra corre fuera de él y
+nunca hay a la vez el body, las listas Python y los arrays.
+"""
+import asyncio
+from typing import AsyncIterator, Optional, Type
+
+import ijson
+import numpy as np
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+
+from app.core.config import MAX_BODY_MB, MAX_SAMPLES_PER_CHANNEL
+from app.models.biometrics import SessionPayload
+from app.services.compression import make_decoder, maybe_offload
+from app.services.profiling import current_profile
+
+MAX_BODY_BYTES = MAX_BODY_MB * 1024 * 1024
+
+
+# ───── Lector del body con tope de tamaño ────────────────────────
+class BodyReader:
+    """
+    Adapta request.stream() a un objeto con `async read()`, cortando con
+    413 en cuanto se supera el tamaño máximo. Con
+    Content-Encoding (gzip/deflate/zstd) descomprime en streaming y el
+    tope se aplica a los bytes descomprimidos.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes], max_bytes: int = MAX_BODY_BYTES,
+                 content_encoding: Optional[str] = None):
+        self._chunks = chunks.__aiter__()
+        self.max_bytes = max_bytes
+        self._decoder = make_decoder(content_encoding)
+        self.total = 0                  # bytes (descomprimidos) leídos
+        self.wire_total = 0             # bytes recibidos
+
+    async def read(self, n: int = -1) -> bytes:
+        if n == 0:
+            return b""
+        async for chunk in self._chunks:
+            if not chunk:
+                continue
+            self.wire_total += len(chunk)
+            if self._decoder is not None:
+                if self.wire_total > self.max_bytes:
+                    raise HTTPException(413, f"Request body exceeds {self.max_bytes} bytes")
+                budget = self.max_bytes - self.total
+                chunk = await maybe_offload(self._decoder.feed, chunk, budget)
+                if not chunk:
+                    continue
+            self.total += len(chunk)
+            if self.total > self.max_bytes:
+                raise HTTPException(413, f"Request body exceeds {self.max_bytes} bytes")
+            return chunk
+        if self._decoder is not None:
+            self._decoder.finish()
+        return b""
+
+
+# ───── Decodificación incremental (fuera del event loop) ─────────
+SAMPLE_FIELDS = ("values", "ppg", "hr")
+READ_CHUNK = 256 * 1024
+
+
+class SampleBuffer:
+    """Acumula muestras float64 en un array que crece por duplicación."""
+
+    __slots__ = ("_data", "_n", "limit", "where")
+
+    def __init__(self, where: str, limit: int = MAX_SAMPLES_PER_CHANNEL):
+        self._data = np.empty(1024, dtype=np.float64)
+        self._n = 0
+        self.limit = limit
+        self.where = where
+
+    def append(self, x: float) -> None:
+        if self._n == len(self._data):
+            if self._n >= self.limit:
+                raise HTTPException(413, f"Too many samples in {self.where} (max {self.limit})")
+            new = np.empty(min(2 * self._n, self.limit), dtype=np.float64)
+            new[:self._n] = self._data
+            self._data = new
+        self._data[self._n] = x
+        self._n += 1
+
+    def to_array(self) -> np.ndarray:
+        return self._data[:self._n].copy()
+
+
+class PayloadBuilder:
+    """
+    Arma el documento JSON a partir de los eventos de ijson, trozo a
+    trozo (feed), con los arrays de SAMPLE_FIELDS como SampleBuffer.
+    """
+
+    def __init__(self):
+        self._events = ijson.sendable_list()
+        self._parser = ijson.basic_parse_coro(self._events, use_float=True)
+        self._stack: list = []          # [contenedor, ruta, clave pendiente]
+        self.root = None
+
+    def feed(self, chunk: bytes) -> None:
+        """Parsea un trozo (b"" = fin del body)."""
+        try:
+            if chunk:
+                self._parser.send(chunk)
+            else:
+                self._parser.close()
+        except ijson.JSONError as e:
+            raise HTTPException(400, f"Invalid JSON body: {e}")
+        for event, value in self._events:
+            self._on_event(event, value)
+        del self._events[:]
+
+    def _path(self) -> str:
+        if not self._stack:
+            return "body"
+        container, path, key = self._stack[-1]
+        if isinstance(container, dict):
+            return f"{path}.{key}"
+        return f"{path}[{len(container)}]"
+
+    def _add(self, value) -> None:
+        if not self._stack:
+            self.root = value
+            return
+        top = self._stack[-1]
+        if isinstance(top[0], dict):
+            top[0][top[2]] = value
+        else:
+            top[0].append(value)
+
+    def _on_event(self, event: str, value) -> None:
+        top = self._stack[-1][0] if self._stack else None
+        if isinstance(top, SampleBuffer):
+            if event == "number":
+                top.append(value)
+            elif event == "null":
+                top.append(np.nan)          # hueco; CleanSamples los descarta
+            elif event == "end_array":
+                self._stack.pop()
+                self._add(top.to_array())
+            else:
+                raise HTTPException(422, f"{top.where} must contain only numbers")
+        elif event == "map_key":
+            self._stack[-1][2] = value
+        elif event == "start_map":
+            self._stack.append([{}, self._path(), None])
+        elif event == "start_array":
+            path = self._path()
+            if isinstance(top, dict) and self._stack[-1][2] in SAMPLE_FIELDS:
+                self._stack.append([SampleBuffer(path), path, None])
+            else:
+                self._stack.append([[], path, None])
+        elif event in ("end_map", "end_array"):
+            self._add(self._stack.pop()[0])
+        else:
+            self._add(value)
+
+
+def validate_payload(data, model: Type[BaseModel] = SessionPayload):
+    try:
+        return model.model_validate(data)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+
+def decode_payload(body: bytes, model: Type[BaseModel] = SessionPayload):
+    """JSON ya en memoria → modelo validado (mismo camino que parse_payload)."""
+    builder = PayloadBuilder()
+    builder.feed(body)
+    builder.feed(b"")
+    return validate_payload(builder.root, model)
+
+
+async def parse_payload(reader: BodyReader, model: Type[BaseModel] = SessionPayload):
+    """
+    Parsea el body conforme llega: cada trozo se entrega al parser en un
+    hilo (visible al perfilador) y el loop sólo espera. Sin buffer del
+    body completo ni lista Python intermedia por canal.
+    """
+    profile = current_profile()
+
+    def run(func, *args):
+        if profile is not None:
+            return asyncio.to_thread(profile.run_tracked, func, *args)
+        return asyncio.to_thread(func, *args)
+
+    builder = PayloadBuilder()
+    while True:
+        chunk = await reader.read(READ_CHUNK)
+        await run(builder.feed, chunk)
+        if not chunk:
+            break
+    return await run(validate_payload, builder.root, model)
@@ -1,136 +1,122 @@
-import numpy as np
-from typing import List, Tuple
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.exc import InterfaceError, DisconnectionError  # ✅ Agregar imports
+from types import SimpleNamespace
+from typing import Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 
 from app.models.biometrics import SessionPayload
-from app.db.models_bio import Session, Baseline, SessionTask
-from app.services.signal_processing import (
-    theta_beta_ratio, lf_hf_ratio, hr_from_ppg, nz
-)
-from app.services.valence_arousal import (
-    arousal_feature, valence_feature
-)
-from app.services.emotion import emotion_from_axes
-
-
-# ---------- helper para tomar canales por nombre -----------------
-def pick(eeg_packets: list, name: str) -> List[float]:
-    for pkt in eeg_packets:
-        if pkt.channel == name:
-            return pkt.values
-    return []
-
-
-# ✅ Agregar función para manejar reconexión de BD
-async def safe_db_operation(operation_func):
-    """Ejecuta operación de BD con reintentos en caso de desconexión"""
-    max_retries = 3
-    
-    for attempt in range(max_retries):
-        try:
-            await operation_func()
-            return  # Éxito
-            
-        except (InterfaceError, DisconnectionError) as e:
-            print(f"Conexión perdida (intento {attempt + 1}/{max_retries}): {e}")
-            
-            if attempt == max_retries - 1:
-                raise  # Último intento fallido
-                
-            # Esperar antes del siguiente intento
-            import asyncio
-            await asyncio.sleep(1)
-            
-        except Exception as e:
-            # Otros errores no relacionados con conexión
-            raise
+from app.db.models_bio import Session, SessionId, Baseline, SessionTask
+from app.services.session_features import compute_session_features
+from app.services.relation_live import publish_tasks, share_tasks
+from app.services.dsp_pool import run_dsp
+from app.services.db_resilience import run_db, park, DatabaseUnavailable
+
+
+def build_session_rows(payload: SessionPayload, features: dict) -> Tuple[Session, list]:
+    """Filas ORM (sesión + baseline + tareas) a partir de las features."""
+    sess = Session(
+        session_id       = payload.sessionId,
+        user_firebase_id = payload.userFirebaseId,
+        context_type     = payload.contextType,
+        session_relation = payload.sessionRelation,  # ✅ Incluir nuevo campo
+        **(features["summary"] or {})
+    )
+    rows: list = [Baseline(session_id=sess.session_id, **features["baseline"])]
+    for task in features["tasks"]:
+        rows.append(SessionTask(
+            session_id        = sess.session_id,
+            task_id           = task["task_id"],
+            task_name         = task["task_name"],
+            normalized_stress = task["normalized_stress"],
+            emotion_label     = task["emotion_label"],
+            heart_rate        = task["heart_rate"],  # ✅ Guardar el HR calculado
+            arousal           = task["arousal"],
+            valence           = task["valence"],
+        ))
+    return sess, rows
 
 
 # ---------- pipeline principal ----------------------------------
-async def process_session(payload: SessionPayload, db: AsyncSession) -> None:
-    try:
-        # 1) sesión ----------------------------------------------------
-        sess = Session(
-            session_id       = payload.sessionId,
-            user_firebase_id = payload.userFirebaseId,
-            context_type     = payload.contextType,
-            session_relation = payload.sessionRelation  # ✅ Incluir nuevo campo
-        )
+async def claim_session_id(db, session_id: str) -> bool:
+    """
+    Registra session_id en session_ids dentro de la transacción de `db`.
+    False si ya existía (otra sesión, o este mismo intento ya commiteado);
+    una escritura concurrente del mismo id espera aquí a que termine.
+    """
+    claimed = await db.execute(
+        insert(SessionId).values(session_id=session_id)
+        .on_conflict_do_nothing().returning(SessionId.session_id)
+    )
+    return claimed.first() is not None
+
+
+def registered_at(session_id: str):
+    """
+    created_at de session_ids (PK, sin particionar) como subconsulta: es
+    la clave de partición de la sesión (misma transacción → mismo now()),
+    así `Session.created_at == registered_at(id)` lee una sola partición.
+    """
+    return (select(SessionId.created_at)
+            .where(SessionId.session_id == session_id).scalar_subquery())
+
+
+def task_records(features: dict) -> list:
+    """(arousal, valence) de cada tarea, para la estadística de grupo."""
+    return [(task["arousal"], task["valence"]) for task in features["tasks"]]
+
+
+SESSION_META_FIELDS = ("sessionId", "userFirebaseId", "participantId",
+                       "contextType", "sessionRelation")
+
+
+async def write_session(meta, features: dict) -> None:
+    """
+    Escribe sesión + baseline + tareas en una transacción (reintentada
+    entera si se corta la conexión) y publica la estadística en vivo.
+    `meta` es el payload o cualquier objeto con SESSION_META_FIELDS.
+    """
+    async def unit(db):
+        # ✅ session_id único (session_ids). También hace idempotente la
+        # unidad: un reintento tras un commit cortado, o un trabajo aparcado
+        # escrito dos veces, encuentra el id ya registrado
+        if not await claim_session_id(db, meta.sessionId):
+            print(f"⚠️ Sesión {meta.sessionId} ya existe (sessionId duplicado o ya escrita): se descarta")
+            return False
+
+        # Filas nuevas en cada intento: las del intento fallido murieron con su sesión
+        sess, rows = build_session_rows(meta, features)
         db.add(sess)
-        
-        # ✅ Manejar reconexión en flush
-        await safe_db_operation(db.flush)
-
-        # 2) baseline --------------------------------------------------
-        af7_rest   = pick(payload.restData.eeg, "AF7") or pick(payload.restData.eeg, "TP9")
-        base_theta = nz(theta_beta_ratio(af7_rest))
-        base_lf    = nz(lf_hf_ratio(payload.restData.ppg))
-        base_hr    = nz(hr_from_ppg(payload.restData.ppg))
-
-        # ✅ Verificar que tenemos al menos algunos valores válidos
-        if base_hr == 0.0:
-            print("⚠️  Warning: No se pudo calcular HR baseline, usando valor por defecto")
-            base_hr = 70.0
-
-        db.add(Baseline(
-            session_id              = sess.session_id,
-            baseline_eeg_theta_beta = base_theta,
-            baseline_hrv_lf_hf      = base_lf,
-            baseline_hr             = base_hr
-        ))
+        await db.flush()        # la FK de las filas hijas necesita la sesión
+        db.add_all(rows)
+
+        # ✅ Avisar a los demás workers (se entrega con el commit)
+        if meta.contextType == "meeting" and meta.sessionRelation:
+            await share_tasks(db, meta.sessionRelation, meta.participantId, task_records(features))
+        await db.commit()
+        return True
+
+    written = await run_db(unit)     # DatabaseUnavailable → process_session la aparca
 
-        # 3) tareas ----------------------------------------------------
-        task_records: List[Tuple[float, float]] = []
-        stresses:     List[float]              = []
-
-        for t in payload.tasks:
-            af7 = pick(t.eeg, "AF7") or pick(t.eeg, "TP9")
-            af8 = pick(t.eeg, "AF8")
-            
-            theta = nz(theta_beta_ratio(af7, is_task=True))
-            asym  = nz(np.mean(af7) - np.mean(af8)) if af8 and af7 else 0.0
-
-            lf = nz(lf_hf_ratio(t.ppg, is_task=True))
-            
-            # ✅ CAMBIO: Siempre calcular HR desde PPG
-            hr_task = nz(hr_from_ppg(t.ppg, is_task=True)) if t.ppg else base_hr
-            
-            # Calcular diferencias
-            d_theta = theta - base_theta
-            d_lf    = lf    - base_lf
-            d_hr    = hr_task - base_hr
-            
-            arousal = arousal_feature(d_theta, -d_lf, 0.0, d_hr)
-            valence = valence_feature(asym)
-
-            task_records.append((arousal, valence))
-            stresses.append((arousal + 1) / 2)
-
-            emotion_label, _ = emotion_from_axes(valence, arousal)
-
-            db.add(SessionTask(
-                session_id        = sess.session_id,
-                task_id           = t.taskId,
-                task_name         = t.taskName,
-                normalized_stress = stresses[-1],
-                emotion_label     = emotion_label,
-                heart_rate        = hr_task  # ✅ Guardar el HR calculado
-            ))
-
-        # 4) resumen sesión -------------------------------------------
-        if task_records:
-            sess.session_arousal = float(np.mean([a for a, _ in task_records]))
-            sess.session_valence = float(np.mean([v for _, v in task_records]))
-            sess.session_emotion, _ = emotion_from_axes(
-                sess.session_valence, sess.session_arousal
-            )
-            sess.session_avg_stress = float(np.mean(stresses))
-
-        # ✅ Commit final con manejo de reconexión
-        await safe_db_operation(db.commit)
-        
-    except Exception as e:
-        print(f"Error procesando la sesión: {e}")
-        await safe_db_operation(db.rollback)
-        raise
+    # ✅ Reuniones: actualizar la estadística de grupo en vivo
+    if written and meta.contextType == "meeting" and meta.sessionRelation:
+        publish_tasks(meta.sessionRelation, meta.participantId, task_records(features))
+
+
+async def write_parked_session(record: dict) -> None:
+    """Reintento (drainer) de una sesión aparcada mientras la BD estaba caída."""
+    await write_session(SimpleNamespace(**record["meta"]), record["features"])
+
+
+async def process_session(payload: SessionPayload) -> None:
+    """
+    Procesa la sesión en segundo plano. El DSP corre en el pool DSP (hilo o
+    proceso) sin conexión abierta; la BD sólo se usa en una sesión corta
+    para escribir. Si la BD está caída, el resultado (ya calculado) se
+    aparca en disco y se escribe cuando vuelva.
+    """
+    features = await run_dsp(compute_session_features, payload)
+    try:
+        await write_session(payload, features)
+    except DatabaseUnavailable:
+        meta = {field: getattr(payload, field) for field in SESSION_META_FIELDS}
+        name = park({"meta": meta, "features": features})
+        print(f"⚠️ BD no disponible: sesión {payload.sessionId} aparcada ({name})")
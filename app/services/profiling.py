@@ -0,0 +1,326 @@
+# app/services/profiling.py
+"""
+Perfilado bajo demanda de un request concreto (sólo admin).
+
+Con PROFILE_TOKEN configurado, un request a /biometrics/process o a
+/sessions/... que traiga el header `X-Profile-Token: <PROFILE_TOKEN>` se
+ejecuta bajo un profiler de muestreo:
+
+- Un hilo muestrea cada PROFILE_INTERVAL_MS las pilas (sys._current_frames)
+  del event loop, sólo cuando está ejecutando la tarea de este request, y
+  de los hilos DSP que corren trabajos suyos (run_dsp), incluido el
+  trabajo en background de /process.
+- Mientras dura, eventos de SQLAlchemy miden el tiempo real de cada query
+  (las esperas de red no salen en las muestras).
+
+Al terminar se guarda en PROFILE_DIR/<id>/: profile.json (tiempos por
+etapa: validación, cada función de signal_processing, NeuroKit, BD),
+stacks.folded (speedscope / flamegraph.pl) y flame.svg. La respuesta
+lleva `X-Profile-Id`; se consultan en GET /biometrics/profiles/{id}.
+
+Sin el header no se hace nada: el middleware sólo mira los headers y
+los eventos de BD se registran únicamente mientras hay un perfil activo.
+Con DSP_WORKERS>0 el DSP de un request perfilado corre en un hilo (no en
+el pool de procesos) para poder muestrearlo.
+"""
+import asyncio
+import hmac
+import html
+import os
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+import orjson
+from sqlalchemy import event
+from starlette.responses import JSONResponse
+
+from app.core.config import PROFILE_TOKEN, PROFILE_DIR, PROFILE_INTERVAL_MS
+
+PROFILE_HEADER = b"x-profile-token"
+PROFILED_PREFIXES = ("/biometrics/process", "/sessions")
+
+_current: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+_db_listeners = 0
+_db_lock = threading.Lock()
+
+
+def current_profile() -> Optional["RequestProfile"]:
+    return _current.get()
+
+
+def tag(**values) -> None:
+    """Anota el perfil en curso (p. ej. session_id); no-op si no se perfila."""
+    profile = _current.get()
+    if profile is not None:
+        profile.tags.update(values)
+
+
+def token_ok(token: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(
+        token.encode(), PROFILE_TOKEN.encode()
+    )
+
+
+# ───── Etapas ────────────────────────────────────────────────────
+def stage_of(label: str) -> Optional[str]:
+    """Etapa a la que pertenece un frame `modulo:funcion` (None = ninguna)."""
+    module, _, func = label.partition(":")
+    if module == "app.services.payload_stream" or module.startswith("pydantic"):
+        return "validation"
+    if module == "app.services.signal_processing":
+        return f"signal_processing.{func.split('.')[0]}"
+    if module.startswith("neurokit2"):
+        return "neurokit"
+    if module.startswith(("sqlalchemy", "asyncpg")):
+        return "db_cpu"
+    return None
+
+
+# ───── Perfil de un request ──────────────────────────────────────
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.tags: Dict[str, str] = {}
+        self.interval = PROFILE_INTERVAL_MS / 1000
+        self.stacks: Counter = Counter()          # pila → ms muestreados
+        self.samples = 0
+        self.db_ms = 0.0
+        self.db_queries = 0
+        self.dsp_ms = 0.0
+        self.dsp_jobs = 0
+        self._threads: Dict[int, str] = {}       # thread id → raíz en el flame graph
+        self._loop_thread = threading.get_ident()
+        self._anchor = None                       # frame del middleware para este request
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started = 0.0
+        self.wall_ms = 0.0
+
+    # ── muestreo ─────────────────────────────────────────────────
+    def start(self, anchor_frame) -> None:
+        self._anchor = anchor_frame
+        self._started = time.perf_counter()
+        _add_db_listeners()
+        self._sampler = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        _remove_db_listeners()
+        self.wall_ms = (time.perf_counter() - self._started) * 1000
+
+    def _sample_loop(self) -> None:
+        # Cada muestra pesa el tiempo real desde la anterior (con el GIL
+        # ocupado el periodo se alarga), así los ms por etapa cuadran.
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = (now - last) * 1000, now
+            frames = sys._current_frames()
+            loop_frame = frames.get(self._loop_thread)
+            if loop_frame is not None:
+                stack = self._stack(loop_frame, self._anchor)
+                if stack:
+                    self.stacks[("event_loop",) + stack] += weight
+                    self.samples += 1
+            for ident, root in list(self._threads.items()):
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[(root,) + self._stack(frame, None)] += weight
+                    self.samples += 1
+
+    @staticmethod
+    def _stack(frame, anchor) -> Tuple[str, ...]:
+        """Pila raíz→hoja; con anchor, sólo si el frame del request está en ella."""
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            labels.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}")
+            if frame is anchor:
+                return tuple(reversed(labels))
+            frame = frame.f_back
+        return () if anchor is not None else tuple(reversed(labels))
+
+    # ── DSP en hilos ─────────────────────────────────────────────
+    def run_tracked(self, func, *args):
+        """Corre func en el hilo actual (del pool) y lo incluye en el muestreo."""
+        ident = threading.get_ident()
+        self._threads[ident] = f"dsp:{getattr(func, '__name__', 'job')}"
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self._threads.pop(ident, None)
+            self.dsp_ms += (time.perf_counter() - start) * 1000
+            self.dsp_jobs += 1
+
+    # ── resultados ───────────────────────────────────────────────
+    def stage_ms(self) -> Dict[str, float]:
+        """Tiempo muestreado por etapa (cada etapa cuenta una vez por muestra)."""
+        stages: Dict[str, float] = defaultdict(float)
+        for stack, ms in self.stacks.items():
+            for stage in {s for s in map(stage_of, stack) if s}:
+                stages[stage] += ms
+        return {stage: round(ms, 2) for stage, ms in sorted(stages.items())}
+
+    def summary(self) -> dict:
+        return {
+            "id":          self.id,
+            "method":      self.method,
+            "path":        self.path,
+            "tags":        self.tags,
+            "wall_ms":     round(self.wall_ms, 2),
+            "interval_ms": PROFILE_INTERVAL_MS,
+            "samples":     self.samples,
+            "stages_ms":   self.stage_ms(),
+            "db":  {"queries": self.db_queries, "wall_ms": round(self.db_ms, 2)},
+            "dsp": {"jobs": self.dsp_jobs, "wall_ms": round(self.dsp_ms, 2)},
+        }
+
+    def folded(self) -> str:
+        """Formato "a;b;c valor" con el valor en microsegundos."""
+        return "".join(f"{';'.join(stack)} {round(ms * 1000)}\n" for stack, ms in self.stacks.most_common())
+
+    def save(self) -> str:
+        folder = profile_dir(self.id)
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, "profile.json"), "wb") as f:
+            f.write(orjson.dumps(self.summary(), option=orjson.OPT_INDENT_2))
+        with open(os.path.join(folder, "stacks.folded"), "w", encoding="utf-8") as f:
+            f.write(self.folded())
+        with open(os.path.join(folder, "flame.svg"), "w", encoding="utf-8") as f:
+            f.write(flame_svg(self.stacks, f"{self.method} {self.path}"))
+        return folder
+
+
+def profile_dir(profile_id: str) -> str:
+    return os.path.join(PROFILE_DIR, profile_id)
+
+
+# ───── Tiempo de BD (eventos sólo con perfiles activos) ──────────
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context._profile_start = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    start = getattr(context, "_profile_start", None)
+    if profile is not None and start is not None:
+        profile.db_ms += (time.perf_counter() - start) * 1000
+        profile.db_queries += 1
+
+
+def _add_db_listeners() -> None:
+    global _db_listeners
+    from app.db.async_engine import engine_async
+    with _db_lock:
+        if _db_listeners == 0:
+            event.listen(engine_async.sync_engine, "before_cursor_execute", _before_execute)
+            event.listen(engine_async.sync_engine, "after_cursor_execute", _after_execute)
+        _db_listeners += 1
+
+
+def _remove_db_listeners() -> None:
+    global _db_listeners
+    from app.db.async_engine import engine_async
+    with _db_lock:
+        _db_listeners -= 1
+        if _db_listeners == 0:
+            event.remove(engine_async.sync_engine, "before_cursor_execute", _before_execute)
+            event.remove(engine_async.sync_engine, "after_cursor_execute", _after_execute)
+
+
+# ───── Flame graph (SVG autocontenido) ───────────────────────────
+def flame_svg(stacks: Counter, title: str, width: int = 1200, row: int = 17) -> str:
+    """Flame graph de {pila: ms}; el ancho de cada marco es su tiempo."""
+    tree = {"n": 0.0, "children": {}}
+    for stack, n in stacks.items():
+        node = tree
+        node["n"] += n
+        for label in stack:
+            node = node["children"].setdefault(label, {"n": 0.0, "children": {}})
+            node["n"] += n
+
+    total = tree["n"] or 1.0
+    rects, depth_max = [], 0
+
+    def walk(node, x: float, depth: int):
+        nonlocal depth_max
+        for label, child in sorted(node["children"].items()):
+            w = child["n"] / total * width
+            if w >= 0.3:
+                depth_max = max(depth_max, depth)
+                rects.append((x, depth, w, label, child["n"]))
+                walk(child, x, depth + 1)
+            x += w
+
+    walk(tree, 0.0, 0)
+    height = (depth_max + 1) * row + 40
+    out = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">',
+        f'<text x="4" y="16" font-size="13">{html.escape(title)} — '
+        f'{total:.0f} ms muestreados</text>',
+    ]
+    for x, depth, w, label, n in rects:
+        y = height - (depth + 1) * row
+        hue = zlib.crc32(label.split(":")[0].encode()) % 60
+        text = html.escape(label.split(":")[-1])
+        chars = int(w / 6.6)
+        out.append(
+            f'<g><title>{html.escape(label)} ({n:.1f} ms, {n / total:.1%})</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row - 1}" '
+            f'fill="hsl({hue + 10},85%,60%)"/>'
+            + (f'<text x="{x + 2:.1f}" y="{y + row - 5}">{text[:chars]}</text>' if chars >= 3 else "")
+            + "</g>"
+        )
+    out.append("</svg>")
+    return "\n".join(out)
+
+
+# ───── Middleware ────────────────────────────────────────────────
+class ProfilingMiddleware:
+    """ASGI puro: envuelve la respuesta y las background tasks del request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not PROFILE_TOKEN or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = next((v for k, v in scope["headers"] if k == PROFILE_HEADER), None)
+        if token is None or not scope["path"].startswith(PROFILED_PREFIXES):
+            return await self.app(scope, receive, send)
+        if not token_ok(token.decode("latin-1")):
+            return await JSONResponse({"detail": "Invalid profile token"}, 403)(scope, receive, send)
+
+        profile = RequestProfile(scope["method"], scope["path"])
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile.id.encode())
+                ]
+            await send(message)
+
+        reset = _current.set(profile)
+        profile.start(sys._getframe())
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.stop()
+            _current.reset(reset)
+            await asyncio.to_thread(profile.save)
+            print(f"🔎 Perfil {profile.id}: {profile.method} {profile.path} "
+                  f"{profile.wall_ms:.0f} ms, {profile.samples} muestras")
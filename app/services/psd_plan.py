@@ -0,0 +1,84 @@
+# app/services/psd_plan.py
+"""
+Plan precalculado para PSD-Welch y potencia por bandas.
+
+Cada plan guarda ventana, vector de frecuencias y pesos de integración
+(trapecio) por banda, de modo que la potencia de una banda es un producto
+punto `psd @ pesos`. Los planes se cachean por (nfft, overlap, fs, window)
+y sus arrays son de sólo lectura, así que se comparten entre hilos.
+"""
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import numpy as np
+
+# Bandas EEG usadas por el pipeline (Hz, extremos incluidos)
+EEG_BANDS: Dict[str, Tuple[float, float]] = {
+    "theta": (4.0, 8.0),
+    "alpha": (8.0, 13.0),
+    "beta":  (15.0, 30.0),
+}
+
+
+def _window(name: str, nfft: int) -> np.ndarray:
+    """Ventanas periódicas, iguales a DataFilter.get_window de brainflow."""
+    n = np.arange(nfft)
+    if name == "hanning":
+        return 0.5 - 0.5 * np.cos(2 * np.pi * n / nfft)
+    if name == "hamming":
+        return 0.54 - 0.46 * np.cos(2 * np.pi * n / nfft)
+    if name == "blackman_harris":
+        return (0.35875 - 0.48829 * np.cos(2 * np.pi * n / nfft)
+                + 0.14128 * np.cos(4 * np.pi * n / nfft)
+                - 0.01168 * np.cos(6 * np.pi * n / nfft))
+    if name == "none":
+        return np.ones(nfft)
+    raise ValueError(f"Unknown window: {name}")
+
+
+def _trapezoid_weights(freqs: np.ndarray, lo: float, hi: float) -> np.ndarray:
+    """Pesos tales que psd @ w == np.trapz(psd[mask], freqs[mask])."""
+    weights = np.zeros_like(freqs)
+    idx = np.flatnonzero((freqs >= lo) & (freqs <= hi))
+    if idx.size >= 2:
+        df = np.diff(freqs[idx])
+        weights[idx[:-1]] += df / 2
+        weights[idx[1:]] += df / 2
+    return weights
+
+
+class PSDPlan:
+    def __init__(self, nfft: int, overlap: int, fs: int, window: str):
+        self.nfft = nfft
+        self.step = nfft - overlap
+        self.fs = fs
+        self.window = _window(window, nfft)
+        self.freqs = np.fft.rfftfreq(nfft, d=1.0 / fs)
+
+        # Escala de brainflow: 2/(nfft·fs), sin duplicar DC ni Nyquist
+        self.scale = np.full(self.freqs.size, 2.0 / (nfft * fs))
+        self.scale[0] /= 2
+        if nfft % 2 == 0:
+            self.scale[-1] /= 2
+
+        self.band_weights = {
+            band: _trapezoid_weights(self.freqs, lo, hi)
+            for band, (lo, hi) in EEG_BANDS.items()
+        }
+        for arr in (self.window, self.freqs, self.scale, *self.band_weights.values()):
+            arr.setflags(write=False)
+
+    def welch(self, data: np.ndarray) -> np.ndarray:
+        """PSD promediando segmentos ventaneados (len(data) >= nfft)."""
+        segments = np.lib.stride_tricks.sliding_window_view(data, self.nfft)[::self.step]
+        spectra = np.fft.rfft(segments * self.window, axis=1)
+        power = spectra.real ** 2 + spectra.imag ** 2
+        return power.mean(axis=0) * self.scale
+
+    def band_power(self, psd: np.ndarray, band: str) -> float:
+        return float(psd @ self.band_weights[band])
+
+
+@lru_cache(maxsize=32)
+def get_psd_plan(nfft: int, overlap: int, fs: int, window: str = "hanning") -> PSDPlan:
+    return PSDPlan(nfft, overlap, fs, window)
@@ -0,0 +1,192 @@
+# app/services/relation_live.py
+"""
+Estadística de grupo en vivo por session_relation (SSE de /by-relation/…/live).
+
+Cada worker agrega en memoria las tareas que escribe él mismo
+(publish_tasks, tras el commit) y las de los demás workers, que llegan
+por el bus de LISTEN/NOTIFY (share_tasks, dentro de la transacción que
+las escribe). Así todos los workers ven las mismas cifras, sea cual sea
+el que atiende la suscripción.
+"""
+import asyncio
+import math
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import orjson
+
+from app.services import invalidation
+
+# ───── Constantes ────────────────────────────────────────────────
+RELATION_TTL_SECONDS = 6 * 60 * 60   # reunión sin actividad → se descarta
+SUBSCRIBER_QUEUE_SIZE = 16           # snapshots pendientes por suscriptor
+KEEPALIVE_SECONDS = 15               # ping SSE para que el proxy no corte
+WORKER_ID = uuid.uuid4().hex         # para ignorar en el bus lo publicado por este worker
+
+
+# ───── Estadística incremental (Welford) ─────────────────────────
+class RunningStats:
+    """Media, desviación, mínimo y máximo sin guardar las muestras."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def push(self, x: float) -> None:
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    def as_dict(self) -> dict:
+        if not self.count:
+            return {"mean": None, "std": None, "min": None, "max": None}
+        return {
+            "mean": self.mean,
+            "std":  math.sqrt(self._m2 / self.count),
+            "min":  self.min,
+            "max":  self.max,
+        }
+
+
+class RelationAggregate:
+    """Estadística de grupo de una session_relation (una reunión)."""
+
+    def __init__(self, session_relation: str):
+        self.session_relation = session_relation
+        self.participants: set = set()
+        self.stress = RunningStats()
+        self.arousal = RunningStats()
+        self.valence = RunningStats()
+        self.subscribers: List[asyncio.Queue] = []
+        self.updated_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {
+            "session_relation":   self.session_relation,
+            "total_participants": len(self.participants),
+            "total_tasks":        self.stress.count,
+            "stress":             self.stress.as_dict(),
+            "arousal":            self.arousal.as_dict(),
+            "valence":            self.valence.as_dict(),
+        }
+
+
+# ───── Registro en memoria por relación ──────────────────────────
+_relations: Dict[str, RelationAggregate] = {}
+
+
+def _purge_idle() -> None:
+    """Descarta reuniones viejas que ya no tienen suscriptores."""
+    now = time.monotonic()
+    for key in [
+        k for k, agg in _relations.items()
+        if not agg.subscribers and now - agg.updated_at > RELATION_TTL_SECONDS
+    ]:
+        del _relations[key]
+
+
+def _get_or_create(session_relation: str) -> RelationAggregate:
+    agg = _relations.get(session_relation)
+    if agg is None:
+        _purge_idle()
+        agg = _relations[session_relation] = RelationAggregate(session_relation)
+    return agg
+
+
+def get_snapshot(session_relation: str) -> Optional[dict]:
+    agg = _relations.get(session_relation)
+    return agg.snapshot() if agg else None
+
+
+def _notify(agg: RelationAggregate) -> None:
+    snap = agg.snapshot()
+    for queue in agg.subscribers:
+        # Suscriptor lento: se descarta el snapshot más viejo, sólo importa el último
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(snap)
+
+
+def publish_tasks(session_relation: str, participant_id: str,
+                  task_records: List[tuple]) -> None:
+    """
+    Agrega las tareas (arousal, valence) de un participante y notifica
+    a los suscriptores. Debe llamarse desde el event loop.
+    """
+    agg = _get_or_create(session_relation)
+    agg.participants.add(participant_id)
+    for arousal, valence in task_records:
+        agg.arousal.push(arousal)
+        agg.valence.push(valence)
+        agg.stress.push((arousal + 1) / 2)
+    agg.updated_at = time.monotonic()
+    _notify(agg)
+
+
+# ───── Tareas de otros workers (bus) ─────────────────────────────
+def shared_items(session_relation: str, participant_id: str,
+                 task_records: List[tuple]) -> List[dict]:
+    """
+    Mensajes del bus para las tareas de un participante, repartidas para
+    que cada uno quepa en un NOTIFY (invalidation.payloads no parte items).
+    """
+    head = {"worker": WORKER_ID, "relation": session_relation, "participant": participant_id}
+    # tamaño del item sin tareas, con el envoltorio {"relation_tasks":[…]} de payloads
+    base = len(orjson.dumps({**head, "tasks": []})) + len("relation_tasks") + 10
+    items, tasks, size = [], [], base
+    for arousal, valence in task_records:
+        task = [arousal, valence]
+        n = len(orjson.dumps(task)) + 1
+        if tasks and size + n > invalidation.MAX_PAYLOAD_BYTES:
+            items.append({**head, "tasks": tasks})
+            tasks, size = [], base
+        tasks.append(task)
+        size += n
+    if tasks or not items:
+        items.append({**head, "tasks": tasks})
+    return items
+
+
+async def share_tasks(db, session_relation: str, participant_id: str,
+                      task_records: List[tuple]) -> None:
+    """
+    Publica las tareas para los demás workers en la transacción de `db`
+    (se entregan con el commit). Este worker las agrega con publish_tasks.
+    """
+    await invalidation.publish(
+        db, relation_tasks=shared_items(session_relation, participant_id, task_records)
+    )
+
+
+def _apply_shared(message: dict) -> None:
+    if message.get("worker") != WORKER_ID:
+        publish_tasks(message["relation"], message["participant"], message["tasks"])
+
+
+invalidation.subscribe("relation_tasks", _apply_shared)
+
+
+async def subscribe(session_relation: str):
+    """
+    Generador async de snapshots para una relación; emite el estado actual
+    al conectarse y luego cada actualización (None = keepalive).
+    """
+    agg = _get_or_create(session_relation)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    agg.subscribers.append(queue)
+    try:
+        yield agg.snapshot()
+        while True:
+            try:
+                yield await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield None
+    finally:
+        agg.subscribers.remove(queue)
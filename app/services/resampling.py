@@ -0,0 +1,83 @@
+# app/services/resampling.py
+"""
+Conversión de las frecuencias de muestreo del dispositivo a las
+canónicas del pipeline (SAMPLING_EEG = 256 Hz, SAMPLING_PPG = 64 Hz,
+las del Muse-2).
+
+Todo el DSP (ventanas de Welch, mínimos de muestras, detector de picos)
+está afinado para las canónicas. En vez de ramas por dispositivo, el
+payload declara sus frecuencias (eegSamplingRate / ppgSamplingRate, a
+nivel de sesión, de restData o de cada tarea) y at_canonical_rates
+remuestrea los canales al entrar al DSP:
+
+- resample_poly con up/down = fs_out/fs_in reducida (512→256 = 1/2,
+  250→256 = 128/125): filtro polifásico, O(N) y sin pasar el canal
+  entero a complejos como el remuestreo por FFT.
+- El FIR antialias (firwin, Kaiser β=5, igual que resample_poly por
+  defecto) sólo depende de (up, down) y se diseña una vez por proceso.
+"""
+from fractions import Fraction
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+from scipy.signal import firwin, resample_poly
+
+from app.services.signal_processing import SAMPLING_EEG, SAMPLING_PPG
+
+# 250→256 necesita 125 en el denominador; más allá se aproxima la razón
+MAX_DENOMINATOR = 1000
+KAISER_BETA = 5.0
+
+
+def rational_factors(fs_in: float, fs_out: float) -> Tuple[int, int]:
+    """(up, down) con up/down ≈ fs_out/fs_in, ya reducidos."""
+    ratio = (Fraction(str(fs_out)) / Fraction(str(fs_in))).limit_denominator(MAX_DENOMINATOR)
+    return ratio.numerator, ratio.denominator
+
+
+@lru_cache(maxsize=64)
+def fir_design(up: int, down: int) -> np.ndarray:
+    """FIR pasa-bajos de resample_poly para (up, down); cacheado por proceso."""
+    max_rate = max(up, down)
+    taps = firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=("kaiser", KAISER_BETA))
+    taps.setflags(write=False)
+    return taps
+
+
+def resample(x, fs_in: float, fs_out: float) -> np.ndarray:
+    """Remuestrea un canal de fs_in a fs_out (Hz). Sin cambio si ya coinciden."""
+    x = np.asarray(x, dtype=np.float64)
+    if x.size == 0 or fs_in == fs_out:
+        return x
+    up, down = rational_factors(fs_in, fs_out)
+    if up == down:
+        return x
+    # padtype="line": sin el escalón del offset DC del EEG en los bordes
+    return resample_poly(x, up, down, window=fir_design(up, down), padtype="line")
+
+
+def at_canonical_rates(data):
+    """
+    Lleva a las frecuencias canónicas el EEG y el PPG de restData o de una
+    tarea (in place) y marca las nuevas frecuencias, así que repetir la
+    llamada no hace nada. Sin frecuencias declaradas no toca nada. Un
+    memmap se materializa en memoria al remuestrearlo.
+    """
+    eeg_fs = getattr(data, "eegSamplingRate", None) or SAMPLING_EEG
+    ppg_fs = getattr(data, "ppgSamplingRate", None) or SAMPLING_PPG
+
+    if eeg_fs != SAMPLING_EEG:
+        for pkt in data.eeg:
+            pkt.values = resample(pkt.values, eeg_fs, SAMPLING_EEG)
+        data.eegSamplingRate = SAMPLING_EEG
+    if ppg_fs != SAMPLING_PPG:
+        if data.ppg is not None and len(data.ppg):
+            data.ppg = resample(data.ppg, ppg_fs, SAMPLING_PPG)
+        data.ppgSamplingRate = SAMPLING_PPG
+    return data
+
+
+def design_cache_stats() -> dict:
+    info = fir_design.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "designs": info.currsize}
@@ -0,0 +1,144 @@
+# app/services/session_features.py
+"""
+Features de una sesión (baseline, deltas por tarea, scoring y resumen)
+sin BD: sólo DSP y aritmética, apto para correr en un proceso DSP y
+para el corpus de regresión (golden) sin configurar la conexión.
+La escritura está en process_session.
+"""
+import numpy as np
+from typing import List, Tuple
+
+from app.models.biometrics import SessionPayload
+from app.services.signal_processing import (
+    theta_beta_ratio, lf_hf_ratio, hr_from_ppg, nz
+)
+from app.services.valence_arousal import (
+    arousal_features, valence_features, stress_from_arousal
+)
+from app.services.emotion import emotion_from_axes, emotions_from_axes
+from app.services.resampling import at_canonical_rates
+
+
+# ---------- helper para tomar canales por nombre -----------------
+def pick(eeg_packets: list, name: str) -> List[float]:
+    for pkt in eeg_packets:
+        if pkt.channel == name:
+            return pkt.values
+    return []
+
+
+def pick_first(eeg_packets: list, *names: str) -> List[float]:
+    """Primer canal con muestras (listas o arrays) en orden de preferencia."""
+    for name in names:
+        values = pick(eeg_packets, name)
+        if len(values):
+            return values
+    return []
+
+
+def compute_baseline(rest_data) -> dict:
+    """θ/β, LF/HF y HR de reposo (columnas de Baseline)."""
+    rest_data  = at_canonical_rates(rest_data)
+    af7_rest   = pick_first(rest_data.eeg, "AF7", "TP9")
+    base_theta = nz(theta_beta_ratio(af7_rest))
+    base_lf    = nz(lf_hf_ratio(rest_data.ppg))
+    base_hr    = nz(hr_from_ppg(rest_data.ppg))
+
+    # ✅ Verificar que tenemos al menos algunos valores válidos
+    if base_hr == 0.0:
+        print("⚠️  Warning: No se pudo calcular HR baseline, usando valor por defecto")
+        base_hr = 70.0
+
+    return {
+        "baseline_eeg_theta_beta": base_theta,
+        "baseline_hrv_lf_hf":      base_lf,
+        "baseline_hr":             base_hr,
+    }
+
+
+def task_deltas(t, baseline: dict) -> Tuple[float, float, float, float, float]:
+    """DSP de una tarea: (d_theta, d_lf, d_hr, asym, hr_task) respecto al baseline."""
+    t   = at_canonical_rates(t)
+    af7 = pick_first(t.eeg, "AF7", "TP9")
+    af8 = pick(t.eeg, "AF8")
+    
+    theta = nz(theta_beta_ratio(af7, is_task=True))
+    asym  = nz(np.mean(af7) - np.mean(af8)) if len(af8) and len(af7) else 0.0
+
+    lf = nz(lf_hf_ratio(t.ppg, is_task=True))
+    
+    # ✅ CAMBIO: Siempre calcular HR desde PPG
+    base_hr = baseline["baseline_hr"]
+    hr_task = nz(hr_from_ppg(t.ppg, is_task=True)) if t.ppg is not None and len(t.ppg) else base_hr
+    
+    # Calcular diferencias
+    return (
+        theta   - baseline["baseline_eeg_theta_beta"],
+        lf      - baseline["baseline_hrv_lf_hf"],
+        hr_task - base_hr,
+        asym,
+        hr_task,
+    )
+
+
+def score_tasks(tasks: list, deltas: list) -> List[dict]:
+    """Scoring vectorizado de N tareas a partir de sus deltas."""
+    d_theta, d_lf, d_hr, asym, hr_tasks = (np.array(col, dtype=np.float64) for col in zip(*deltas))
+
+    arousals = arousal_features(d_theta, -d_lf, 0.0, d_hr)
+    valences = valence_features(asym)
+    stresses = stress_from_arousal(arousals)
+    labels, _ = emotions_from_axes(valences, arousals)
+
+    return [
+        {
+            "task_id":           t.taskId,
+            "task_name":         t.taskName,
+            "normalized_stress": stress,
+            "emotion_label":     str(label),
+            "heart_rate":        hr_task,
+            "arousal":           arousal,
+            "valence":           valence,
+        }
+        for t, stress, label, hr_task, arousal, valence in zip(
+            tasks, stresses.tolist(), labels, hr_tasks.tolist(),
+            arousals.tolist(), valences.tolist()
+        )
+    ]
+
+
+def compute_task_features(t, baseline: dict) -> dict:
+    """DSP + scoring de una sola tarea (sesiones incrementales)."""
+    return score_tasks([t], [task_deltas(t, baseline)])[0]
+
+
+def session_summary(arousal_mean: float, valence_mean: float, stress_mean: float = None) -> dict:
+    """Columnas de resumen de Session a partir de arousal/valence medios."""
+    if stress_mean is None:
+        stress_mean = float(stress_from_arousal(arousal_mean))   # estrés lineal en arousal
+    return {
+        "session_arousal":    arousal_mean,
+        "session_valence":    valence_mean,
+        "session_emotion":    emotion_from_axes(valence_mean, arousal_mean)[0],
+        "session_avg_stress": stress_mean,
+    }
+
+
+def compute_session_features(payload: SessionPayload) -> dict:
+    """
+    Calcula baseline, tareas y resumen de la sesión sin tocar la BD.
+    Devuelve sólo tipos simples para poder correr en un proceso DSP.
+    """
+    baseline = compute_baseline(payload.restData)
+    features = {"baseline": baseline, "tasks": [], "summary": None}
+
+    if len(payload.tasks):
+        deltas = [task_deltas(t, baseline) for t in payload.tasks]
+        features["tasks"] = score_tasks(payload.tasks, deltas)
+        features["summary"] = session_summary(
+            float(np.mean([task["arousal"] for task in features["tasks"]])),
+            float(np.mean([task["valence"] for task in features["tasks"]])),
+            float(np.mean([task["normalized_stress"] for task in features["tasks"]])),
+        )
+
+    return features
@@ -0,0 +1,79 @@
+# app/services/session_queries.py
+"""
+Consultas calientes de /sessions definidas una sola vez.
+
+Antes cada request construía su select(Session).options(...) y
+SQLAlchemy tenía que recorrer el árbol entero para calcular la clave de
+caché de compilación (~140 µs por request). Aquí los statements son
+constantes de módulo con bindparam: la clave queda memorizada en el
+objeto, el SQL compilado sale siempre de la misma entrada del caché del
+engine y asyncpg reutiliza el prepared statement de la conexión (mismo
+texto SQL).
+
+    result = await db.execute(SESSIONS_BY_RELATION, {"session_relation": rel, "since": since_or_default(since)})
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, bindparam
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.core.config import SESSIONS_DEFAULT_DAYS
+from app.db.models_bio import Session
+
+# Tamaño de lote al leer sesiones del cursor en los endpoints de streaming
+STREAM_BATCH_SIZE = 50
+
+
+def since_or_default(since: Optional[datetime]) -> datetime:
+    """
+    `since` de la request o, sin él, hace SESSIONS_DEFAULT_DAYS días: las
+    tablas están particionadas por mes en created_at y con un límite
+    real Postgres poda las particiones viejas.
+    """
+    return since or datetime.now() - timedelta(days=SESSIONS_DEFAULT_DAYS)
+
+
+def sessions_select(streaming: bool = False):
+    """
+    Select base con tareas y baselines. En modo streaming las colecciones
+    se cargan con selectinload por lote (compatible con yield_per). El
+    usuario no se une aquí: sale de user_cache (ver get_users).
+    """
+    collection_loader = selectinload if streaming else joinedload
+    stmt = (
+        select(Session)
+        .options(
+            collection_loader(Session.tasks),
+            collection_loader(Session.baselines)
+        )
+        .where(Session.user_firebase_id.is_not(None))
+    )
+    if streaming:
+        stmt = stmt.execution_options(yield_per=STREAM_BATCH_SIZE)
+    return stmt
+
+
+def _by_relation(streaming: bool):
+    return (
+        sessions_select(streaming)
+        .where(Session.session_relation == bindparam("session_relation"),
+               Session.created_at >= bindparam("since"))
+        .order_by(Session.created_at)
+    )
+
+
+def _by_user(streaming: bool):
+    return (
+        sessions_select(streaming)
+        .where(Session.user_firebase_id == bindparam("firebase_id"),
+               Session.created_at >= bindparam("since"))
+        .order_by(Session.created_at.desc())
+    )
+
+
+# ✅ Parámetros: {"session_relation": ..., "since": ...} / {"firebase_id": ..., "since": ...}
+SESSIONS_BY_RELATION        = _by_relation(streaming=False)
+SESSIONS_BY_RELATION_STREAM = _by_relation(streaming=True)
+USER_SESSIONS               = _by_user(streaming=False)
+USER_SESSIONS_STREAM        = _by_user(streaming=True)
@@ -0,0 +1,88 @@
+# app/services/session_serializer.py
+import orjson
+from typing import Optional
+
+from app.db.models_bio import Session
+
+
+# ---------- helpers ---------------------------------------------
+def _num(value) -> Optional[float]:
+    """Numeric/Decimal → float (None/0 → None, igual que la respuesta pydantic)."""
+    return float(value) if value else None
+
+
+def matches_project(session_id: str, project_id: Optional[str]) -> bool:
+    """
+    Extrae project_id del session_id y lo compara con el filtro.
+    Formato: session_timestamp_projectId_userId
+    """
+    if project_id is None:
+        return True
+    session_parts = session_id.split('_')
+    return len(session_parts) >= 4 and session_parts[2] == project_id
+
+
+# ---------- ORM → dict ------------------------------------------
+def baseline_to_dict(session: Session) -> Optional[dict]:
+    # Baseline (tomar el primero si existe)
+    if not session.baselines:
+        return None
+    baseline = session.baselines[0]
+    return {
+        "baseline_eeg_theta_beta": _num(baseline.baseline_eeg_theta_beta),
+        "baseline_hrv_lf_hf":      _num(baseline.baseline_hrv_lf_hf),
+        "baseline_hr":             _num(baseline.baseline_hr),
+    }
+
+
+def session_to_dict(session: Session, user: dict) -> dict:
+    """
+    Mismo shape que SessionResponse, construido directamente como dict
+    para serializar con orjson sin validar dos veces con pydantic.
+    `user` es la fila del usuario (de user_cache), no la relación ORM.
+    """
+    return {
+        "session_id":         session.session_id,
+        "context_type":       session.context_type,
+        "created_at":         session.created_at,
+        "session_avg_stress": _num(session.session_avg_stress),
+        "session_emotion":    session.session_emotion,
+        "session_arousal":    _num(session.session_arousal),
+        "session_valence":    _num(session.session_valence),
+
+        # Usuario info
+        "user_name":          user["name"],
+        "user_avatar_url":    user["avatar_url"],
+        "user_firebase_id":   user["firebase_id"],
+
+        # Datos relacionados
+        "baseline": baseline_to_dict(session),
+        "tasks": [
+            {
+                "task_id":           task.task_id,
+                "task_name":         task.task_name,
+                "normalized_stress": float(task.normalized_stress),
+                "emotion_label":     task.emotion_label,
+                "heart_rate":        _num(task.heart_rate),
+                "created_at":        task.created_at,
+            }
+            for task in session.tasks
+        ],
+    }
+
+
+def sessions_to_dicts(sessions, users: dict) -> list:
+    """
+    Une cada sesión con su usuario; las sesiones sin usuario se omiten,
+    igual que hacía el INNER JOIN con users.
+    """
+    return [
+        session_to_dict(session, users[session.user_firebase_id])
+        for session in sessions
+        if session.user_firebase_id in users
+    ]
+
+
+def ndjson_line(data: dict) -> bytes:
+    """Una fila NDJSON (JSON + salto de línea)."""
+    return orjson.dumps(data) + b"\n"
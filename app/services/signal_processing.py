@@ -1,9 +1,11 @@
 import numpy as np
-import neurokit2 as nk
 from brainflow.data_filter import (
     DataFilter, DetrendOperations, WindowOperations
 )
 
+from app.services.hrv_backends import get_hrv_backend
+from app.services.psd_plan import get_psd_plan
+
 # ───── Constantes ────────────────────────────────────────────────
 SAMPLING_EEG = 256   # Muse-2
 SAMPLING_PPG = 64    # Muse-2
@@ -19,13 +21,26 @@ def nz(x: float | None) -> float:
     """Convierte None/NaN a 0."""
     return 0.0 if x is None or np.isnan(x) else float(x)
 
+def finite_samples(samples) -> np.ndarray:
+    """Lista o array → array float64 sin None/NaN/inf."""
+    if isinstance(samples, np.ndarray):
+        data = samples.astype(np.float64, copy=False)
+    else:
+        data = np.array([np.nan if x is None else x for x in samples], dtype=np.float64)
+    return data[np.isfinite(data)]
+
 
 # ───── Funciones EEG / PPG ───────────────────────────────────────
 def theta_beta_ratio(eeg: list, is_task=False) -> float:
     """θ/β usando PSD-Welch; umbral menor para tareas"""
-    if not eeg or len(eeg) == 0:
+    if eeg is None or len(eeg) == 0:
         return 0.0
 
+    # ✅ Grabaciones en memmap: recorrido por trozos con memoria acotada
+    if isinstance(eeg, np.memmap):
+        from app.services.chunked_dsp import theta_beta_ratio_chunked
+        return theta_beta_ratio_chunked(eeg, is_task=is_task)
+
     try:
         data = np.asarray(eeg, dtype=np.float64)
         data_len = len(data)
@@ -65,28 +80,21 @@ def theta_beta_ratio(eeg: list, is_task=False) -> float:
             
         print(f"Debug: Parámetros PSD - nfft: {nfft}, overlap: {overlap}")
 
+        # ✅ Plan PSD cacheado (ventana, frecuencias y pesos por banda)
+        plan = get_psd_plan(nfft, overlap, SAMPLING_EEG, "hanning")
+
         # PSD con Welch
         try:
-            psd, freq_res = DataFilter.get_psd_welch(
-                data,
-                nfft,
-                overlap,
-                SAMPLING_EEG,
-                1  # BLACKMAN_HARRIS
-            )
+            psd = plan.welch(data)
             print(f"Debug: PSD calculado - Longitud: {len(psd)}")
         except Exception as psd_error:
-            print(f"Error en get_psd_welch: {psd_error}")
+            print(f"Error en PSD Welch: {psd_error}")
             return 0.0
 
-        # Calcular bandas (igual que antes)
+        # Calcular bandas: producto punto con pesos de trapecio precalculados
         try:
-            freqs = np.arange(len(psd)) * freq_res
-            theta_mask = (freqs >= 4.0) & (freqs <= 8.0)
-            beta_mask = (freqs >= 15.0) & (freqs <= 30.0)
-            
-            theta_power = np.trapz(psd[theta_mask], freqs[theta_mask]) if np.any(theta_mask) else 0.0
-            beta_power = np.trapz(psd[beta_mask], freqs[beta_mask]) if np.any(beta_mask) else 0.0
+            theta_power = plan.band_power(psd, "theta")
+            beta_power = plan.band_power(psd, "beta")
             
             if beta_power > 0:
                 ratio = theta_power / beta_power
@@ -106,15 +114,19 @@ def theta_beta_ratio(eeg: list, is_task=False) -> float:
 
 def hr_from_ppg(ppg: list, is_task=False) -> float:
     """Calcula heart rate desde PPG con manejo robusto de datos cortos"""
+    if isinstance(ppg, np.memmap):
+        from app.services.chunked_dsp import hr_from_ppg_chunked
+        return hr_from_ppg_chunked(ppg, is_task=is_task)
+
     min_samples = 64 if is_task else 128  # ~1s vs ~2s
     
-    if not ppg or len(ppg) < min_samples:
-        print(f"PPG datos insuficientes para HR: {len(ppg) if ppg else 0} < {min_samples}")
+    if ppg is None or len(ppg) < min_samples:
+        print(f"PPG datos insuficientes para HR: {len(ppg) if ppg is not None else 0} < {min_samples}")
         return 0.0
         
     try:
         # Limpiar datos
-        ppg_clean = [x for x in ppg if x is not None and not np.isnan(x) and not np.isinf(x)]
+        ppg_clean = finite_samples(ppg)
         if len(ppg_clean) < min_samples:
             print(f"PPG datos insuficientes para HR después de limpiar: {len(ppg_clean)} muestras")
             return 0.0
@@ -126,30 +138,12 @@ def hr_from_ppg(ppg: list, is_task=False) -> float:
             print(f"Datos PPG cortos ({len(ppg_clean)} muestras), usando método simple")
             return simple_hr_estimation(ppg_clean)
         
-        # Método completo con NeuroKit2
-        sig, info = nk.ppg_process(ppg_clean, sampling_rate=SAMPLING_PPG)
-        peaks = info["PPG_Peaks"]
-        
-        if len(peaks) < 2:
-            print("No hay suficientes picos, probando método simple")
-            return simple_hr_estimation(ppg_clean)
-            
-        # Calcular intervalos RR en segundos
-        rr_intervals = np.diff(peaks) / SAMPLING_PPG
-        
-        # Filtrar intervalos anómalos (300ms - 2000ms)
-        valid_rr = rr_intervals[(rr_intervals > 0.3) & (rr_intervals < 2.0)]
-        
-        if len(valid_rr) == 0:
-            print("No hay intervalos RR válidos, probando método simple")
+        # Método completo con el backend HRV (numpy o NeuroKit2)
+        peaks = get_hrv_backend().detect_peaks(ppg_clean, SAMPLING_PPG)
+        hr = hr_from_peaks(peaks)
+        if hr is None:
             return simple_hr_estimation(ppg_clean)
-        
-        # Heart rate promedio
-        mean_rr = np.mean(valid_rr)
-        hr = 60.0 / mean_rr if mean_rr > 0 else 0.0
-        
-        print(f"Debug: HR calculado: {hr} bpm")
-        return float(hr)
+        return hr
         
     except Exception as e:
         print(f"Error en hr_from_ppg: {e}")
@@ -157,6 +151,30 @@ def hr_from_ppg(ppg: list, is_task=False) -> float:
         return simple_hr_estimation(ppg_clean if 'ppg_clean' in locals() else ppg)
 
 
+def hr_from_peaks(peaks) -> float | None:
+    """HR medio a partir de los picos PPG; None → usar el método simple."""
+    if len(peaks) < 2:
+        print("No hay suficientes picos, probando método simple")
+        return None
+        
+    # Calcular intervalos RR en segundos
+    rr_intervals = np.diff(peaks) / SAMPLING_PPG
+    
+    # Filtrar intervalos anómalos (300ms - 2000ms)
+    valid_rr = rr_intervals[(rr_intervals > 0.3) & (rr_intervals < 2.0)]
+    
+    if len(valid_rr) == 0:
+        print("No hay intervalos RR válidos, probando método simple")
+        return None
+    
+    # Heart rate promedio
+    mean_rr = np.mean(valid_rr)
+    hr = 60.0 / mean_rr if mean_rr > 0 else 0.0
+    
+    print(f"Debug: HR calculado: {hr} bpm")
+    return float(hr)
+
+
 def simple_hr_estimation(ppg_data: list) -> float:
     """Estimación simple de HR usando detección básica de picos"""
     try:
@@ -202,16 +220,20 @@ def simple_hr_estimation(ppg_data: list) -> float:
 
 
 def lf_hf_ratio(ppg: list, is_task=False) -> float:
-    """LF/HF con cálculo manual cuando NeuroKit2 falla"""
+    """LF/HF con cálculo manual cuando el backend HRV falla"""
+    if isinstance(ppg, np.memmap):
+        from app.services.chunked_dsp import lf_hf_ratio_chunked
+        return lf_hf_ratio_chunked(ppg, is_task=is_task)
+
     min_samples = 128 if is_task else 192
     
-    if not ppg or len(ppg) < min_samples:
-        print(f"PPG datos insuficientes para LF/HF: {len(ppg) if ppg else 0} < {min_samples}")
+    if ppg is None or len(ppg) < min_samples:
+        print(f"PPG datos insuficientes para LF/HF: {len(ppg) if ppg is not None else 0} < {min_samples}")
         return 0.0
 
     try:
         # Limpiar datos PPG
-        ppg_clean = [x for x in ppg if x is not None and not np.isnan(x) and not np.isinf(x)]
+        ppg_clean = finite_samples(ppg)
         
         if len(ppg_clean) < min_samples:
             print(f"PPG datos insuficientes para LF/HF después de limpiar: {len(ppg_clean)} muestras")
@@ -219,49 +241,48 @@ def lf_hf_ratio(ppg: list, is_task=False) -> float:
 
         print(f"Debug: Procesando PPG para LF/HF - {len(ppg_clean)} muestras")
         
-        sig, info = nk.ppg_process(ppg_clean, sampling_rate=SAMPLING_PPG)
-        
-        if "PPG_Peaks" not in info or len(info["PPG_Peaks"]) < 5:
-            print("No se encontraron suficientes picos PPG para HRV")
-            return 0.0
-
-        # ✅ NUEVO: Calcular LF/HF manualmente
-        peaks = info["PPG_Peaks"]
-        
-        # Calcular intervalos RR en milisegundos
-        rr_intervals = np.diff(peaks) / SAMPLING_PPG * 1000  # En ms
-        
-        # Filtrar intervalos válidos
-        valid_rr = rr_intervals[(rr_intervals > 300) & (rr_intervals < 2000)]
-        
-        if len(valid_rr) < 10:  # Necesitamos al menos 10 intervalos
-            print(f"Muy pocos intervalos RR válidos: {len(valid_rr)}")
-            return calculate_simple_lf_hf(valid_rr) if len(valid_rr) >= 3 else 0.0
-        
-        # ✅ Intentar primero con NeuroKit2
-        try:
-            hrv = nk.hrv(peaks, sampling_rate=SAMPLING_PPG, show=False)
-            
-            if not hrv.empty and "HRV_LFHF" in hrv.columns:
-                value = hrv.loc[0, "HRV_LFHF"]
-                print(f"Debug: LF/HF de NeuroKit2: {value}")
-                
-                if not np.isnan(value) and value > 0:
-                    return float(value)
-            
-            # ✅ Si NeuroKit2 falla, calcular manualmente
-            print("NeuroKit2 LF/HF inválido, calculando manualmente...")
-            return calculate_manual_lf_hf(valid_rr)
-            
-        except Exception as nk_error:
-            print(f"Error en NeuroKit2 HRV: {nk_error}")
-            return calculate_manual_lf_hf(valid_rr)
+        backend = get_hrv_backend()
+        peaks = backend.detect_peaks(ppg_clean, SAMPLING_PPG)
+        return lf_hf_from_peaks(peaks, backend)
         
     except Exception as e:
         print(f"Error en lf_hf_ratio: {e}")
         return 0.0
 
 
+def lf_hf_from_peaks(peaks, backend) -> float:
+    """LF/HF a partir de los picos PPG, con fallback manual/simple."""
+    if len(peaks) < 5:
+        print("No se encontraron suficientes picos PPG para HRV")
+        return 0.0
+
+    # Calcular intervalos RR en milisegundos
+    rr_intervals = np.diff(peaks) / SAMPLING_PPG * 1000  # En ms
+
+    # Filtrar intervalos válidos
+    valid_rr = rr_intervals[(rr_intervals > 300) & (rr_intervals < 2000)]
+
+    if len(valid_rr) < 10:  # Necesitamos al menos 10 intervalos
+        print(f"Muy pocos intervalos RR válidos: {len(valid_rr)}")
+        return calculate_simple_lf_hf(valid_rr) if len(valid_rr) >= 3 else 0.0
+
+    # ✅ Intentar primero con el backend HRV
+    try:
+        value = backend.lf_hf(peaks, SAMPLING_PPG)
+        print(f"Debug: LF/HF de backend {backend.name}: {value}")
+
+        if not np.isnan(value) and value > 0:
+            return float(value)
+
+        # ✅ Si el backend falla, calcular manualmente
+        print("LF/HF del backend inválido, calculando manualmente...")
+        return calculate_manual_lf_hf(valid_rr)
+
+    except Exception as backend_error:
+        print(f"Error en backend HRV {backend.name}: {backend_error}")
+        return calculate_manual_lf_hf(valid_rr)
+
+
 def calculate_manual_lf_hf(rr_intervals: np.ndarray) -> float:
     """Cálculo manual de LF/HF usando análisis espectral simple"""
     try:
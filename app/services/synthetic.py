@@ -0,0 +1,102 @@
+# app/services/synthetic.py
+"""Payloads sintéticos (EEG Muse + PPG) para benchmarks y pruebas offline."""
+import numpy as np
+
+from app.models.biometrics import SessionPayload
+from app.services.signal_processing import SAMPLING_EEG, SAMPLING_PPG
+
+EEG_CHANNELS = ("TP9", "AF7", "AF8", "TP10")
+
+
+def synthetic_eeg(seconds: float, fs: int = SAMPLING_EEG, theta_amp: float = 10.0,
+                  beta_amp: float = 5.0, offset: float = 0.0, seed: int = 0) -> np.ndarray:
+    """EEG con componentes θ (6 Hz) y β (20 Hz) sobre ruido rosa aproximado."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * fs)) / fs
+    noise = np.cumsum(rng.standard_normal(t.size)) * 0.5
+    noise -= np.convolve(noise, np.ones(fs) / fs, mode="same")
+    return (offset + theta_amp * np.sin(2 * np.pi * 6 * t)
+            + beta_amp * np.sin(2 * np.pi * 20 * t) + noise)
+
+
+def synthetic_ppg(seconds: float, fs: int, hr: float = 70.0,
+                  lf_amp: float = 0.04, hf_amp: float = 0.02,
+                  noise: float = 0.05, seed: int = 0):
+    """
+    PPG sintético con RR modulado por una onda LF (0.1 Hz) y otra HF
+    (0.25 Hz). Devuelve (señal, HR real en bpm).
+    """
+    rng = np.random.default_rng(seed)
+    mean_rr = 60.0 / hr
+    beats, t = [], 0.0
+    while t < seconds:
+        beats.append(t)
+        t += mean_rr * (1 + lf_amp * np.sin(2 * np.pi * 0.1 * t)
+                        + hf_amp * np.sin(2 * np.pi * 0.25 * t))
+    beats = np.asarray(beats)
+    time_ = np.arange(int(seconds * fs)) / fs
+    sig = np.zeros_like(time_)
+    for b in beats:
+        sig += np.exp(-((time_ - b - 0.15) ** 2) / (2 * 0.05 ** 2))          # sistólica
+        sig += 0.4 * np.exp(-((time_ - b - 0.40) ** 2) / (2 * 0.07 ** 2))    # dicrótica
+    sig += noise * rng.standard_normal(sig.size)
+    return sig, 60.0 / np.mean(np.diff(beats))
+
+
+def _packets(seconds: float, seed: int, theta_amp: float, asym: float) -> list:
+    return [
+        {
+            "channel": ch,
+            "values": synthetic_eeg(
+                seconds, theta_amp=theta_amp,
+                offset=asym if ch == "AF7" else 0.0, seed=seed + i
+            ).tolist(),
+        }
+        for i, ch in enumerate(EEG_CHANNELS)
+    ]
+
+
+def synthetic_session_payload(n_tasks: int = 3, rest_seconds: float = 60.0,
+                              task_seconds: float = 30.0, seed: int = 0,
+                              context_type: str = "task_evaluation",
+                              session_relation: str = None) -> SessionPayload:
+    """SessionPayload determinista: reposo + n_tasks tareas con HR y θ crecientes."""
+    rest_ppg, _ = synthetic_ppg(rest_seconds, SAMPLING_PPG, hr=65.0, seed=seed)
+    tasks = []
+    for k in range(n_tasks):
+        ppg, _ = synthetic_ppg(task_seconds, SAMPLING_PPG, hr=70.0 + 5 * k, seed=seed + 100 + k)
+        tasks.append({
+            "taskId":     f"task-{k}",
+            "taskName":   f"Synthetic task {k}",
+            "userRating": 3,
+            "eeg":        _packets(task_seconds, seed + 10 * (k + 1), 10.0 + 3 * k, 2.0 * k),
+            "ppg":        ppg.tolist(),
+            "hr":         [],
+        })
+    return SessionPayload.model_validate({
+        "sessionId":       f"session_{seed}_synthetic_user",
+        "userFirebaseId":  "synthetic-user",
+        "participantId":   "synthetic-user",
+        "contextType":     context_type,
+        "sessionRelation": session_relation,
+        "restData": {
+            "eeg": _packets(rest_seconds, seed, 10.0, 0.0),
+            "ppg": rest_ppg.tolist(),
+            "hr":  [],
+        },
+        "tasks": tasks,
+    })
+
+
+def synthetic_muse_packets(seconds: float, seed: int = 0, per_packet: int = 12) -> list:
+    """Paquetes Muse (quick-emotion) intercalados por electrodo, en el orden de EEG_CHANNELS."""
+    signals = [synthetic_eeg(seconds, offset=800.0, seed=seed + e) for e in range(len(EEG_CHANNELS))]
+    packets = []
+    for start in range(0, signals[0].size, per_packet):
+        for e, sig in enumerate(signals):
+            packets.append({
+                "electrode": e,
+                "timestamp": start / SAMPLING_EEG,
+                "samples":   sig[start:start + per_packet].round(3).tolist(),
+            })
+    return packets
@@ -0,0 +1,110 @@
+# app/services/user_cache.py
+"""
+Caché en memoria (por proceso) de filas de usuario por firebase_id.
+
+Los endpoints de sesiones sólo necesitan nombre y avatar de unos pocos
+usuarios; en vez de hacer JOIN con users en cada fila, se resuelven aquí
+con una única consulta por lote para los que falten. Las entradas
+caducan a los USER_CACHE_TTL_SECONDS y se invalidan en signin,
+update_avatar y update_profile, también en los demás workers (bus de
+invalidación, clave "user").
+"""
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import select
+
+from app.core.config import USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES
+from app.db.models_bio import User
+from app.services import invalidation
+
+USER_COLUMNS = ("id", "firebase_id", "name", "avatar_url", "gender", "created_at")
+
+
+class UserCache:
+    """
+    TTL por entrada. Se usa desde el event loop y desde los endpoints
+    síncronos de users.py (threadpool), así que lleva lock.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._rows: Dict[str, tuple] = {}     # firebase_id → (expira, fila)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, firebase_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._rows.get(firebase_id)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def get_many(self, firebase_ids: Iterable[str]) -> Dict[str, dict]:
+        """Los que están vigentes en caché (los ausentes no aparecen)."""
+        found = {}
+        for firebase_id in set(firebase_ids):
+            row = self.get(firebase_id)
+            if row is not None:
+                found[firebase_id] = row
+        return found
+
+    def put(self, row: dict) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if len(self._rows) >= self.max_entries:
+                # Primero los caducados; si no basta, se vacía
+                self._rows = {k: e for k, e in self._rows.items() if e[0] >= now}
+                if len(self._rows) >= self.max_entries:
+                    self._rows.clear()
+            self._rows[row["firebase_id"]] = (now + self.ttl, row)
+
+    def invalidate(self, firebase_id: str) -> None:
+        with self._lock:
+            self._rows.pop(firebase_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+
+    def snapshot(self) -> dict:
+        return {
+            "entries": len(self._rows),
+            "hits":    self.hits,
+            "misses":  self.misses,
+            "ttl_seconds": self.ttl,
+        }
+
+
+user_cache = UserCache(USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES)
+invalidation.subscribe("user", user_cache.invalidate, user_cache.clear)
+
+
+def user_row(values) -> dict:
+    """Tupla (en el orden de USER_COLUMNS) → dict, mismo shape que GET /users/{id}."""
+    return dict(zip(USER_COLUMNS, values))
+
+
+async def get_users(db, firebase_ids: Iterable[str]) -> Dict[str, dict]:
+    """
+    firebase_id → fila de usuario; los que no están en caché se cargan con
+    una sola consulta. Los inexistentes no aparecen en el resultado.
+    """
+    firebase_ids = {f for f in firebase_ids if f is not None}
+    users = user_cache.get_many(firebase_ids)
+    missing = firebase_ids - users.keys()
+    if missing:
+        result = await db.execute(
+            select(*(getattr(User, c) for c in USER_COLUMNS))
+            .where(User.firebase_id.in_(missing))
+        )
+        for values in result.all():
+            row = user_row(values)
+            user_cache.put(row)
+            users[row["firebase_id"]] = row
+    return users
@@ -1,26 +1,77 @@
 # app/services/valence_arousal.py
-from math import tanh
-from statistics import mean
+"""
+Arousal/valence a partir de los deltas respecto al baseline.
 
+La API escalar (arousal_feature, valence_feature) es la implementación
+de referencia; el pipeline usa las versiones por arrays, que dan los
+mismos bits: los z-scores se calculan en bloque (una división por
+elemento, igual que z) y la media y la tanh de cada tarea con
+statistics.mean y math.tanh, no con mean/tanh de NumPy (otro orden de
+suma y otro redondeo). La igualdad bit a bit se comprueba en
+tests/test_valence_arousal.py.
+"""
 from math import tanh
 from statistics import mean
+
 import numpy as np
 
+# Escala (desviación típica) de cada delta respecto al baseline
+STD_THETA = 0.2
+STD_HRV   = 0.5
+STD_GSR   = 0.3
+STD_HR    = 5.0
+ASYM_SCALE = 20.0
+
+
 def z(val: float, std: float) -> float:
     """Z-score capado (NaN→0)."""
     return 0.0 if std == 0 or np.isnan(val) else val / std
 
 
+# ───── Versiones vectorizadas (arrays de tareas) ─────────────────
+def z_array(vals, std: float) -> np.ndarray:
+    """Z-score capado (NaN→0) sobre un array."""
+    vals = np.asarray(vals, dtype=np.float64)
+    if std == 0:
+        return np.zeros_like(vals)
+    with np.errstate(invalid="ignore"):
+        return np.where(np.isnan(vals), 0.0, vals / std)
+
+
+def arousal_features(d_theta, d_hrv, d_gsr, d_hr) -> np.ndarray:
+    """Arousal de N tareas en una sola llamada; rango (-1,1)."""
+    feats = np.stack(np.broadcast_arrays(
+        -z_array(d_theta, STD_THETA),   # ↑β ⇒ +arousal
+        -z_array(d_hrv,   STD_HRV),     # ↓HRV ⇒ +arousal
+        z_array(d_gsr,    STD_GSR),     # +sudor ⇒ +arousal
+        z_array(d_hr,     STD_HR),      # +BPM  ⇒ +arousal
+    ))
+    # Media exacta de statistics (no la suma por pares de NumPy) y math.tanh
+    return np.array([tanh(mean(row)) for row in feats.T.tolist()], dtype=np.float64)
+
+
+def valence_features(asym) -> np.ndarray:
+    """Asimetría frontal → valence (-1…+1) sobre un array."""
+    scaled = np.asarray(asym, dtype=np.float64) / ASYM_SCALE
+    return np.array([tanh(x) for x in scaled.tolist()], dtype=np.float64)
+
+
+def stress_from_arousal(arousal) -> np.ndarray:
+    """Arousal (-1…+1) → estrés normalizado (0…1)."""
+    return (np.asarray(arousal, dtype=np.float64) + 1) / 2
+
+
+# ───── API escalar (referencia) ──────────────────────────────────
 def arousal_feature(d_theta: float, d_hrv: float, d_gsr: float, d_hr: float) -> float:
     feats = [
-        -z(d_theta, 0.2),   # ↑β ⇒ +arousal
-        -z(d_hrv,  0.5),    # ↓HRV ⇒ +arousal
-        z(d_gsr,   0.3),    # +sudor ⇒ +arousal
-        z(d_hr,    5.0),    # +BPM  ⇒ +arousal
+        -z(d_theta, STD_THETA),   # ↑β ⇒ +arousal
+        -z(d_hrv,   STD_HRV),     # ↓HRV ⇒ +arousal
+        z(d_gsr,    STD_GSR),     # +sudor ⇒ +arousal
+        z(d_hr,     STD_HR),      # +BPM  ⇒ +arousal
     ]
     return tanh(mean(feats))   # rango (-1,1)
 
 
 def valence_feature(asym: float) -> float:
     """Asimetría frontal → valence (-1…+1)."""
-    return tanh(asym / 20.0)
+    return tanh(asym / ASYM_SCALE)
@@ -1,13 +1,36 @@
 # main.py
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.routers import users, biometrics, sessions
+from app.services.dsp_pool import shutdown_dsp_pool
+from app.services.invalidation import start_listener
+from app.services.db_resilience import start_drainer
+from app.services.process_session import write_parked_session
+from app.services.profiling import ProfilingMiddleware
+from app.services.compression import CompressionMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Escuchar invalidaciones de caché de los demás workers
+    listener = start_listener()
+    # Reintentar las sesiones aparcadas mientras la BD estuvo caída
+    drainer = start_drainer(write_parked_session)
+    yield
+    drainer.cancel()
+    if listener is not None:
+        listener.cancel()
+    # Cerrar el pool de procesos DSP (si se usó) al apagar el worker
+    shutdown_dsp_pool()
+
+
 app = FastAPI(
     title="Ejemplo de API con FastAPI",
     description="API con rutas organizadas y conexión a SQL Server Express",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -16,8 +39,16 @@ app.add_middleware(
     allow_credentials=False, 
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Estimate",  # paginación de /users/
+                    "X-Profile-Id"],                      # perfilado bajo demanda
 )
 
+# Respuestas comprimidas (zstd/gzip) según Accept-Encoding
+app.add_middleware(CompressionMiddleware)
+
+# Perfilado de un request con X-Profile-Token (no hace nada sin PROFILE_TOKEN)
+app.add_middleware(ProfilingMiddleware)
+
 # Incluir los routers
 app.include_router(users.router)
 app.include_router(biometrics.router)
@@ -0,0 +1,108 @@
+# serve.py
+"""
+Lanzador de producción.
+
+    python serve.py --api-workers 4 --dsp-workers 2 --pin
+        N workers uvicorn para la API; cada uno con su pool de procesos DSP
+        (hilos BLAS/OpenMP limitados y, con --pin, un núcleo por proceso DSP).
+
+    python serve.py bench --jobs 24
+        Carga sintética sobre el pipeline DSP con 1, 2, 4 … núcleos para
+        medir cómo escala el throughput (sesiones/s).
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def serve(args) -> None:
+    os.environ["DSP_WORKERS"] = str(args.dsp_workers)
+    os.environ["DSP_THREADS"] = str(args.dsp_threads)
+    os.environ["DSP_PIN_CORES"] = "1" if args.pin else "0"
+    os.environ["DSP_SLOT_DIR"] = tempfile.mkdtemp(prefix="raices-dsp-")
+
+    # Tras fijar el entorno (config lo lee al importar) y antes de numpy
+    from app.services.dsp_pool import cap_threads
+    cap_threads(args.api_threads)
+
+    import uvicorn
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.api_workers,
+        log_level=args.log_level,
+    )
+
+
+def bench(args) -> None:
+    from app.services.dsp_pool import cap_threads, _init_dsp_worker
+    cap_threads(args.dsp_threads)
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    from app.services.session_features import compute_session_features
+    from app.services.synthetic import synthetic_session_payload
+
+    payload = synthetic_session_payload(n_tasks=args.tasks)
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    counts = sorted({n for n in (1, 2, 4, 8, 16, 32, 64) if n <= cores} | {cores})
+
+    ctx = multiprocessing.get_context("spawn")
+    baseline = None
+    print(f"{'workers':>7} {'sessions/s':>11} {'speedup':>8}")
+    for n in counts:
+        with ProcessPoolExecutor(
+            max_workers=n, mp_context=ctx,
+            initializer=_init_dsp_worker, initargs=(ctx.Value("i", 0), 0, args.pin),
+        ) as pool:
+            # Calentar: arrancar procesos e importar numpy/scipy en cada uno
+            list(pool.map(_quiet, [compute_session_features] * n, [payload] * n))
+            start = time.perf_counter()
+            list(pool.map(_quiet, [compute_session_features] * args.jobs, [payload] * args.jobs))
+            rate = args.jobs / (time.perf_counter() - start)
+        baseline = baseline or rate
+        print(f"{n:>7} {rate:>11.2f} {rate / baseline:>7.2f}x")
+
+
+def _quiet(func, *args):
+    """Corre func sin los prints de depuración del pipeline."""
+    import contextlib
+    import io
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsp-threads", type=int, default=1, help="hilos BLAS/OpenMP por proceso DSP")
+    parser.add_argument("--pin", action="store_true", help="fijar cada proceso DSP a un núcleo")
+    sub = parser.add_subparsers(dest="command")
+
+    bench_p = sub.add_parser("bench", help="medir escalado del DSP con el número de núcleos")
+    bench_p.add_argument("--jobs", type=int, default=24)
+    bench_p.add_argument("--tasks", type=int, default=3)
+    # También aquí: `serve.py bench --pin` (tras el subcomando)
+    bench_p.add_argument("--pin", action="store_true", default=argparse.SUPPRESS,
+                         help="fijar cada proceso DSP a un núcleo")
+    bench_p.add_argument("--dsp-threads", type=int, default=argparse.SUPPRESS,
+                         help="hilos BLAS/OpenMP por proceso DSP")
+
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--api-workers", type=int, default=max(1, (os.cpu_count() or 2) // 4))
+    parser.add_argument("--api-threads", type=int, default=1, help="hilos BLAS/OpenMP por worker API")
+    parser.add_argument("--dsp-workers", type=int, default=2, help="procesos DSP por worker API")
+    parser.add_argument("--log-level", default="info")
+
+    args = parser.parse_args()
+    if args.command == "bench":
+        bench(args)
+    else:
+        serve(args)
+
+
+if __name__ == "__main__":
+    main()
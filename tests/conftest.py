@@ -0,0 +1,21 @@
+# tests/conftest.py
+"""
+Pruebas offline (sin BD ni red): python -m pytest -q
+
+app.core.config lee la conexión al importar app.db.async_engine; aquí
+van valores de relleno para poder importar los módulos que la usan
+(nunca se conecta). El bus de invalidación queda apagado.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("INVALIDATION_BUS", "0")
+os.environ.setdefault("DB_HOST", "localhost")
+os.environ.setdefault("DB_PORT", "5432")
+os.environ.setdefault("DB_NAME", "test")
+os.environ.setdefault("DB_USER", "test")
+os.environ.setdefault("DB_PASSWORD", "test")
+os.environ.setdefault("AIVEN_CA_PEM", os.path.join(ROOT, "app", "certs", "aiven_ca.pem"))
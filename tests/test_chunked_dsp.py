@@ -0,0 +1,59 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from app.services import hrv_backends
+from app.services.chunked_dsp import (
+    write_sample_store, theta_beta_ratio_chunked, hr_from_ppg_chunked, lf_hf_ratio_chunked
+)
+from app.services.signal_processing import (
+    SAMPLING_PPG, theta_beta_ratio, hr_from_ppg, lf_hf_ratio
+)
+from app.services.synthetic import synthetic_eeg, synthetic_ppg
+
+MINUTES = 5
+
+
+@pytest.fixture
+def numpy_backend(monkeypatch):
+    """La detección por bloques es la del backend numpy."""
+    monkeypatch.setattr(hrv_backends, "HRV_BACKEND", "numpy")
+
+
+@pytest.fixture(scope="module")
+def stores(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("stores")
+    eeg = synthetic_eeg(MINUTES * 60, offset=800.0, seed=MINUTES)     # offset DC tipo Muse
+    eeg += np.linspace(0.0, 50.0, eeg.size)                           # deriva lenta
+    ppg, _ = synthetic_ppg(MINUTES * 60, SAMPLING_PPG, seed=MINUTES)
+    return (write_sample_store(str(tmp / "eeg.f32"), eeg),
+            write_sample_store(str(tmp / "ppg.f32"), ppg))
+
+
+def _quiet(func, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+
+def test_theta_beta_matches_in_memory(stores):
+    eeg, _ = stores
+    ref = _quiet(theta_beta_ratio, np.asarray(eeg).tolist())
+    # detrend exacto por trozos vs el de brainflow: ~1e-6 relativo
+    assert _quiet(theta_beta_ratio_chunked, eeg) == pytest.approx(ref, rel=1e-5)
+
+
+@pytest.mark.parametrize("full, chunked", [(hr_from_ppg, hr_from_ppg_chunked),
+                                           (lf_hf_ratio, lf_hf_ratio_chunked)])
+def test_ppg_metrics_match_in_memory(numpy_backend, stores, full, chunked):
+    _, ppg = stores
+    ref = _quiet(full, np.asarray(ppg).tolist())
+    assert _quiet(chunked, ppg) == pytest.approx(ref, rel=1e-9)
+
+
+def test_memmap_dispatch(numpy_backend, stores):
+    """signal_processing deriva al camino por trozos con un memmap."""
+    eeg, ppg = stores
+    assert _quiet(theta_beta_ratio, eeg) == _quiet(theta_beta_ratio_chunked, eeg)
+    assert _quiet(hr_from_ppg, ppg) == _quiet(hr_from_ppg_chunked, ppg)
@@ -0,0 +1,146 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.services import db_resilience
+from app.services.db_resilience import (
+    CircuitBreaker, DatabaseUnavailable, park, drain_parked, reclaim_stale, run_db
+)
+
+
+@pytest.fixture
+def park_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_resilience, "DB_PARK_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    """Breaker propio por prueba, sin esperas entre reintentos."""
+    b = CircuitBreaker(failures=2, reset_seconds=0.05)
+    monkeypatch.setattr(db_resilience, "db_breaker", b)
+    monkeypatch.setattr(db_resilience, "backoff_seconds", lambda attempt: 0.0)
+    return b
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    monkeypatch.setattr(db_resilience, "AsyncSessionLocal", FakeSession)
+
+
+# ───── Circuit breaker ───────────────────────────────────────────
+def test_breaker_opens_and_recovers(breaker):
+    breaker.failure()
+    assert breaker.state == "closed"
+    breaker.failure()
+    assert breaker.state == "open"
+    with pytest.raises(DatabaseUnavailable) as exc:
+        breaker.check()
+    assert exc.value.status_code == 503 and "Retry-After" in exc.value.headers
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    breaker.check()                         # una sola prueba
+    with pytest.raises(DatabaseUnavailable):
+        breaker.check()
+    breaker.success()
+    assert breaker.state == "closed" and breaker.rejected == 2
+
+
+def test_failed_probe_reopens(breaker):
+    breaker.failure(), breaker.failure()
+    time.sleep(0.06)
+    breaker.check()
+    breaker.failure()
+    assert breaker.state == "open"
+
+
+# ───── run_db ────────────────────────────────────────────────────
+def test_run_db_retries_disconnects(breaker, sessions):
+    calls = []
+
+    async def unit(db):
+        calls.append(db)
+        if len(calls) < 2:
+            raise ConnectionRefusedError("down")
+        return "ok"
+
+    assert asyncio.run(run_db(unit, attempts=3)) == "ok"
+    assert len(calls) == 2 and len({id(db) for db in calls}) == 2    # sesión nueva por intento
+    assert breaker.failures == 0
+
+
+def test_run_db_gives_up(breaker, sessions):
+    async def unit(db):
+        raise ConnectionRefusedError("down")
+
+    with pytest.raises(DatabaseUnavailable):
+        asyncio.run(run_db(unit, attempts=2))
+    assert breaker.state == "open"
+
+
+def test_run_db_does_not_retry_other_errors(breaker, sessions):
+    calls = []
+
+    async def unit(db):
+        calls.append(db)
+        raise ValueError("bad data")
+
+    with pytest.raises(ValueError):
+        asyncio.run(run_db(unit, attempts=3))
+    assert len(calls) == 1 and breaker.failures == 0
+
+
+# ───── Trabajos aparcados ────────────────────────────────────────
+def test_park_and_drain_in_order(park_dir):
+    park({"n": 1})
+    park({"n": 2})
+    seen = []
+
+    async def handler(record):
+        seen.append(record["n"])
+
+    assert asyncio.run(drain_parked(handler)) == 2
+    assert seen == [1, 2] and os.listdir(park_dir) == []
+
+
+def test_drain_stops_while_db_down(park_dir):
+    park({"n": 1})
+
+    async def handler(record):
+        raise DatabaseUnavailable(1)
+
+    assert asyncio.run(drain_parked(handler)) == 0
+    assert [f for f in os.listdir(park_dir) if f.endswith(".json")]
+
+
+def test_failing_job_is_set_aside(park_dir):
+    park({"n": 1})
+
+    async def handler(record):
+        raise ValueError("corrupt")
+
+    assert asyncio.run(drain_parked(handler)) == 0
+    assert [f.endswith(".failed") for f in os.listdir(park_dir)] == [True]
+
+
+def test_reclaim_stale_claims(park_dir):
+    name = park({"n": 1})
+    claimed = park_dir / f"{name}.1234.claim"
+    os.rename(park_dir / name, claimed)
+
+    assert reclaim_stale(max_age=60) == 0                   # reclamo reciente: se respeta
+    old = time.time() - 120
+    os.utime(claimed, (old, old))
+    assert reclaim_stale(max_age=60) == 1
+    assert os.listdir(park_dir) == [name]
@@ -0,0 +1,20 @@
+from app.services.eeg_analysis import QUICK_EMOTION_MAP, quick_emotion
+from app.services.synthetic import synthetic_muse_packets
+
+
+def test_quick_emotion_on_muse_packets():
+    result = quick_emotion(synthetic_muse_packets(2))
+    assert (result["emotion"], result["emoji"]) in QUICK_EMOTION_MAP.values()
+    assert result["samples"] == [512] * 4
+    assert result["theta_alpha_ratio"] > 0
+
+
+def test_too_few_samples_is_neutral():
+    packets = synthetic_muse_packets(2)[:8]          # 2 paquetes por electrodo
+    result = quick_emotion(packets)
+    assert result["emotion"] == "Neutral" and result["theta_alpha_ratio"] is None
+
+
+def test_declared_rate_is_resampled():
+    result = quick_emotion(synthetic_muse_packets(2), sampling_rate=128)
+    assert result["samples"] == [1024] * 4
@@ -0,0 +1,32 @@
+import pytest
+
+from app.services import golden
+from app.services.hrv_backends import get_hrv_backend
+
+
+@pytest.fixture(scope="module")
+def pinned():
+    expected = golden.load_expected()
+    assert expected["version"] == golden.CORPUS_VERSION, "corpus viejo: golden record"
+    backend = get_hrv_backend().name
+    if backend not in expected["backends"]:
+        pytest.skip(f"sin valores grabados para el backend HRV {backend!r}")
+    return expected["backends"][backend]["cases"]
+
+
+@pytest.fixture(scope="module")
+def actual():
+    return golden.compute_corpus()
+
+
+@pytest.mark.parametrize("case", list(golden.CASES))
+def test_case_matches_pinned_values(pinned, actual, case):
+    assert case in pinned, f"{case}: not recorded"
+    assert golden.compare(pinned[case], actual[case], case, golden.RTOL, golden.ATOL) == []
+
+
+def test_compare_reports_differences():
+    expected = {"a": 1.0, "tasks": [{"label": "Calm"}]}
+    assert golden.compare(expected, {"a": 1.0 + 1e-12, "tasks": [{"label": "Calm"}]}, "x", 1e-6, 1e-9) == []
+    errors = golden.compare(expected, {"a": 2.0, "tasks": [{"label": "Happy"}], "b": 0}, "x", 1e-6, 1e-9)
+    assert sorted(errors) == ["x.a: 2.0 != 1.0", "x.b: unexpected", "x.tasks[0].label: 'Happy' != 'Calm'"]
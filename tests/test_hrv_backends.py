@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from app.services.hrv_backends import BACKENDS, get_hrv_backend
+from app.services.synthetic import synthetic_ppg
+
+FS = 64
+
+
+def _hr(peaks) -> float:
+    return 60.0 / np.mean(np.diff(peaks) / FS)
+
+
+@pytest.mark.parametrize("seconds", [30, 60, 120])
+def test_numpy_hr_matches_truth(seconds):
+    ppg, true_hr = synthetic_ppg(seconds, FS)
+    peaks = BACKENDS["numpy"].detect_peaks(ppg, FS)
+    assert _hr(peaks) == pytest.approx(true_hr, rel=0.01)
+
+
+def test_numpy_lf_hf_needs_peaks():
+    ppg, _ = synthetic_ppg(10, FS)
+    backend = BACKENDS["numpy"]
+    assert np.isnan(backend.lf_hf(backend.detect_peaks(ppg, FS), FS))
+
+
+@pytest.mark.parametrize("seconds, tolerance", [(60, 0.15), (120, 0.05)])
+def test_backends_agree_within_documented_tolerance(seconds, tolerance):
+    """Diferencia aceptada en config.HRV_BACKEND: mismo HR, LF/HF a ~10% con ≥ 60 s."""
+    pytest.importorskip("neurokit2")
+    ppg, _ = synthetic_ppg(seconds, FS)
+    results = {}
+    for name, backend in BACKENDS.items():
+        peaks = backend.detect_peaks(ppg, FS)
+        results[name] = (_hr(peaks), backend.lf_hf(peaks, FS))
+    assert results["numpy"][0] == pytest.approx(results["neurokit"][0], rel=0.005)
+    assert results["numpy"][1] == pytest.approx(results["neurokit"][1], rel=tolerance)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        get_hrv_backend("nope")
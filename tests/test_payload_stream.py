@@ -0,0 +1,94 @@
+import asyncio
+
+import numpy as np
+import orjson
+import pytest
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+
+from app.models.biometrics import SessionPayload
+from app.services.payload_stream import (
+    BodyReader, PayloadBuilder, SampleBuffer, decode_payload, parse_payload
+)
+from app.services.synthetic import synthetic_session_payload
+
+
+@pytest.fixture(scope="module")
+def body() -> bytes:
+    return synthetic_session_payload(n_tasks=2, rest_seconds=10, task_seconds=5).model_dump_json().encode()
+
+
+async def _chunks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def _same(a: SessionPayload, b: SessionPayload) -> None:
+    assert a.sessionId == b.sessionId and len(a.tasks) == len(b.tasks)
+    assert np.array_equal(a.restData.ppg, b.restData.ppg)
+    for ta, tb in zip(a.tasks, b.tasks):
+        for pa, pb in zip(ta.eeg, tb.eeg):
+            assert pa.channel == pb.channel and np.array_equal(pa.values, pb.values)
+
+
+def test_decode_matches_model_validate(body):
+    _same(decode_payload(body), SessionPayload.model_validate_json(body))
+
+
+def test_parse_in_small_chunks(body):
+    reader = BodyReader(_chunks(body, 1000))
+    payload = asyncio.run(parse_payload(reader))
+    assert reader.total == len(body)
+    _same(payload, decode_payload(body))
+
+
+def test_body_limit(body):
+    reader = BodyReader(_chunks(body, 1000), max_bytes=len(body) // 2)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(parse_payload(reader))
+    assert exc.value.status_code == 413
+
+
+@pytest.mark.parametrize("bad", ['"1.5"', "true", "[1]", "{}"])
+def test_non_numeric_samples_are_rejected(body, bad):
+    data = orjson.loads(body)
+    data["restData"]["ppg"][3] = orjson.loads(bad)
+    with pytest.raises(HTTPException) as exc:
+        decode_payload(orjson.dumps(data))
+    assert exc.value.status_code == 422
+
+
+def test_null_samples_become_gaps(body):
+    data = orjson.loads(body)
+    n = len(data["restData"]["ppg"])
+    data["restData"]["ppg"][3] = None
+    assert len(decode_payload(orjson.dumps(data)).restData.ppg) == n - 1
+
+
+def test_invalid_json():
+    with pytest.raises(HTTPException) as exc:
+        decode_payload(b'{"sessionId": ')
+    assert exc.value.status_code == 400
+
+
+def test_missing_fields_are_validation_errors():
+    with pytest.raises(RequestValidationError):
+        decode_payload(b'{"sessionId": "s"}')
+
+
+def test_sample_cap_while_parsing():
+    buf = SampleBuffer("ppg", limit=1500)
+    for i in range(1500):
+        buf.append(float(i))
+    with pytest.raises(HTTPException) as exc:
+        buf.append(0.0)
+    assert exc.value.status_code == 413
+    assert np.array_equal(buf.to_array(), np.arange(1500.0))
+
+
+def test_builder_paths():
+    builder = PayloadBuilder()
+    builder.feed(b'{"tasks": [{"eeg": [{"channel": "AF7", "values": [1, "a"]}]}]}'[:40])
+    with pytest.raises(HTTPException) as exc:
+        builder.feed(b'{"tasks": [{"eeg": [{"channel": "AF7", "values": [1, "a"]}]}]}'[40:])
+    assert "tasks[0].eeg[0].values" in exc.value.detail
@@ -0,0 +1,25 @@
+import orjson
+import pytest
+
+from app.services import invalidation
+from app.services.relation_live import shared_items, publish_tasks, get_snapshot
+
+
+@pytest.mark.parametrize("n_tasks", [0, 1, 200, 2000])
+def test_shared_items_fit_in_notify(n_tasks):
+    records = [(-0.123456789012345 * (i % 7), 0.98765432109876 / (i + 1)) for i in range(n_tasks)]
+    items = shared_items("relation-" + "x" * 100, "participant-ñ", records)
+    payloads = invalidation.payloads(relation_tasks=items)
+
+    assert all(len(p.encode()) < invalidation.MAX_PAYLOAD_BYTES for p in payloads)
+    tasks = [t for p in payloads for item in orjson.loads(p)["relation_tasks"] for t in item["tasks"]]
+    assert tasks == [list(r) for r in records]
+
+
+def test_publish_tasks_aggregates():
+    publish_tasks("rel-test", "p1", [(0.0, 0.5), (1.0, -0.5)])
+    publish_tasks("rel-test", "p2", [(-1.0, 0.0)])
+    snap = get_snapshot("rel-test")
+    assert snap["total_participants"] == 2 and snap["total_tasks"] == 3
+    assert snap["stress"]["mean"] == pytest.approx(0.5)
+    assert snap["arousal"]["min"] == -1.0 and snap["arousal"]["max"] == 1.0
@@ -0,0 +1,73 @@
+import contextlib
+import io
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from scipy.signal import resample as fft_resample
+
+from app.services.resampling import (
+    rational_factors, resample, at_canonical_rates, design_cache_stats
+)
+from app.services.signal_processing import (
+    SAMPLING_EEG, SAMPLING_PPG, theta_beta_ratio, hr_from_ppg
+)
+from app.services.synthetic import synthetic_eeg, synthetic_ppg
+
+SECONDS = 120.37       # largo no redondo, como las grabaciones reales
+
+
+def _quiet(func, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+
+@pytest.mark.parametrize("fs_in, fs_out, expected", [
+    (512, 256, (1, 2)), (250, 256, (128, 125)), (128, 256, (2, 1)), (25, 64, (64, 25)),
+])
+def test_rational_factors(fs_in, fs_out, expected):
+    assert rational_factors(fs_in, fs_out) == expected
+
+
+@pytest.mark.parametrize("fs_in", [512, 500, 250, 128])
+def test_eeg_metric_matches_fft_resample(fs_in):
+    native = synthetic_eeg(SECONDS, fs=fs_in, seed=1)
+    out = resample(native, fs_in, SAMPLING_EEG)
+    n_out = int(round(native.size * SAMPLING_EEG / fs_in))
+    assert abs(out.size - n_out) <= 1
+    ref = _quiet(theta_beta_ratio, fft_resample(native, n_out))
+    assert _quiet(theta_beta_ratio, out) == pytest.approx(ref, rel=0.02)
+
+
+@pytest.mark.parametrize("fs_in", [128, 100, 25])
+def test_ppg_hr_survives_resampling(fs_in):
+    native, true_hr = synthetic_ppg(SECONDS, fs_in, seed=1)
+    assert _quiet(hr_from_ppg, resample(native, fs_in, SAMPLING_PPG)) == pytest.approx(true_hr, rel=0.02)
+
+
+def test_fir_design_is_cached():
+    x = np.arange(1000.0)
+    resample(x, 500, 256)
+    before = design_cache_stats()
+    resample(x, 500, 256)
+    after = design_cache_stats()
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"]
+
+
+def test_at_canonical_rates_is_idempotent():
+    eeg = synthetic_eeg(10, fs=512)
+    data = SimpleNamespace(eeg=[SimpleNamespace(channel="AF7", values=eeg)],
+                           ppg=np.ones(1000), eegSamplingRate=512, ppgSamplingRate=100)
+    at_canonical_rates(data)
+    assert data.eeg[0].values.size == eeg.size // 2
+    assert data.ppg.size == 640
+    assert (data.eegSamplingRate, data.ppgSamplingRate) == (SAMPLING_EEG, SAMPLING_PPG)
+    values = data.eeg[0].values
+    at_canonical_rates(data)
+    assert data.eeg[0].values is values
+
+
+def test_same_rate_is_untouched():
+    x = np.arange(10.0)
+    assert np.array_equal(resample(x, 256, 256), x)
@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import SESSIONS_DEFAULT_DAYS
+from app.services.session_queries import (
+    SESSIONS_BY_RELATION, SESSIONS_BY_RELATION_STREAM, USER_SESSIONS, since_or_default
+)
+
+
+def test_since_defaults_to_a_bounded_window():
+    since = since_or_default(None)
+    expected = datetime.now() - timedelta(days=SESSIONS_DEFAULT_DAYS)
+    assert abs((since - expected).total_seconds()) < 5
+
+    explicit = datetime(2020, 1, 1)
+    assert since_or_default(explicit) is explicit
+
+
+def test_statements_filter_on_partition_key():
+    for stmt in (SESSIONS_BY_RELATION, USER_SESSIONS):
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert "sessions.created_at >= %(since)s" in sql
+
+
+def test_cache_key_is_stable():
+    """Statement constante: misma clave de caché en cada request."""
+    assert SESSIONS_BY_RELATION._generate_cache_key() == SESSIONS_BY_RELATION._generate_cache_key()
+    assert SESSIONS_BY_RELATION_STREAM.get_execution_options()["yield_per"] > 0
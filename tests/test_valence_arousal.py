@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from app.services.emotion import emotion_from_axes, emotions_from_axes
+from app.services.valence_arousal import (
+    arousal_feature, arousal_features, valence_feature, valence_features, stress_from_arousal
+)
+
+
+def _random_deltas(n: int, seed: int):
+    """Deltas (θ, HRV, GSR, HR) y asimetrías aleatorias, con NaN."""
+    rng = np.random.default_rng(seed)
+    deltas = rng.normal(0.0, [0.3, 0.8, 0.4, 8.0], size=(n, 4))
+    deltas[rng.random((n, 4)) < 0.05] = np.nan
+    asym = rng.normal(0.0, 25.0, size=n)
+    return deltas, asym
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_vectorized_is_bit_identical_to_scalar(seed):
+    deltas, asym = _random_deltas(10_000, seed)
+
+    arousals = arousal_features(*deltas.T)
+    valences = valence_features(asym)
+    labels, _ = emotions_from_axes(valences, arousals)
+
+    ref_a = np.array([arousal_feature(*row) for row in deltas.tolist()])
+    ref_v = np.array([valence_feature(x) for x in asym.tolist()])
+    ref_labels = [emotion_from_axes(v, a)[0] for v, a in zip(ref_v.tolist(), ref_a.tolist())]
+
+    assert np.array_equal(arousals, ref_a)
+    assert np.array_equal(valences, ref_v)
+    assert np.array_equal(np.asarray(labels), np.asarray(ref_labels))
+
+
+def test_scalar_gsr_broadcasts():
+    d = np.array([0.1, -0.2, 0.3])
+    assert np.array_equal(arousal_features(d, d, 0.0, d),
+                          [arousal_feature(x, x, 0.0, x) for x in d.tolist()])
+
+
+def test_stress_is_linear_in_arousal():
+    assert np.array_equal(stress_from_arousal([-1.0, 0.0, 1.0]), [0.0, 0.5, 1.0])